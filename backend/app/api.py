@@ -1,19 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Any, Dict
-from app.chatbot import chat, chat_stream
+from app.chatbot import achat, aprepare_stream, first_turns
+from app.llm.admission import admission, Overloaded
+from app.utils.cache import cache_stats
+from app.utils.sse import sse_stream
+from app.utils.metrics import REQUEST_SECONDS, SESSION_EVENTS, render_metrics
+from app.utils.tracing import RequestIdMiddleware, configure_logging
+from app.lifespan import lifespan, READINESS
+from app.memory.conversation_store import conversation_store
 import os
+import time
+import uuid
 import logging
 import traceback
 from dotenv import load_dotenv
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="i95Dev Chatbot API")
+app = FastAPI(title="i95Dev Chatbot API", lifespan=lifespan)
 
 # Log env var status at startup (masked for security)
 for key in ["GROQ_API_KEY", "PINECONE_API_KEY", "PINECONE_INDEX_NAME", "FRONTEND_URL", "HF_TOKEN"]:
@@ -30,20 +39,13 @@ _origins = list({
 
 app.add_middleware(
     CORSMiddleware,
-<<<<<<< HEAD
-    allow_origins=[
-        origin for origin in [
-            os.getenv("FRONTEND_URL"),
-            os.getenv("BACKEND_URL"),
-        ] if origin
-    ],
-=======
     allow_origins=_origins,
->>>>>>> d1ed7005561cb54769acabef1b4cc2c7f4d1416e
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-Id", "X-Message-Id", "X-Session-Id"],
 )
+app.add_middleware(RequestIdMiddleware)
 
 
 class Message(BaseModel):
@@ -57,12 +59,103 @@ class Message(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    messages: List[Any]
+    # Either the whole conversation in `messages` (stateless), or — with
+    # server-side history (conversation_store.py) — `session_id` plus only
+    # the new `message` and how many messages preceded it. Sending
+    # `messages` with a `session_id` resyncs the stored history.
+    messages: Optional[List[Any]] = None
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    history_length: Optional[int] = None
 
 
 class ChatResponse(BaseModel):
     role: str = "assistant"
     content: str
+    session_id: Optional[str] = None
+
+
+def _split_messages(messages):
+    """
+    Split the client-supplied messages into (current user message, history)
+    """
+    history = []
+    for msg in messages[:-1]:
+        if isinstance(msg, dict):
+            history.append({
+                "role": msg.get("role", "user"),
+                "content": msg.get("content", "")
+            })
+        else:
+            history.append({
+                "role": getattr(msg, "role", "user"),
+                "content": getattr(msg, "content", "")
+            })
+
+    last_msg = messages[-1]
+    user_message = (
+        last_msg.get("content")
+        if isinstance(last_msg, dict)
+        else getattr(last_msg, "content", "")
+    )
+    return user_message, history
+
+
+def _resolve_turn(request):
+    """
+    (user message, history, session or None) for a chat request. Raises
+    409 when the client's history_length does not match the session, so
+    the client resends its messages.
+    """
+    if request.message is None:
+        if not request.messages:
+            raise HTTPException(status_code=400, detail="Messages list cannot be empty")
+        user_message, history = _split_messages(request.messages)
+        if request.session_id is None:
+            return user_message, history, None
+        session = conversation_store.replace(request.session_id, history, request.history_length)
+        return user_message, session.history(), session
+
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    session = conversation_store.get(request.session_id) if request.session_id else None
+    if session is None and not request.history_length:
+        session = conversation_store.create(request.session_id)
+    elif session is None or (
+        request.history_length is not None and session.total != request.history_length
+    ):
+        SESSION_EVENTS.inc(event="out_of_sync")
+        raise HTTPException(
+            status_code=409,
+            detail="Conversation history out of sync; resend it in `messages`",
+        )
+    return request.message, session.history(), session
+
+
+def _client_id(http_request, session):
+    """Fairness key for admission control: the session, else the caller's IP."""
+    if session is not None:
+        return f"session:{session.id}"
+    # Behind Render's proxy the first X-Forwarded-For hop is the caller
+    forwarded = http_request.headers.get("x-forwarded-for", "")
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+
+def _too_busy(e):
+    return HTTPException(
+        status_code=429,
+        detail="The assistant is busy right now. Please try again shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _failed_stream(error):
+    # Errors before the first token still reach the client as an SSE error event
+    raise error
+    yield
 
 
 @app.get("/health")
@@ -70,85 +163,117 @@ async def health_check():
     return {"status": "ok", "message": "i95Dev Chatbot API is running"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    503 until the startup warm-up (lifespan.py) has connected to every
+    upstream; the body lists each component's status.
+    """
+    return JSONResponse(READINESS.as_dict(), status_code=200 if READINESS.ready else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    stats = {**cache_stats(), "sessions": conversation_store.stats()}
+    if admission is not None:
+        stats["admission"] = admission.stats()
+    if first_turns is not None:
+        stats["coalescing"] = first_turns.stats()
+    return stats
+
+
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    start = time.perf_counter()
+    status = "error"
     try:
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="Messages list cannot be empty")
+        user_message, history, session = _resolve_turn(request)
 
-        history = []
-        for msg in request.messages[:-1]:
-            if isinstance(msg, dict):
-                history.append({
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", "")
-                })
-            else:
-                history.append({
-                    "role": getattr(msg, "role", "user"),
-                    "content": getattr(msg, "content", "")
-                })
-
-        last_msg = request.messages[-1]
-        user_message = (
-            last_msg.get("content")
-            if isinstance(last_msg, dict)
-            else getattr(last_msg, "content", "")
-        )
+        response = await achat(user_message, history, session, _client_id(http_request, session))
+        status = "ok"
+        return ChatResponse(content=response, session_id=session.id if session else None)
+
+    except HTTPException as e:
+        # Bad requests and 409 session resyncs aren't server failures
+        status = "client_error" if e.status_code < 500 else "error"
+        raise
 
-        response = chat(user_message, history)
-        return ChatResponse(content=response)
+    except Overloaded as e:
+        status = "overloaded"
+        raise _too_busy(e)
 
     except Exception as e:
+        # Details stay in the logs (with the request ID), not in the response
         logger.error(f"CHAT ERROR: {e}")
         logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail="Something went wrong. Please try again.")
+
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/chat", status=status)
+
+
+async def _timed_stream(events, endpoint):
+    # Records the full stream duration, labelled by how the stream ended
+    start = time.perf_counter()
+    status = "disconnected"
+    try:
+        async for event in events:
+            if event.startswith("event: done"):
+                status = "ok"
+            elif event.startswith("event: error"):
+                status = "error"
+            yield event
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
 
 
 # ---------------- STREAMING ENDPOINT ---------------- #
 
 @app.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
     """
-    True token-level streaming endpoint for assistant-ui
+    Token-level streaming endpoint (Server-Sent Events).
+
+    Emits `start`, `delta` (one per token), then `done` or `error`, with
+    `: ping` heartbeats while waiting. Disconnecting cancels the upstream
+    Groq stream. Answers 429 (before any event) when generation can't be
+    admitted.
     """
-    try:
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="Messages list cannot be empty")
+    user_message, history, session = _resolve_turn(request)
+    message_id = str(uuid.uuid4())
 
-        history = []
-        for msg in request.messages[:-1]:
-            if isinstance(msg, dict):
-                history.append({
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", "")
-                })
-            else:
-                history.append({
-                    "role": getattr(msg, "role", "user"),
-                    "content": getattr(msg, "content", "")
-                })
-
-        last_msg = request.messages[-1]
-        user_message = (
-            last_msg.get("content")
-            if isinstance(last_msg, dict)
-            else getattr(last_msg, "content", "")
+    start = time.perf_counter()
+    try:
+        tokens = await aprepare_stream(
+            user_message, history, session, _client_id(http_request, session)
         )
+    except Overloaded as e:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/chat/stream", status="overloaded")
+        raise _too_busy(e)
+    except Exception as e:
+        tokens = _failed_stream(e)
 
-        def event_stream():
-            for token in chat_stream(user_message, history):
-                yield token
-
-        return StreamingResponse(
-            event_stream(),
-            media_type="text/plain"
-        )
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "X-Message-Id": message_id,
+    }
+    if session is not None:
+        headers["X-Session-Id"] = session.id
 
-    except Exception as e:
-        logger.error(f"STREAM ERROR: {e}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        _timed_stream(
+            sse_stream(tokens, message_id),
+            "/chat/stream",
+        ),
+        media_type="text/event-stream",
+        headers=headers,
+    )
 
 
 if __name__ == "__main__":
@@ -1,21 +1,217 @@
-from app.retrieval.retriever import retrieve_context
-from app.llm.groq_client import generate_response, stream_response
+import os
+import math
+import weakref
+
+from app.retrieval.retriever import normalize_query, retrieve
+from app.retrieval.condense import condense, acondense_retrieve, needs_context
+from app.retrieval.faq_index import faq_index
+from app.llm.groq_client import (
+    generate_response,
+    stream_response,
+    agenerate_response,
+    astream_response,
+)
+from app.llm.answer_cache import answer_cache, replay
+from app.llm.admission import admission, Overloaded, estimate_request_tokens, upstream_retry_after
+from app.memory.conversation_store import conversation_store
+from app.utils.metrics import SESSION_EVENTS
+from app.utils.singleflight import SingleFlight
 
 
 def chat(query, history):
     """
     Non-streaming chat (kept for fallback/debug)
     """
-    context = retrieve_context(query)
-    return generate_response(query, context, history)
+    chunks = retrieve(condense(query, history))["chunks"]
+    return generate_response(query, chunks, history)
 
 
 def chat_stream(query, history):
     """
     Streaming chat generator (token-by-token)
     """
-    context = retrieve_context(query)
+    chunks = retrieve(condense(query, history))["chunks"]
 
     # stream_response MUST yield tokens
-    for token in stream_response(query, context, history):
+    for token in stream_response(query, chunks, history):
+        yield token
+
+
+# ---------------- ASYNC (used by the API) ---------------- #
+# First-turn questions (no history) go through the semantic answer cache:
+# a near-identical question over the same retrieved chunks skips Groq.
+# Follow-ups are retrieved on a standalone rewrite (retrieval/condense.py).
+# With a server-side session (conversation_store.py) the turn is recorded
+# once answered, and follow-ups that ask nothing new reuse the previous
+# turn's retrieval.
+#
+# Questions the site's FAQ answers (retrieval/faq_index.py) get the canonical
+# answer straight away: no retrieval, no Groq call. Follow-ups qualify only
+# when they stand on their own.
+#
+# Concurrent first-turn requests for the same normalized question share one
+# retrieval and one Groq stream (utils/singleflight.py, COALESCE_ENABLED);
+# each caller still records its own session turn.
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "1") == "1"
+
+first_turns = SingleFlight("first_turn") if COALESCE_ENABLED else None
+
+async def _aretrieve(query, history, session):
+    previous = None
+    if session is not None:
+        reused = session.reusable_retrieval(query)
+        if reused is not None:
+            SESSION_EVENTS.inc(event="retrieval_reused")
+            return reused
+        previous = session.retrieval_query
+    return await acondense_retrieve(query, history, previous)
+
+
+async def _afaq_answer(query, history):
+    if faq_index is None or (history and needs_context(query)):
+        return None
+    entry = await faq_index.amatch(query)
+    return entry["answer"] if entry is not None else None
+
+
+def _cached_answer(retrieval):
+    return answer_cache.lookup(retrieval["query_vec"], retrieval["chunk_ids"], retrieval["chunks"])
+
+
+def _cache_answer(retrieval, answer):
+    answer_cache.store(retrieval["query_vec"], retrieval["chunk_ids"], retrieval["chunks"], answer)
+
+
+def _record(session, query, answer, retrieval):
+    if session is not None:
+        conversation_store.record_turn(session, query, answer, retrieval)
+
+
+async def _aslot(client, query, chunks, history):
+    if admission is None:
+        return None
+    return await admission.acquire(client, estimate_request_tokens(query, chunks, history))
+
+
+def _check_rate_limited(exc):
+    # Groq's own 429: pause admission and report it as Overloaded
+    retry_after = upstream_retry_after(exc)
+    if retry_after is not None and admission is not None:
+        admission.backoff(retry_after)
+        raise Overloaded(math.ceil(retry_after), "upstream") from exc
+
+
+async def achat(query, history, session=None, client=None):
+    """
+    Non-streaming chat on the async pipeline. Raises Overloaded when
+    generation can't be admitted (admission.py).
+    """
+    faq_answer = await _afaq_answer(query, history)
+    if faq_answer is not None:
+        _record(session, query, faq_answer, None)
+        return faq_answer
+
+    if first_turns is not None and not history:
+        # Shares the streaming flight with identical in-flight questions
+        stream = await aprepare_stream(query, history, session, client)
+        return "".join([token async for token in stream])
+
+    retrieval = await _aretrieve(query, history, session)
+
+    answer = None
+    if not history:
+        answer = _cached_answer(retrieval)
+
+    if answer is None:
+        slot = await _aslot(client, query, retrieval["chunks"], history)
+        try:
+            answer = await agenerate_response(query, retrieval["chunks"], history)
+        except Exception as e:
+            _check_rate_limited(e)
+            raise
+        finally:
+            if slot is not None:
+                slot.release()
+        if not history:
+            _cache_answer(retrieval, answer)
+
+    _record(session, query, answer, retrieval)
+    return answer
+
+
+async def _areplay(answer):
+    for piece in replay(answer):
+        yield piece
+
+
+async def _agenerate_stream(query, history, retrieval, slot):
+    tokens = []
+    try:
+        async for token in astream_response(query, retrieval["chunks"], history):
+            tokens.append(token)
+            yield token
+    except Exception as e:
+        _check_rate_limited(e)
+        raise
+    finally:
+        if slot is not None:
+            slot.release()
+
+    # Only reached when the stream completed (not on disconnect/error)
+    answer = "".join(tokens)
+    if not history:
+        _cache_answer(retrieval, answer)
+
+
+async def _aupstream(query, history, session, client):
+    """Retrieval, then the cached answer or an admitted Groq stream."""
+    retrieval = await _aretrieve(query, history, session)
+
+    if not history:
+        cached = _cached_answer(retrieval)
+        if cached is not None:
+            return retrieval, _areplay(cached)
+
+    slot = await _aslot(client, query, retrieval["chunks"], history)
+    stream = _agenerate_stream(query, history, retrieval, slot)
+    if slot is not None:
+        # The stream's finally releases it; this covers one never started
+        weakref.finalize(stream, slot.release)
+    return retrieval, stream
+
+
+async def _arecorded(query, session, retrieval, stream):
+    tokens = []
+    async for token in stream:
+        tokens.append(token)
+        yield token
+    # Only reached when the stream completed (not on disconnect/error)
+    _record(session, query, "".join(tokens), retrieval)
+
+
+async def aprepare_stream(query, history, session=None, client=None):
+    """
+    Retrieve and get admitted, then return the token stream. Overloaded is
+    raised here, before any token, so the API can still answer 429.
+    """
+    faq_answer = await _afaq_answer(query, history)
+    if faq_answer is not None:
+        return _arecorded(query, session, None, _areplay(faq_answer))
+
+    if first_turns is not None and not history:
+        # A first turn has nothing session-specific to retrieve on
+        retrieval, stream = await first_turns.join(
+            normalize_query(query), lambda: _aupstream(query, history, None, client)
+        )
+    else:
+        retrieval, stream = await _aupstream(query, history, session, client)
+    return _arecorded(query, session, retrieval, stream)
+
+
+async def achat_stream(query, history, session=None, client=None):
+    """
+    Async streaming chat generator (token-by-token)
+    """
+    async for token in await aprepare_stream(query, history, session, client):
         yield token
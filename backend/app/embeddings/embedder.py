@@ -1,36 +1,52 @@
 
 import os
-from huggingface_hub import InferenceClient
+import importlib
 
-# Use huggingface_hub SDK (handles URL routing automatically)
-# Much more reliable than raw HTTP calls to the inference API
-HF_TOKEN = os.getenv("HF_TOKEN", "")
+# Pluggable embedding backends. Each backend is a module exposing
+#   embed_texts(texts)  -> (n, 384) float32 matrix
+#   aembed_texts(texts) -> same, awaitable
+# for the all-MiniLM-L6-v2 vector space the index was built with.
+#
+#   EMBEDDING_BACKEND=hf     HuggingFace Inference API (default)
+#   EMBEDDING_BACKEND=local  in-process ONNX Runtime on CPU
+#   EMBEDDING_BACKEND=<dotted.module.path>  any module with the same functions
+BACKENDS = {
+    "hf": "app.embeddings.hf_embedder",
+    "local": "app.embeddings.local_embedder",
+}
 
-_client = None
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf")
+EMBEDDING_DIM = 384
 
+_backend = None
 
-def _get_client():
-    global _client
-    if _client is None:
-        _client = InferenceClient(token=HF_TOKEN if HF_TOKEN else None)
-    return _client
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = importlib.import_module(
+            BACKENDS.get(EMBEDDING_BACKEND, EMBEDDING_BACKEND)
+        )
+    return _backend
 
 
-def embed_texts(texts):
+def embed_texts(texts, **kwargs):
     """
-    Embed texts using HuggingFace Inference API via official SDK.
-    Returns list of 384-dim vectors (same as local all-MiniLM-L6-v2).
+    Embed texts with the configured backend.
+    Returns a contiguous (len(texts), 384) float32 matrix.
     """
-    client = _get_client()
-    embeddings = []
-    for text in texts:
-        result = client.feature_extraction(
-            text, model="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        # Convert numpy array to list if needed
-        vec = result.tolist() if hasattr(result, "tolist") else result
-        # If 2D (tokens x hidden), mean-pool to get sentence embedding
-        if isinstance(vec, list) and vec and isinstance(vec[0], list):
-            vec = [sum(col) / len(col) for col in zip(*vec)]
-        embeddings.append(vec)
-    return embeddings
+    return get_backend().embed_texts(texts, **kwargs)
+
+
+async def aembed_texts(texts, **kwargs):
+    """
+    Async variant of embed_texts for the request path.
+    """
+    return await get_backend().aembed_texts(texts, **kwargs)
+
+
+async def aclose():
+    """Release the backend's connections, if it holds any."""
+    backend = get_backend()
+    if hasattr(backend, "aclose"):
+        await backend.aclose()
@@ -0,0 +1,168 @@
+
+import os
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from huggingface_hub import InferenceClient, AsyncInferenceClient
+
+# Use huggingface_hub SDK (handles URL routing automatically)
+# Much more reliable than raw HTTP calls to the inference API
+HF_TOKEN = os.getenv("HF_TOKEN", "")
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# A dedicated Inference Endpoint (or a local stand-in, see
+# benchmarks/fakes.py) serving the same model; requests go straight to it
+MODEL_ENDPOINT = os.getenv("HF_EMBEDDING_URL") or MODEL_NAME
+
+# Texts sent per Inference API request, and how many requests may be in
+# flight at once. Rate-limited (429) / overloaded (503) batches are retried
+# with exponential backoff.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "0.5"))
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+_client = None
+_async_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = InferenceClient(token=HF_TOKEN if HF_TOKEN else None)
+    return _client
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncInferenceClient(token=HF_TOKEN if HF_TOKEN else None)
+    return _async_client
+
+
+async def aclose():
+    """Close the async client's connection pool (API shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.close()
+
+
+def _batches(texts, batch_size):
+    return [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+
+def _to_matrix(result, n):
+    """
+    Normalise an Inference API response for n texts into an (n, 384)
+    float32 matrix, mean-pooling token-level outputs if the endpoint
+    returned them.
+    """
+    try:
+        arr = np.asarray(result, dtype=np.float32)
+    except ValueError:
+        # Ragged token-level output (different token counts per text)
+        return np.vstack([_to_matrix(r, 1) for r in result])
+
+    if arr.ndim == 1:
+        arr = arr[np.newaxis, :]
+    elif arr.ndim == 2 and n == 1 and arr.shape[0] != 1:
+        # (tokens x hidden) for a single text
+        arr = arr.mean(axis=0, keepdims=True)
+    elif arr.ndim == 3:
+        # (texts x tokens x hidden)
+        arr = arr.mean(axis=1)
+
+    if arr.shape != (n, EMBEDDING_DIM):
+        raise ValueError(
+            f"Unexpected embedding shape {arr.shape} for {n} text(s)"
+        )
+    return arr
+
+
+def _retry_delay(exc, attempt):
+    """
+    Seconds to wait before retrying, or None if the error is not retryable.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+    if status not in RETRYABLE_STATUS:
+        return None
+
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return EMBED_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, EMBED_BACKOFF_BASE)
+
+
+def _embed_batch(batch):
+    client = _get_client()
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            result = client.feature_extraction(batch, model=MODEL_ENDPOINT)
+            return _to_matrix(result, len(batch))
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == EMBED_MAX_RETRIES:
+                raise
+            time.sleep(delay)
+
+
+async def _aembed_batch(batch, semaphore):
+    client = _get_async_client()
+    async with semaphore:
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            try:
+                result = await client.feature_extraction(batch, model=MODEL_ENDPOINT)
+                return _to_matrix(result, len(batch))
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == EMBED_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(delay)
+
+
+def _stack(parts):
+    if not parts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+
+
+def embed_texts(texts, batch_size=None, max_concurrency=None, **kwargs):
+    """
+    Embed texts using HuggingFace Inference API via official SDK.
+    Texts are sent in batches of `batch_size`, with up to `max_concurrency`
+    batches in flight. Returns a contiguous (len(texts), 384) float32
+    matrix (same vectors as local all-MiniLM-L6-v2).
+    """
+    texts = list(texts)
+    batches = _batches(texts, batch_size or EMBED_BATCH_SIZE)
+    workers = max(1, min(max_concurrency or EMBED_MAX_CONCURRENCY, len(batches)))
+
+    if workers == 1:
+        return _stack([_embed_batch(batch) for batch in batches])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return _stack(list(pool.map(_embed_batch, batches)))
+
+
+async def aembed_texts(texts, batch_size=None, max_concurrency=None, **kwargs):
+    """
+    Async variant of embed_texts for the request path (does not block
+    the event loop while waiting on the Inference API).
+    """
+    texts = list(texts)
+    batches = _batches(texts, batch_size or EMBED_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max_concurrency or EMBED_MAX_CONCURRENCY)
+
+    parts = await asyncio.gather(*(_aembed_batch(b, semaphore) for b in batches))
+    return _stack(parts)
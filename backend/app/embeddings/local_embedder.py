@@ -0,0 +1,118 @@
+
+import os
+import asyncio
+import threading
+
+import numpy as np
+
+# In-process all-MiniLM-L6-v2 on CPU via ONNX Runtime — no network round
+# trip per query. Needs the optional packages `onnxruntime` and `tokenizers`.
+#
+# By default the quantized ONNX export published alongside the model on the
+# HuggingFace Hub is downloaded once into the HF cache; point
+# LOCAL_EMBEDDING_MODEL_DIR at a directory containing tokenizer.json and the
+# .onnx file to run fully offline.
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+MAX_SEQ_LENGTH = 256  # same truncation as sentence-transformers
+
+LOCAL_EMBEDDING_MODEL_DIR = os.getenv("LOCAL_EMBEDDING_MODEL_DIR", "")
+LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "32"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0"))  # 0 = onnxruntime default
+
+_session = None
+_tokenizer = None
+_input_names = ()
+_load_lock = threading.Lock()
+
+
+def _model_file(filename):
+    if LOCAL_EMBEDDING_MODEL_DIR:
+        return os.path.join(LOCAL_EMBEDDING_MODEL_DIR, filename)
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(MODEL_NAME, filename)
+
+
+def _load():
+    global _session, _tokenizer, _input_names
+    if _session is not None:
+        return
+    with _load_lock:
+        if _session is not None:
+            return
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local needs `pip install onnxruntime tokenizers`"
+            ) from e
+
+        tokenizer = Tokenizer.from_file(_model_file("tokenizer.json"))
+        tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if LOCAL_EMBED_THREADS:
+            options.intra_op_num_threads = LOCAL_EMBED_THREADS
+        session = ort.InferenceSession(
+            _model_file(LOCAL_EMBEDDING_ONNX_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+        _input_names = tuple(i.name for i in session.get_inputs())
+        _tokenizer = tokenizer
+        _session = session
+
+
+def _mean_pool(token_embeddings, attention_mask):
+    """
+    Attention-masked mean over tokens followed by L2 normalisation —
+    the Pooling + Normalize modules of the sentence-transformers model.
+    """
+    mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    pooled = summed / counts
+    norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled / norms
+
+
+def _embed_batch(batch):
+    encodings = _tokenizer.encode_batch(batch)
+    feeds = {
+        "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+        "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+    }
+    feeds = {name: feeds[name] for name in _input_names}
+    token_embeddings = _session.run(None, feeds)[0]
+    return _mean_pool(token_embeddings, feeds["attention_mask"])
+
+
+def embed_texts(texts, batch_size=None, **kwargs):
+    """
+    Embed texts in-process. Returns a contiguous (len(texts), 384) float32
+    matrix of unit-length vectors.
+    """
+    _load()
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+    batch_size = batch_size or LOCAL_EMBED_BATCH_SIZE
+    parts = [
+        _embed_batch(texts[i:i + batch_size])
+        for i in range(0, len(texts), batch_size)
+    ]
+    return np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+
+
+async def aembed_texts(texts, **kwargs):
+    """
+    Async variant of embed_texts. ONNX Runtime releases the GIL while it
+    runs, so inference happens on a worker thread.
+    """
+    return await asyncio.to_thread(embed_texts, texts, **kwargs)
@@ -0,0 +1,210 @@
+"""
+Async, browser-pooled scraper.
+
+scrape_url() launches and tears down a whole Chromium per page and runs
+pages one after another. ScraperPool launches a single browser, keeps a
+small pool of reusable pages and scrapes up to SCRAPE_CONCURRENCY URLs at
+once, with a per-host minimum interval between requests and retry with
+backoff on navigation failures. Image OCR is handed to the shared
+process-pool OcrService (app/ingestion/ocr.py).
+
+Usage:
+    async with ScraperPool() as pool:
+        async for url, data, error in pool.scrape_many(urls):
+            ...
+"""
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+from app.ingestion.ocr import get_ocr_service
+from app.ingestion.scraper import image_sources, page_validators, parse_html
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "4"))
+# Minimum seconds between two requests to the same host (politeness)
+SCRAPE_HOST_INTERVAL = float(os.getenv("SCRAPE_HOST_INTERVAL", "0.5"))
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "2"))
+SCRAPE_TIMEOUT_MS = int(os.getenv("SCRAPE_TIMEOUT_MS", "30000"))
+SCRAPE_BACKOFF_BASE = 1.0
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `interval` seconds.
+    Different hosts do not wait on each other.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        if self.interval <= 0:
+            return
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ScraperPool:
+    def __init__(
+        self,
+        concurrency: int = None,
+        host_interval: float = None,
+        retries: int = None,
+        ocr: bool = True,
+    ):
+        self.concurrency = max(1, concurrency or SCRAPE_CONCURRENCY)
+        self.retries = SCRAPE_RETRIES if retries is None else retries
+        self.ocr = ocr
+        self.rate_limiter = HostRateLimiter(
+            SCRAPE_HOST_INTERVAL if host_interval is None else host_interval
+        )
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._context = await self._browser.new_context()
+        self._pages = asyncio.Queue()
+        for _ in range(self.concurrency):
+            self._pages.put_nowait(await self._context.new_page())
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def scrape(self, url: str, validator: dict = None) -> dict:
+        """
+        Scrape one URL on a pooled page, retrying navigation failures.
+        Returns the same dict as scrape_url(). When `validator` holds the
+        ETag / Last-Modified seen last time and the server reports the
+        page unchanged, returns {"not_modified": True} without rendering.
+        """
+        page = await self._pages.get()
+        try:
+            for attempt in range(self.retries + 1):
+                await self.rate_limiter.wait(url)
+                try:
+                    if validator and await self._not_modified(url, validator):
+                        return {"not_modified": True}
+                    return await self._scrape_page(page, url)
+                except Exception as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = SCRAPE_BACKOFF_BASE * (2 ** attempt)
+                    logger.warning(
+                        "Scrape failed for %s (%s), retrying in %.1fs",
+                        url, e, delay
+                    )
+                    # A page that failed mid-navigation may be wedged
+                    page = await self._replace_page(page)
+                    await asyncio.sleep(delay)
+        finally:
+            self._pages.put_nowait(page)
+
+    async def scrape_many(self, urls, validators: dict = None):
+        """
+        Scrape all URLs with bounded concurrency, yielding
+        (url, data, error) tuples as each page completes.
+        `validators` maps URL -> {"etag", "last_modified"} (see scrape()).
+        """
+        validators = validators or {}
+
+        async def run(url):
+            try:
+                return url, await self.scrape(url, validators.get(url)), None
+            except Exception as e:
+                return url, None, e
+
+        tasks = [asyncio.create_task(run(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _not_modified(self, url: str, validator: dict) -> bool:
+        """
+        Conditional HEAD: unchanged if the server answers 304 or returns
+        the same validators as last time.
+        """
+        headers = {}
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator["etag"]
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator["last_modified"]
+        if not headers:
+            return False
+
+        response = await self._context.request.head(url, headers=headers)
+        if response.status == 304:
+            return True
+        if not response.ok:
+            return False
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if validator.get("etag"):
+            return etag == validator["etag"]
+        return last_modified == validator.get("last_modified")
+
+    async def _replace_page(self, page):
+        try:
+            await page.close()
+        except Exception:
+            pass
+        return await self._context.new_page()
+
+    async def _scrape_page(self, page, url: str) -> dict:
+        nav = await page.goto(url, timeout=SCRAPE_TIMEOUT_MS)
+        await page.wait_for_load_state("networkidle")
+
+        image_texts = []
+        if self.ocr:
+            srcs = await page.locator("img").evaluate_all(
+                "els => els.map(e => e.getAttribute('src'))"
+            )
+            images = []
+            for src in image_sources(page.url, srcs):
+                try:
+                    img = await page.request.get(src)
+                    if img.ok:
+                        images.append(await img.body())
+                except Exception:
+                    continue
+
+            # Tesseract runs in the OCR process pool, not on the event loop
+            texts = await get_ocr_service().aocr_many(images)
+            image_texts = [t for t in texts if t]
+
+        html = await page.content()
+        data = await asyncio.to_thread(parse_html, html, image_texts, url)
+        data.update(page_validators(nav))
+        return data
@@ -0,0 +1,278 @@
+"""
+Append-only chunk store (JSONL), replacing the monolithic chunks_data.json.
+
+Each line is one page record, appended (and fsynced) as soon as the page
+is processed, so a crash only loses the page in flight:
+
+    {"url", "title", "headings", "tables", "run",
+     "chunks": [{"chunk_id", "content", "chunk_index"}],
+     "faqs": [{"question", "answer"}]}     (FAQ pages only, see faq.py)
+
+The latest record for a URL wins; {"url", "deleted": true} is a
+tombstone. Run markers ({"type": "run", ...} / {"type": "run_end", ...})
+let an interrupted ingestion resume without redoing finished pages.
+
+A sidecar offset index (<file>.idx: URL -> byte offset of the latest
+record) is kept in step with every append (a full scan rebuilds it when
+stale), so readers seek straight to live records and iter_chunks()
+streams one page at a time. compact() rewrites the file with only live
+records.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+CHUNK_STORE_FILE = os.getenv(
+    "CHUNK_STORE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "chunks_data.jsonl")
+)
+
+
+class ChunkStore:
+    def __init__(self, path: str = CHUNK_STORE_FILE):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._runs = []
+        self._indexed_size = 0
+        self._load_index()
+
+    # ---------- Index ---------- #
+
+    def _load_index(self):
+        if os.path.exists(self.index_path) and os.path.exists(self.path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                # The index is only trusted for the exact file it was
+                # written against (a pull or manual edit means a rescan)
+                if saved["mtime"] == os.path.getmtime(self.path):
+                    self._offsets = saved["offsets"]
+                    self._runs = saved["runs"]
+                    self._indexed_size = saved["size"]
+            except (OSError, ValueError, KeyError):
+                self._offsets, self._runs, self._indexed_size = {}, [], 0
+        self._scan()
+
+    def _scan(self):
+        """Index records appended since the last scan."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash; truncated on next append
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    offset += len(line)
+                    continue
+                self._apply(record, offset)
+                offset += len(line)
+        self._indexed_size = offset
+
+    def _apply(self, record, offset):
+        kind = record.get("type", "page")
+        if kind == "run":
+            self._runs.append({"id": record["id"], "finished": False})
+        elif kind == "run_end":
+            for run in self._runs:
+                if run["id"] == record["id"]:
+                    run["finished"] = True
+        elif record.get("deleted"):
+            self._offsets.pop(record["url"], None)
+        else:
+            self._offsets[record["url"]] = [offset, record.get("run")]
+
+    def _save_index(self):
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"size": self._indexed_size, "mtime": os.path.getmtime(self.path),
+                       "offsets": self._offsets, "runs": self._runs[-20:]}, f)
+        os.replace(tmp, self.index_path)
+
+    # ---------- Writes ---------- #
+
+    def _append(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                if f.tell() != self._indexed_size:
+                    # Drop a partial trailing line left by a crash
+                    f.truncate(self._indexed_size)
+                    f.seek(self._indexed_size)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record, self._indexed_size)
+            self._indexed_size += len(line)
+            self._save_index()
+
+    def write_page(self, url: str, title: str, headings: list, tables: list,
+                   chunks: list, run: str = None, faqs: list = None):
+        """
+        Append the chunks of one page. `chunks` are (chunk_id, content)
+        pairs in page order; `faqs` the page's Q/A pairs, if any.
+        """
+        record = {
+            "url": url,
+            "title": title,
+            "headings": headings,
+            "tables": tables,
+            "run": run,
+            "written_at": datetime.now().isoformat(),
+            "chunks": [
+                {"chunk_id": chunk_id, "content": content, "chunk_index": idx}
+                for idx, (chunk_id, content) in enumerate(chunks)
+            ],
+        }
+        if faqs:
+            record["faqs"] = faqs
+        self._append(record)
+
+    def delete_page(self, url: str, run: str = None):
+        if url in self._offsets:
+            self._append({"url": url, "deleted": True, "run": run})
+
+    def start_run(self, resume: bool = False) -> str:
+        """
+        Begin an ingestion run. With resume=True, an unfinished previous
+        run is continued (see urls_done()).
+        """
+        if resume and self._runs and not self._runs[-1]["finished"]:
+            return self._runs[-1]["id"]
+        run_id = uuid.uuid4().hex
+        self._append({"type": "run", "id": run_id, "started_at": datetime.now().isoformat()})
+        return run_id
+
+    def finish_run(self, run_id: str):
+        self._append({"type": "run_end", "id": run_id, "finished_at": datetime.now().isoformat()})
+
+    def urls_done(self, run_id: str) -> set:
+        """URLs already written by `run_id` (skipped when resuming)."""
+        return {url for url, (_, run) in self._offsets.items() if run == run_id}
+
+    def compact(self, order: list = None):
+        """
+        Rewrite the file with only the live page records, optionally in
+        the given URL order (unlisted URLs keep their relative order last).
+        """
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as out:
+                for page in self.iter_pages(order):
+                    out.write((json.dumps(page, ensure_ascii=False) + "\n").encode("utf-8"))
+            os.replace(tmp, self.path)
+            self._offsets, self._runs, self._indexed_size = {}, [], 0
+            self._scan()
+            self._save_index()
+
+    # ---------- Reads ---------- #
+
+    def urls(self) -> list:
+        return list(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def get_page(self, url: str) -> dict:
+        entry = self._offsets.get(url)
+        if entry is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(entry[0])
+            return json.loads(f.readline())
+
+    def iter_pages(self, order: list = None):
+        """Live page records (file order by default), one at a time."""
+        entries = sorted(offset for offset, _ in self._offsets.values())
+        if order:
+            rank = {url: i for i, url in enumerate(order)}
+            entries = [
+                self._offsets[url][0]
+                for url in sorted(self._offsets, key=lambda u: (rank.get(u, len(rank)), self._offsets[u][0]))
+            ]
+        with open(self.path, "rb") as f:
+            for offset in entries:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def iter_chunks(self):
+        """
+        Stream chunks in the old chunks_data.json shape:
+        {chunk_id, url, title, headings, content, tables, chunk_index}.
+        """
+        for page in self.iter_pages():
+            yield from page_chunks(page)
+
+
+def page_chunks(page: dict) -> list:
+    """
+    Flatten a page record into chunks_data.json-shaped chunk dicts. A
+    chunk may override the page's title/headings/tables (migrated
+    hand-edited chunks do).
+    """
+    return [
+        {
+            "chunk_id": chunk["chunk_id"],
+            "url": page["url"],
+            "title": chunk.get("title", page["title"]),
+            "headings": chunk.get("headings", page["headings"]),
+            "content": chunk["content"],
+            "tables": chunk.get("tables", page["tables"]),
+            "chunk_index": chunk["chunk_index"],
+        }
+        for chunk in page["chunks"]
+    ]
+
+
+def migrate_from_json(json_path: str, store: ChunkStore) -> int:
+    """
+    Import a legacy chunks_data.json into `store`, one record per URL.
+    Chunk order, chunk_index and per-chunk title/headings/tables are
+    preserved exactly. Returns the number of chunks imported.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f).get("chunks", [])
+
+    pages = {}
+    for chunk in chunks:
+        pages.setdefault(chunk["url"], []).append(chunk)
+
+    for url, page_chunks_ in pages.items():
+        first = page_chunks_[0]
+        page = {
+            "url": url,
+            "title": first.get("title", ""),
+            "headings": first.get("headings", []),
+            "tables": first.get("tables", []),
+            "run": None,
+            "written_at": datetime.now().isoformat(),
+            "chunks": [],
+        }
+        for c in page_chunks_:
+            entry = {"chunk_id": c["chunk_id"], "content": c["content"], "chunk_index": c["chunk_index"]}
+            for key in ("title", "headings", "tables"):
+                if c.get(key, page[key]) != page[key]:
+                    entry[key] = c[key]
+            page["chunks"].append(entry)
+        store._append(page)
+    return len(chunks)
+
+
+def open_store(path: str = CHUNK_STORE_FILE) -> ChunkStore:
+    """
+    Open the chunk store, migrating a legacy chunks_data.json next to it
+    on first use.
+    """
+    legacy = os.path.join(os.path.dirname(path), "chunks_data.json")
+    fresh = not os.path.exists(path)
+    store = ChunkStore(path)
+    if fresh and os.path.exists(legacy):
+        migrate_from_json(legacy, store)
+    return store
@@ -0,0 +1,163 @@
+"""
+Question / answer pairs from FAQ-style pages.
+
+The scraper flattens pages into text, which loses which sentence answers
+which question. extract_faqs() reads the pairs from the rendered HTML
+instead, in order of reliability:
+
+  1. schema.org FAQPage JSON-LD (Yoast, Rank Math, ...)
+  2. FAQ / accordion blocks (Spectra, Yoast, Rank Math, <details>)
+  3. single-question FAQ pages (/faq/<slug>/): the H1 is the question and
+     the post body is the answer
+
+Excerpts ("... Read More" teasers on the FAQ index page) are not answers
+and are dropped. Pairs are stored on the page record in the chunk store
+("faqs"); page_faqs() recovers single-question pages from the chunk text
+for records written before that.
+"""
+import json
+import re
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+MIN_QUESTION_CHARS = 10
+MIN_ANSWER_CHARS = 20
+MAX_ANSWER_CHARS = 2000
+
+# Contact form that follows the answer on every FAQ page
+_BOILERPLATE_RE = re.compile(r"\s*Ask i95Dev If you have any questions.*$", re.DOTALL)
+_EXCERPT_RE = re.compile(r"(\.\.\.|…)\s*(Read More)?\s*$|Read More\s*$", re.IGNORECASE)
+_TITLE_SUFFIX_RE = re.compile(r"\s*(&|\||–|-)\s*i95dev\s*$", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+_BLOCKS = [
+    # (item, question, answer) selectors
+    (".uagb-faq-item", ".uagb-question", ".uagb-faq-content"),
+    (".schema-faq-section", ".schema-faq-question", ".schema-faq-answer"),
+    (".rank-math-list-item", ".rank-math-question", ".rank-math-answer"),
+]
+
+
+def _text(value) -> str:
+    return _SPACE_RE.sub(" ", (value or "").replace("\xa0", " ")).strip()
+
+
+def _html_text(html: str) -> str:
+    return _text(BeautifulSoup(html or "", "html.parser").get_text(separator=" "))
+
+
+def _pair(question: str, answer: str):
+    question = _TITLE_SUFFIX_RE.sub("", _text(question))
+    answer = _BOILERPLATE_RE.sub("", _text(answer))
+    if answer.startswith(question):
+        answer = answer[len(question):].strip()
+    if (
+        len(question) < MIN_QUESTION_CHARS
+        or not question.endswith("?")
+        or not MIN_ANSWER_CHARS <= len(answer) <= MAX_ANSWER_CHARS
+        or _EXCERPT_RE.search(answer)
+    ):
+        return None
+    return {"question": question, "answer": answer}
+
+
+def _json_ld_faqs(soup) -> list:
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                yield from walk(item)
+        elif isinstance(node, dict):
+            types = node.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if "FAQPage" in types:
+                yield from walk(node.get("mainEntity", []))
+            elif "Question" in types:
+                answer = node.get("acceptedAnswer") or {}
+                if isinstance(answer, list):
+                    answer = answer[0] if answer else {}
+                yield node.get("name", ""), _html_text(answer.get("text", ""))
+            else:
+                yield from walk(node.get("@graph", []))
+
+    pairs = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        pairs.extend(walk(data))
+    return pairs
+
+
+def _block_faqs(soup) -> list:
+    pairs = []
+    for item_sel, question_sel, answer_sel in _BLOCKS:
+        for item in soup.select(item_sel):
+            question, answer = item.select_one(question_sel), item.select_one(answer_sel)
+            if question and answer:
+                pairs.append((question.get_text(" "), answer.get_text(" ")))
+    for details in soup.find_all("details"):
+        summary = details.find("summary")
+        if summary:
+            question = summary.get_text(" ")
+            summary.extract()
+            pairs.append((question, details.get_text(" ")))
+    return pairs
+
+
+def is_faq_page(url: str) -> bool:
+    """A single-question page under /faq/ (not the FAQ index itself)."""
+    parts = [p for p in urlparse(url or "").path.split("/") if p]
+    return len(parts) == 2 and parts[0] == "faq"
+
+
+def _single_page_faq(soup, url: str) -> list:
+    if not is_faq_page(url):
+        return []
+    h1 = soup.find("h1")
+    if h1 is None:
+        return []
+    body = soup.select_one(".wp-block-post-content, .entry-content")
+    if body is not None:
+        answer = body.get_text(" ")
+    else:
+        answer = " ".join(sibling.get_text(" ") for sibling in h1.find_next_siblings())
+    return [(h1.get_text(" "), answer)]
+
+
+def extract_faqs(soup, url: str = "") -> list:
+    """
+    Q/A pairs ({"question", "answer"}) found in a page. Call before
+    <script> tags are stripped (JSON-LD lives in them).
+    """
+    faqs, seen = [], set()
+    for question, answer in _json_ld_faqs(soup) + _block_faqs(soup) + _single_page_faq(soup, url):
+        pair = _pair(question, answer)
+        if pair is not None and pair["question"].lower() not in seen:
+            seen.add(pair["question"].lower())
+            faqs.append(pair)
+    return faqs
+
+
+def page_faqs(page: dict) -> list:
+    """
+    Q/A pairs of a chunk store page record: the extracted "faqs", or for
+    single-question FAQ pages ingested before extraction, the answer
+    following "# <question>" in the chunk text.
+    """
+    if page.get("faqs"):
+        return page["faqs"]
+    if not is_faq_page(page.get("url")):
+        return []
+    question = _TITLE_SUFFIX_RE.sub("", _text(page.get("title")))
+    marker = f"# {question}"
+    for chunk in page.get("chunks", []):
+        content = _text(chunk["content"])
+        start = content.find(marker)
+        # Only a chunk holding the whole answer, up to the contact form
+        if start != -1 and _BOILERPLATE_RE.search(content):
+            pair = _pair(question, content[start + len(marker):])
+            if pair is not None:
+                return [pair]
+    return []
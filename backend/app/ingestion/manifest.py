@@ -0,0 +1,111 @@
+"""
+Ingestion manifest: what is currently indexed, per URL.
+
+Chunk IDs are derived from the page URL and the chunk's content hash, so
+re-ingesting unchanged content yields the same IDs and a rebuild only
+has to embed/upsert the chunks that actually changed and delete the ones
+that disappeared. The manifest also keeps each page's HTTP validators
+(ETag / Last-Modified) and extracted-text hash so unchanged pages can be
+skipped before chunking.
+
+Layout of INGEST_MANIFEST_FILE:
+    {"pages": {url: {"etag", "last_modified", "page_hash",
+                     "chunk_ids", "updated_at"}}}
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+INGEST_MANIFEST_FILE = os.getenv(
+    "INGEST_MANIFEST_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "ingest_manifest.json")
+)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_ids_for(url: str, chunks: list) -> list:
+    """
+    Deterministic chunk IDs (UUID5 of URL + content hash). A chunk text
+    that repeats within the same page gets an occurrence suffix so IDs
+    stay unique.
+    """
+    ids = []
+    seen = {}
+    for text in chunks:
+        digest = content_hash(text)
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        name = f"{url}#{digest}" if n == 0 else f"{url}#{digest}:{n}"
+        ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, name)))
+    return ids
+
+
+class Manifest:
+    def __init__(self, path: str = INGEST_MANIFEST_FILE):
+        self.path = path
+        self.pages = {}
+
+    @classmethod
+    def load(cls, path: str = INGEST_MANIFEST_FILE, store=None):
+        """
+        Load the manifest. When none exists yet but a previous chunk
+        store does, seed URL -> chunk_ids from it so the first incremental
+        run deletes the old random-ID vectors it replaces.
+        """
+        manifest = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest.pages = json.load(f).get("pages", {})
+        elif store is not None:
+            for page in store.iter_pages():
+                manifest.pages[page["url"]] = {
+                    "chunk_ids": [c["chunk_id"] for c in page["chunks"]]
+                }
+        return manifest
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pages": self.pages}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, url: str) -> dict:
+        return self.pages.get(url, {})
+
+    def validators(self) -> dict:
+        """URL -> {"etag", "last_modified"} for conditional fetches."""
+        return {
+            url: {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+            for url, entry in self.pages.items()
+            if entry.get("etag") or entry.get("last_modified")
+        }
+
+    def diff(self, url: str, new_ids: list):
+        """
+        Return (added_ids, removed_ids) between the indexed chunks of
+        `url` and `new_ids`.
+        """
+        old = set(self.get(url).get("chunk_ids", []))
+        new = set(new_ids)
+        added = [cid for cid in new_ids if cid not in old]
+        removed = [cid for cid in self.get(url).get("chunk_ids", []) if cid not in new]
+        return added, removed
+
+    def update(self, url: str, chunk_ids: list, page_hash: str = None,
+               etag: str = None, last_modified: str = None):
+        self.pages[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "page_hash": page_hash,
+            "chunk_ids": list(chunk_ids),
+            "updated_at": datetime.now().isoformat(),
+        }
+
+    def remove(self, url: str) -> list:
+        """Forget `url`; returns the chunk IDs that must be deleted."""
+        return self.pages.pop(url, {}).get("chunk_ids", [])
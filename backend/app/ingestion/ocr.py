@@ -0,0 +1,200 @@
+"""
+Image OCR for the scrapers.
+
+Tesseract is CPU-bound, so images are OCR'd in a process pool rather than
+on the scraping thread/event loop. Results are cached by the SHA-256 of
+the image bytes (in memory and in OCR_CACHE_FILE), so logos and banners
+repeated on every page are OCR'd once, ever. Images that are too small
+(icons, spacers) or too large (hero photos) are skipped after reading
+only their header.
+"""
+import asyncio
+import atexit
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+OCR_MIN_WIDTH = int(os.getenv("OCR_MIN_WIDTH", "120"))
+OCR_MIN_HEIGHT = int(os.getenv("OCR_MIN_HEIGHT", "40"))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(4000 * 4000)))
+OCR_MIN_BYTES = int(os.getenv("OCR_MIN_BYTES", "2048"))
+OCR_CACHE_FILE = os.getenv(
+    "OCR_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "ocr_cache.json")
+)
+
+
+def ocr_image_bytes(img_bytes: bytes) -> str:
+    """
+    OCR a single image; returns "" when there is no meaningful text.
+    Runs inside the worker processes.
+    """
+    image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+    open_cv_img = np.array(image)
+    gray = cv2.cvtColor(open_cv_img, cv2.COLOR_RGB2GRAY)
+    gray = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]
+
+    text = pytesseract.image_to_string(gray)
+
+    if text and len(text.strip()) > 15:
+        return text.strip()
+    return ""
+
+
+def should_ocr(img_bytes: bytes) -> bool:
+    """
+    Cheap pre-filter: reads only the image header, never decodes pixels.
+    """
+    if len(img_bytes) < OCR_MIN_BYTES:
+        return False
+    try:
+        width, height = Image.open(io.BytesIO(img_bytes)).size
+    except Exception:
+        # Not a raster format PIL understands (SVG etc.)
+        return False
+    if width < OCR_MIN_WIDTH or height < OCR_MIN_HEIGHT:
+        return False
+    return width * height <= OCR_MAX_PIXELS
+
+
+class OcrService:
+    """
+    Process-pool OCR with a content-hash result cache.
+
+    submit() never blocks on Tesseract: it returns a Future that is
+    already resolved for cached/skipped images, and shares one in-flight
+    Future between concurrent requests for the same bytes.
+    """
+
+    def __init__(self, workers: int = None, cache_file: str = OCR_CACHE_FILE):
+        self.workers = workers or OCR_WORKERS
+        self.cache_file = cache_file
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._dirty = False
+        self.stats = {"ocr": 0, "cache_hits": 0, "skipped": 0}
+        self._results = self._load()
+
+    def _load(self) -> dict:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable OCR cache %s", self.cache_file)
+            return {}
+
+    def save(self):
+        """Persist the OCR cache (atomic replace)."""
+        with self._lock:
+            if not self.cache_file or not self._dirty:
+                return
+            snapshot = dict(self._results)
+            self._dirty = False
+        tmp = f"{self.cache_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp, self.cache_file)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, img_bytes: bytes) -> Future:
+        key = hashlib.sha256(img_bytes).hexdigest()
+
+        with self._lock:
+            if key in self._results:
+                self.stats["cache_hits"] += 1
+                return _done(self._results[key])
+            if key in self._inflight:
+                self.stats["cache_hits"] += 1
+                return self._inflight[key]
+
+        if not should_ocr(img_bytes):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return _done("")
+
+        with self._lock:
+            if key in self._inflight:
+                return self._inflight[key]
+            future = self._get_executor().submit(ocr_image_bytes, img_bytes)
+            self._inflight[key] = future
+            self.stats["ocr"] += 1
+
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._results[key] = future.result()
+            self._dirty = True
+
+    def ocr_many(self, images) -> list:
+        """OCR a batch of images in parallel; failures yield ""."""
+        futures = [self.submit(img) for img in images]
+        texts = []
+        for future in futures:
+            try:
+                texts.append(future.result())
+            except Exception as e:
+                logger.warning("OCR failed: %s", e)
+                texts.append("")
+        return texts
+
+    async def aocr_many(self, images) -> list:
+        futures = [asyncio.wrap_future(self.submit(img)) for img in images]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        texts = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning("OCR failed: %s", result)
+                texts.append("")
+            else:
+                texts.append(result)
+        return texts
+
+    def shutdown(self):
+        self.save()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def _done(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service() -> OcrService:
+    """Process-wide OcrService (cache flushed at exit)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OcrService()
+            atexit.register(_service.shutdown)
+    return _service
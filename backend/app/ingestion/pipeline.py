@@ -0,0 +1,166 @@
+"""
+Staged producer/consumer pipeline for ingestion.
+
+Each Stage has its own worker count and a bounded input queue, so a slow
+stage applies back-pressure upstream instead of letting work pile up in
+memory, and every stage runs concurrently with the others: end-to-end
+time approaches that of the slowest stage rather than the sum.
+
+A stage function takes one item and returns the item for the next stage
+(or None to drop it). Coroutine functions run on the event loop; plain
+functions run in a worker thread. Exceptions are counted per stage and
+reported through `on_error`; the item is dropped and the pipeline keeps
+going.
+
+    pipeline = Pipeline([
+        Stage("scrape", scrape, workers=4),
+        Stage("embed", embed, workers=2),
+    ])
+    await pipeline.run(urls)
+    print(pipeline.format_stats())
+"""
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = 8):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.stats = StageStats(name)
+
+    async def call(self, item):
+        if inspect.iscoroutinefunction(self.fn):
+            return await self.fn(item)
+        return await asyncio.to_thread(self.fn, item)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        # Time workers spent blocked handing results downstream
+        self.blocked_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def as_dict(self) -> dict:
+        wall = self.wall_seconds
+        return {
+            "stage": self.name,
+            "in": self.items_in,
+            "out": self.items_out,
+            "errors": self.errors,
+            "busy_s": round(self.busy_seconds, 3),
+            "blocked_s": round(self.blocked_seconds, 3),
+            "wall_s": round(wall, 3),
+            "items_per_s": round(self.items_in / wall, 2) if wall else 0.0,
+            "avg_s": round(self.busy_seconds / self.items_in, 3) if self.items_in else 0.0,
+        }
+
+
+class Pipeline:
+    def __init__(self, stages: list, on_error=None):
+        self.stages = stages
+        self.on_error = on_error or self._log_error
+        self.results = []
+        self.wall_seconds = 0.0
+
+    @staticmethod
+    def _log_error(stage, item, exc):
+        logger.warning("Stage %s failed: %s", stage.name, exc)
+
+    async def run(self, items):
+        """
+        Push `items` through every stage. Items coming out of the last
+        stage are collected in self.results.
+        """
+        started = time.perf_counter()
+        queues = [asyncio.Queue(maxsize=s.queue_size) for s in self.stages]
+        queues.append(asyncio.Queue())  # unbounded sink
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def worker(stage, inbox, outbox):
+            stats = stage.stats
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    return
+                if stats.started_at is None:
+                    stats.started_at = time.perf_counter()
+                stats.items_in += 1
+                t0 = time.perf_counter()
+                try:
+                    result = await stage.call(item)
+                except Exception as e:
+                    stats.errors += 1
+                    self.on_error(stage, item, e)
+                    continue
+                finally:
+                    stats.busy_seconds += time.perf_counter() - t0
+                if result is None:
+                    continue
+                stats.items_out += 1
+                t0 = time.perf_counter()
+                await outbox.put(result)
+                stats.blocked_seconds += time.perf_counter() - t0
+
+        async def run_stage(index):
+            stage = self.stages[index]
+            inbox, outbox = queues[index], queues[index + 1]
+            await asyncio.gather(*(worker(stage, inbox, outbox) for _ in range(stage.workers)))
+            stage.stats.finished_at = time.perf_counter()
+            # Tell every downstream worker there is nothing more to come
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await outbox.put(_DONE)
+
+        tasks = [asyncio.create_task(feed())]
+        tasks += [asyncio.create_task(run_stage(i)) for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        sink = queues[-1]
+        while not sink.empty():
+            self.results.append(sink.get_nowait())
+        self.wall_seconds = time.perf_counter() - started
+        return self.results
+
+    def stats(self) -> list:
+        return [stage.stats.as_dict() for stage in self.stages]
+
+    def format_stats(self) -> str:
+        header = f"{'stage':<10}{'in':>6}{'out':>6}{'err':>5}{'busy s':>9}{'blocked s':>11}{'items/s':>9}{'avg s':>8}"
+        lines = [header]
+        for s in self.stats():
+            lines.append(
+                f"{s['stage']:<10}{s['in']:>6}{s['out']:>6}{s['errors']:>5}"
+                f"{s['busy_s']:>9.2f}{s['blocked_s']:>11.2f}{s['items_per_s']:>9.2f}{s['avg_s']:>8.3f}"
+            )
+        lines.append(f"total wall time: {self.wall_seconds:.2f}s")
+        return "\n".join(lines)
@@ -1,10 +1,35 @@
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
-from PIL import Image
-import pytesseract
-import io
-import cv2
-import numpy as np
+from urllib.parse import urljoin
+
+from app.ingestion.faq import extract_faqs
+from app.ingestion.ocr import get_ocr_service
+
+
+def image_sources(page_url: str, srcs) -> list:
+    """
+    Absolute, de-duplicated image URLs worth fetching for OCR.
+    """
+    urls = []
+    for src in srcs:
+        if not src or src.startswith("data:"):
+            continue
+        url = urljoin(page_url, src)
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+def page_validators(response) -> dict:
+    """
+    ETag / Last-Modified of the navigation response, used for conditional
+    re-fetches during incremental ingestion.
+    """
+    headers = response.headers if response is not None else {}
+    return {
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+    }
 
 
 def scrape_url(url: str) -> dict:
@@ -21,53 +46,55 @@ def scrape_url(url: str) -> dict:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page()
 
-        page.goto(url, timeout=30000)
+        nav = page.goto(url, timeout=30000)
 
         # Wait until page fully loads
         page.wait_for_load_state("networkidle")
 
         # ---------- OCR IMAGE EXTRACTION ---------- #
-        image_texts = []
-
-        images = page.locator("img")
-        img_count = images.count()
-
-        for i in range(img_count):
+        # Raw bytes come straight from the browser context's HTTP client
+        # (shares cookies, no JS round trip); OCR runs in a process pool
+        # while the remaining images are fetched.
+        ocr = get_ocr_service()
+        srcs = page.locator("img").evaluate_all("els => els.map(e => e.getAttribute('src'))")
+
+        pending = []
+        for src in image_sources(page.url, srcs):
             try:
-                src = images.nth(i).get_attribute("src")
-                if not src or src.startswith("data:"):
-                    continue
-
-                img_bytes = page.evaluate(
-                    """async (src) => {
-                        const res = await fetch(src);
-                        const buf = await res.arrayBuffer();
-                        return Array.from(new Uint8Array(buf));
-                    }""",
-                    src
-                )
-
-                img_bytes = bytes(img_bytes)
-
-                image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                open_cv_img = np.array(image)
-                gray = cv2.cvtColor(open_cv_img, cv2.COLOR_RGB2GRAY)
-                gray = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]
-
-                text = pytesseract.image_to_string(gray)
-
-                if text and len(text.strip()) > 15:
-                    image_texts.append(text.strip())
+                img = page.request.get(src)
+                if img.ok:
+                    pending.append(ocr.submit(img.body()))
+            except Exception:
+                continue
 
+        image_texts = []
+        for future in pending:
+            try:
+                text = future.result()
             except Exception:
                 continue
+            if text:
+                image_texts.append(text)
 
         html = page.content()
+        validators = page_validators(nav)
         browser.close()
 
-    # ---------- Parse HTML ---------- #
+    data = parse_html(html, image_texts, url)
+    data.update(validators)
+    return data
+
+
+def parse_html(html: str, image_texts: list, url: str = "") -> dict:
+    """
+    Extract title, headings, main content and FAQ pairs from rendered HTML
+    (shared by the sync scraper and the async ScraperPool).
+    """
     soup = BeautifulSoup(html, "html.parser")
 
+    # Before noise removal: FAQ JSON-LD lives in <script> tags
+    faqs = extract_faqs(soup, url)
+
     # Remove noise containers
     for tag in soup(["script", "style", "nav", "footer", "header", "aside", "noscript"]):
         tag.decompose()
@@ -134,5 +161,6 @@ def scrape_url(url: str) -> dict:
         "title": title,
         "headings": headings,
         "tables": [],
+        "faqs": faqs,
         "image_texts": list(set(image_texts))
     }
@@ -0,0 +1,192 @@
+import re
+from urllib.parse import urlparse
+
+# Service / page-type tags for chunks, and the matching query-side filter.
+#
+# i95Dev's services are storefront <-> ERP connectors (Magento + Dynamics
+# GP, Shopify + NAV, ...). Every chunk is tagged at ingest time with
+#   platforms  — storefronts the page is about   e.g. ["magento"]
+#   erps       — ERPs the page is about          e.g. ["dynamics-gp"]
+#   service    — primary "<platform>-<erp>" pair, for tracing / display
+#   page_type  — from the URL structure (success-story, ebook, connector, ...)
+# Pages about no particular platform/ERP get the GENERAL sentinel, so a
+# query about one service filters out pages about *other* services while
+# still matching company-wide content.
+
+GENERAL = "general"
+
+# Long forms match anywhere, case-insensitively. Acronyms ("BC", "GP") are
+# case-sensitive in page text (where "nav"/"ax" are ordinary words) but not
+# in user queries, which are often typed in lower case.
+PLATFORMS = {
+    "magento": (r"magento|adobe commerce", ()),
+    "shopify": (r"shopify", ()),
+    "bigcommerce": (r"big ?commerce", ()),
+    "salesforce": (r"salesforce", ()),
+}
+
+ERPS = {
+    "business-central": (r"business central|d365 ?bc|dynamics 365 bc", ("BC",)),
+    "dynamics-gp": (r"dynamics gp|great plains", ("GP",)),
+    "dynamics-nav": (r"dynamics nav|navision", ("NAV",)),
+    "dynamics-ax": (r"dynamics ax", ("AX",)),
+    "sap-business-one": (r"sap (?:business one|business 1|b1)", ("B1",)),
+    "netsuite": (r"net ?suite", ()),
+    "quickbooks": (r"quick ?books", ()),
+}
+
+# First matching URL path prefix wins; connector product pages are matched
+# on the slug below
+PAGE_TYPES = [
+    ("/resources/success-stories/", "success-story"),
+    ("/resources/ebooks/", "ebook"),
+    ("/resources/webinars/", "webinar"),
+    ("/resources/whitepapers/", "whitepaper"),
+    ("/resources/ecommerce-news/", "news"),
+    ("/resources/", "resource"),
+    ("/faq/", "faq"),
+    ("/use-cases/", "use-case"),
+    ("/deep-dives/", "guide"),
+    ("/category/", "blog"),
+    ("/blog/", "blog"),
+]
+COMPANY_PAGES = {
+    "about-us", "contact", "culture", "our-partners", "become-a-partner",
+    "become-a-i95dev-partner", "request-a-demo", "join-ai-integration-waitlist",
+}
+SERVICE_PAGES = {"ecommerce-services"}
+
+# Page types a question can explicitly ask for
+QUERY_PAGE_TYPES = {
+    "success-story": r"success stor(?:y|ies)|case stud(?:y|ies)",
+    "ebook": r"e-?books?",
+    "webinar": r"webinars?",
+    "whitepaper": r"white ?papers?",
+}
+
+# Weight of a mention by where it appears. The URL, title and headings
+# decide; body text (boilerplate cross-links to every other connector
+# included) only tags a field they say nothing about, and needs
+# TAG_MIN_SCORE mentions to do so.
+URL_WEIGHT = 3
+TITLE_WEIGHT = 3
+HEADING_WEIGHT = 2
+TAG_MIN_SCORE = 3
+
+
+def _compile(table, acronyms_case_sensitive):
+    compiled = {}
+    for tag, (long_form, acronyms) in table.items():
+        patterns = [re.compile(rf"\b(?:{long_form})\b", re.IGNORECASE)]
+        if acronyms:
+            flags = 0 if acronyms_case_sensitive else re.IGNORECASE
+            patterns.append(re.compile(rf"\b(?:{'|'.join(acronyms)})\b", flags))
+        compiled[tag] = patterns
+    return compiled
+
+
+_PAGE_PATTERNS = {
+    "platforms": _compile(PLATFORMS, True),
+    "erps": _compile(ERPS, True),
+}
+_QUERY_PATTERNS = {
+    "platforms": _compile(PLATFORMS, False),
+    "erps": _compile(ERPS, False),
+}
+_QUERY_PAGE_TYPES = {
+    page_type: re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)
+    for page_type, pattern in QUERY_PAGE_TYPES.items()
+}
+
+
+def _mentions(patterns, text):
+    return sum(len(p.findall(text)) for p in patterns)
+
+
+def page_type_for(url):
+    path = urlparse(url).path or "/"
+    for prefix, page_type in PAGE_TYPES:
+        if path.startswith(prefix):
+            return page_type
+    slug = path.strip("/").split("/")[-1]
+    if "erp-integration/" in path or slug.endswith("-connect"):
+        return "connector"
+    if slug in COMPANY_PAGES:
+        return "company"
+    if slug in SERVICE_PAGES:
+        return "service"
+    return "article"
+
+
+def tag_page(url, title="", headings=(), text=""):
+    """
+    Tags for every chunk of a page, from its URL, title and headings,
+    falling back to body text for a field they don't mention.
+    """
+    slug = urlparse(url).path.replace("-", " ").replace("/", " ")
+    heading_texts = [h.get("text", "") if isinstance(h, dict) else str(h) for h in headings]
+    # The scraper's headings usually repeat the title
+    heading_texts = [h for h in heading_texts if h and h != title]
+
+    tags = {}
+    for field, table in _PAGE_PATTERNS.items():
+        scores = {}
+        for tag, patterns in table.items():
+            score = (
+                URL_WEIGHT * min(_mentions(patterns, slug), 1)
+                + TITLE_WEIGHT * min(_mentions(patterns, title or ""), 1)
+                + HEADING_WEIGHT * sum(min(_mentions(patterns, h), 1) for h in heading_texts)
+            )
+            if score:
+                scores[tag] = score
+        if not scores and text:
+            for tag, patterns in table.items():
+                mentions = _mentions(patterns, text)
+                if mentions >= TAG_MIN_SCORE:
+                    scores[tag] = mentions
+        tags[field] = sorted(scores, key=scores.get, reverse=True) or [GENERAL]
+
+    primary = [values[0] for values in (tags["platforms"], tags["erps"]) if values[0] != GENERAL]
+    return {
+        "service": "-".join(primary) or GENERAL,
+        "platforms": tags["platforms"],
+        "erps": tags["erps"],
+        "page_type": page_type_for(url),
+    }
+
+
+def query_tags(query):
+    """Platforms / ERPs a question names, by field ("platforms", "erps")."""
+    query = query or ""
+    return {
+        field: [tag for tag, patterns in table.items() if _mentions(patterns, query)]
+        for field, table in _QUERY_PATTERNS.items()
+    }
+
+
+def strip_mentions(text, fields):
+    """`text` with every platform / ERP name of the given fields removed."""
+    for field in fields:
+        for patterns in _QUERY_PATTERNS[field].values():
+            for pattern in patterns:
+                text = pattern.sub(" ", text)
+    return text
+
+
+def query_filter(query):
+    """
+    Metadata filter (Pinecone syntax) for the services / page type a
+    question names, or None when it names none. Platform and ERP
+    conditions also admit GENERAL pages; a requested page type is exact.
+    """
+    query = query or ""
+    conditions = {}
+    for field, found in query_tags(query).items():
+        if found:
+            conditions[field] = {"$in": found + [GENERAL]}
+
+    page_types = [t for t, pattern in _QUERY_PAGE_TYPES.items() if pattern.search(query)]
+    if page_types:
+        conditions["page_type"] = {"$in": page_types}
+
+    return conditions or None
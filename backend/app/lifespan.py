@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+import numpy as np
+
+from app.embeddings import embedder
+from app.llm import groq_client
+from app.memory.conversation_store import conversation_store
+from app.retrieval import bm25
+from app.retrieval.faq_index import faq_index
+from app.vectorstore import vector_store
+
+# Process-wide resources for the API, managed by the FastAPI lifespan.
+#
+# Everything that used to happen lazily on the first chat after a deploy or
+# cold start (Pinecone client + index lookup, HF / Groq connection setup,
+# BM25 / FAQ load, a cold HF model) is done by a background warm-up task started
+# at startup, so the port binds immediately and the first user request finds
+# open keep-alive connections. Each component's state is reported by
+# /ready; /health stays a plain liveness check.
+#
+# WARMUP_QUERIES=1 also sends one throwaway request per upstream (an
+# embedding, a top-1 vector query, Groq's model list); with 0 only clients
+# and the index are set up. Failed components are retried every
+# WARMUP_RETRY_SECONDS until they succeed. Shared clients are closed on
+# shutdown.
+
+WARMUP_QUERIES = os.getenv("WARMUP_QUERIES", "1") == "1"
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "What services does i95Dev offer?")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "15"))
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self, components):
+        self.components = {
+            name: {"status": "pending", "seconds": None, "detail": None}
+            for name in components
+        }
+
+    @property
+    def ready(self):
+        return all(c["status"] == "ok" for c in self.components.values())
+
+    def pending(self):
+        return [name for name, c in self.components.items() if c["status"] != "ok"]
+
+    def record(self, name, status, seconds, detail=None):
+        self.components[name] = {
+            "status": status,
+            "seconds": round(seconds, 3),
+            "detail": detail,
+        }
+
+    def as_dict(self):
+        return {
+            "status": "ready" if self.ready else "starting",
+            "components": self.components,
+        }
+
+
+READINESS = Readiness(["bm25", "faq", "vector_store", "embeddings", "llm"])
+
+
+def _load_bm25():
+    index = bm25.get_index()
+    if index is None:
+        return "no index built — retrieval is vector-only"
+    return f"{len(index)} chunks, {len(index.vocab)} terms"
+
+
+async def _load_faqs():
+    if faq_index is None:
+        return "disabled"
+    count = await asyncio.to_thread(faq_index.load)
+    # Question embeddings enable paraphrase matches (one batched call)
+    await faq_index.aembed()
+    return f"{count} Q/A pairs"
+
+
+def _connect_vector_store():
+    vector_store.connect()
+    if WARMUP_QUERIES:
+        # Any non-zero vector will do; this opens the data-plane connection
+        probe = np.full(embedder.EMBEDDING_DIM, embedder.EMBEDDING_DIM ** -0.5, dtype=np.float32)
+        vector_store.query_embedding(probe, 1)
+    return vector_store.VECTOR_STORE
+
+
+async def _warm_embeddings():
+    if WARMUP_QUERIES:
+        await embedder.aembed_texts([WARMUP_QUERY])
+    return embedder.EMBEDDING_BACKEND
+
+
+async def _warm_llm():
+    if WARMUP_QUERIES:
+        await groq_client.awarm_up()
+    return "groq"
+
+
+CHECKS = {
+    "bm25": lambda: asyncio.to_thread(_load_bm25),
+    "faq": _load_faqs,
+    "vector_store": lambda: asyncio.to_thread(_connect_vector_store),
+    "embeddings": _warm_embeddings,
+    "llm": _warm_llm,
+}
+
+
+async def _check(name):
+    start = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(CHECKS[name](), WARMUP_TIMEOUT)
+    except Exception as e:
+        READINESS.record(name, "error", time.perf_counter() - start, f"{type(e).__name__}: {e}")
+        logger.warning(f"Warm-up {name} failed: {e}")
+        return
+    READINESS.record(name, "ok", time.perf_counter() - start, detail)
+    logger.info(f"Warm-up {name}: {time.perf_counter() - start:.2f}s {detail or ''}".rstrip())
+
+
+async def warm_up():
+    """Bring every component up concurrently, retrying failures until all are ready."""
+    while True:
+        await asyncio.gather(*(_check(name) for name in READINESS.pending()))
+        if READINESS.ready:
+            logger.info("API ready")
+            return
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+async def close_clients():
+    for close in (groq_client.aclose, embedder.aclose):
+        try:
+            await close()
+        except Exception as e:
+            logger.warning(f"Error closing client: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        pruned = conversation_store.prune()
+        if pruned:
+            logger.info(f"Pruned {pruned} expired conversation(s)")
+    except Exception as e:
+        logger.warning(f"Could not prune conversations: {e}")
+
+    # Not awaited here: startup (and port binding) must not wait on the network
+    task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        await close_clients()
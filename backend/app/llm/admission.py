@@ -0,0 +1,276 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+from .prompt_builder import estimate_tokens, context_tokens
+from ..utils.metrics import ADMISSION_EVENTS, STAGE_SECONDS
+
+# Admission control in front of Groq generation.
+#
+# Without it a traffic spike fans out straight into Groq, trips its rate
+# limits and every request fails. Each generation now needs:
+#   - a request from the GROQ_RPM bucket and its estimated tokens (prompt +
+#     ADMISSION_COMPLETION_TOKENS) from the GROQ_TPM bucket; buckets refill
+#     continuously and hold ADMISSION_BURST_SECONDS worth of budget
+#   - one of ADMISSION_MAX_IN_FLIGHT generation slots
+# so the API sends Groq at most what it accepts. Requests that can't go
+# now wait in a bounded queue (ADMISSION_QUEUE_SIZE, at most
+# ADMISSION_MAX_QUEUED_PER_CLIENT per client) served round-robin across
+# clients (session ID, else IP), so one busy client can't starve the rest.
+#
+# A request is rejected straight away (Overloaded -> 429 with Retry-After)
+# when the queue is full, or when the buckets can't serve it within
+# ADMISSION_MAX_WAIT seconds; one that is still queued at its deadline is
+# rejected then. Retry-After is the longer of the bucket refill time and
+# the time for the in-flight slots to work through the queue (queue
+# position x mean slot hold time / slots). A 429 from Groq itself pauses
+# admission for its Retry-After.
+#
+# Runs on the API's event loop; no locking needed.
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+GROQ_RPM = float(os.getenv("GROQ_RPM", "1000"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "300000"))
+ADMISSION_BURST_SECONDS = float(os.getenv("ADMISSION_BURST_SECONDS", "10"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "256"))
+ADMISSION_MAX_QUEUED_PER_CLIENT = int(os.getenv("ADMISSION_MAX_QUEUED_PER_CLIENT", "4"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+ADMISSION_COMPLETION_TOKENS = int(os.getenv("ADMISSION_COMPLETION_TOKENS", "700"))
+# System prompt and message framing, not counted by estimate_tokens()
+PROMPT_OVERHEAD_TOKENS = 700
+# Slot hold time assumed until generations have been timed, and the weight
+# of each new one in the moving average
+DEFAULT_HOLD_SECONDS = 5.0
+HOLD_SMOOTHING = 0.1
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after, reason):
+        super().__init__(f"Overloaded ({reason}), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst_seconds=ADMISSION_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now=None):
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(time.monotonic() if now is None else now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def pause(self, seconds):
+        """Empty the bucket so nothing is taken for `seconds`."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class Slot:
+    """An admitted generation; release() exactly once (idempotent)."""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self.released = False
+        self.acquired_at = time.monotonic()
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._controller._release(time.monotonic() - self.acquired_at)
+
+
+class _Waiter:
+    def __init__(self, client, tokens, future):
+        self.client = client
+        self.tokens = tokens
+        self.future = future
+
+
+class AdmissionController:
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM, max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+                 queue_size=ADMISSION_QUEUE_SIZE, per_client=ADMISSION_MAX_QUEUED_PER_CLIENT,
+                 max_wait=ADMISSION_MAX_WAIT):
+        self.requests = TokenBucket(rpm)
+        self.token_budget = TokenBucket(tpm)
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.per_client = per_client
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.mean_hold = DEFAULT_HOLD_SECONDS
+        self._queues = OrderedDict()  # client -> deque of waiters, in round-robin order
+        self._queued = 0
+        self._queued_tokens = 0
+        self._timer = None
+
+    def _wait_time(self, tokens):
+        return max(self.requests.wait_time(1), self.token_budget.wait_time(tokens))
+
+    def _admit(self, tokens):
+        self.requests.take(1)
+        self.token_budget.take(tokens)
+        self.in_flight += 1
+        return Slot(self)
+
+    def _retry_after(self, tokens):
+        # Time for the buckets to serve everything queued ahead plus this one
+        budget_wait = max(
+            (self._queued + 1 - self.requests.tokens) / self.requests.rate,
+            (self._queued_tokens + tokens - self.token_budget.tokens) / self.token_budget.rate,
+        )
+        # ... and for the slots to free up for it
+        slot_wait = 0.0
+        if self._queued or self.in_flight >= self.max_in_flight:
+            slot_wait = (self._queued + 1) * self.mean_hold / self.max_in_flight
+        return max(1, math.ceil(max(budget_wait, slot_wait)))
+
+    def _reject(self, tokens, reason):
+        ADMISSION_EVENTS.inc(outcome=f"rejected_{reason}")
+        raise Overloaded(self._retry_after(tokens), reason)
+
+    async def acquire(self, client, tokens):
+        """
+        Wait for a generation slot. Raises Overloaded when the request
+        can't be admitted within max_wait.
+        """
+        wait = self._wait_time(tokens)
+        if not self._queued and self.in_flight < self.max_in_flight and wait == 0:
+            ADMISSION_EVENTS.inc(outcome="admitted")
+            return self._admit(tokens)
+
+        if self._queued >= self.queue_size:
+            self._reject(tokens, "queue_full")
+        queue = self._queues.get(client)
+        if queue is not None and len(queue) >= self.per_client:
+            self._reject(tokens, "client_queue_full")
+        if self._retry_after(tokens) > self.max_wait:
+            self._reject(tokens, "rate_limit")
+
+        waiter = _Waiter(client, tokens, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        self._queued_tokens += tokens
+        self._dispatch()
+
+        start = time.perf_counter()
+        try:
+            slot = await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the deadline passed
+                return waiter.future.result()
+            ADMISSION_EVENTS.inc(outcome="rejected_deadline")
+            raise Overloaded(self._retry_after(tokens), "deadline")
+        except asyncio.CancelledError:
+            # Client went away while queued
+            self._remove(waiter)
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release()
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="admission_wait")
+        ADMISSION_EVENTS.inc(outcome="queued")
+        return slot
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            self._queued_tokens -= waiter.tokens
+            if not queue:
+                del self._queues[waiter.client]
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    def _dispatch(self):
+        """Admit queued requests round-robin across clients while capacity lasts."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queues and self.in_flight < self.max_in_flight:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            wait = self._wait_time(waiter.tokens)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            queue.popleft()
+            self._queued -= 1
+            self._queued_tokens -= waiter.tokens
+            # This client goes to the back of the rotation
+            del self._queues[client]
+            if queue:
+                self._queues[client] = queue
+            waiter.future.set_result(self._admit(waiter.tokens))
+
+    def _release(self, held):
+        self.in_flight -= 1
+        self.mean_hold += HOLD_SMOOTHING * (held - self.mean_hold)
+        if self._queues:
+            self._dispatch()
+
+    def try_take(self, tokens):
+        """Budget for an extra request (a hedge) if it's available right now; no slot."""
+        if self._queued or self._wait_time(tokens) > 0:
+            return False
+        self.requests.take(1)
+        self.token_budget.take(tokens)
+        return True
+
+    def backoff(self, seconds):
+        """Groq answered 429: admit nothing for `seconds`."""
+        ADMISSION_EVENTS.inc(outcome="upstream_429")
+        self.requests.pause(seconds)
+        if self._queues:
+            self._dispatch()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "queued_clients": len(self._queues),
+            "mean_hold_seconds": round(self.mean_hold, 2),
+            "request_budget": round(self.requests.tokens, 1),
+            "token_budget": round(self.token_budget.tokens),
+        }
+
+
+def estimate_request_tokens(query, context, history):
+    """Tokens a generation will count against GROQ_TPM (prompt + completion allowance)."""
+    prompt = estimate_tokens(query) + context_tokens(context) + sum(
+        estimate_tokens(m.get("content")) for m in history
+    )
+    return prompt + PROMPT_OVERHEAD_TOKENS + ADMISSION_COMPLETION_TOKENS
+
+
+def upstream_retry_after(exc):
+    """Retry-After seconds of a Groq rate-limit error, or None if it isn't one."""
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    try:
+        return max(1.0, float(response.headers.get("retry-after", 1)))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+admission = AdmissionController() if ADMISSION_ENABLED else None
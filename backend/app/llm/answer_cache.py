@@ -0,0 +1,133 @@
+
+import os
+import re
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+from ..utils.cache import register_cache, current_generation
+
+# Semantic answer cache for first-turn questions.
+#
+# With no history the answer is a function of (question, retrieved chunks),
+# so a new question whose embedding is within ANSWER_CACHE_THRESHOLD cosine
+# of a cached one *and* that retrieved the same chunks reuses the cached
+# answer instead of calling Groq. Chunks are compared by ID and a digest of
+# their text, so an answer is never served over chunks whose content has
+# changed since, even before a re-index reaches this process as a cache
+# generation bump (which drops everything). Lookup is one matrix-vector
+# product over a preallocated (size x 384) matrix. Entries expire after
+# ANSWER_CACHE_TTL and the least recently used entry is evicted when full.
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "21600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+DIMENSION = 384
+
+
+def _chunks_key(chunk_ids, chunks):
+    return tuple(sorted(
+        (chunk_id, hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest())
+        for chunk_id, text in zip(chunk_ids, chunks)
+    ))
+
+
+class SemanticAnswerCache:
+
+    def __init__(self, name="answers", maxsize=ANSWER_CACHE_SIZE,
+                 ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((maxsize, DIMENSION), dtype=np.float32)
+        self._expires = np.zeros(maxsize, dtype=np.float64)  # 0 = empty slot
+        self._last_used = np.zeros(maxsize, dtype=np.float64)
+        self._chunk_ids = [None] * maxsize
+        self._answers = [None] * maxsize
+        self._generation = current_generation()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def _sync_generation(self):
+        generation = current_generation()
+        if generation != self._generation:
+            self._generation = generation
+            self._expires[:] = 0
+
+    @staticmethod
+    def _unit(query_vec):
+        vec = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def lookup(self, query_vec, chunk_ids, chunks):
+        """Cached answer for a near-identical question over the same chunks, or None."""
+        if not self.enabled:
+            return None
+        key = _chunks_key(chunk_ids, chunks)
+        query = self._unit(query_vec)
+        now = time.monotonic()
+
+        with self._lock:
+            self._sync_generation()
+            scores = self._matrix @ query
+            scores[self._expires <= now] = -1.0
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                if self._chunk_ids[slot] == key:
+                    self._last_used[slot] = now
+                    self.hits += 1
+                    return self._answers[slot]
+            self.misses += 1
+            return None
+
+    def store(self, query_vec, chunk_ids, chunks, answer, ttl=None):
+        if not self.enabled or not answer:
+            return
+        now = time.monotonic()
+
+        with self._lock:
+            self._sync_generation()
+            free = np.flatnonzero(self._expires <= now)
+            if len(free):
+                slot = free[0]
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._matrix[slot] = self._unit(query_vec)
+            self._expires[slot] = now + (self.ttl if ttl is None else ttl)
+            self._last_used[slot] = now
+            self._chunk_ids[slot] = _chunks_key(chunk_ids, chunks)
+            self._answers[slot] = answer
+
+    def clear_local(self):
+        with self._lock:
+            self._expires[:] = 0
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "size": int(np.count_nonzero(self._expires > time.monotonic())),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+answer_cache = register_cache(SemanticAnswerCache())
+
+
+def replay(answer):
+    """Split a cached answer into word-sized pieces for streaming."""
+    return re.findall(r"\S+\s*|\s+", answer)
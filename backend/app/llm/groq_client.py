@@ -1,6 +1,46 @@
-from groq import Groq
+import os
+import time
+import asyncio
+import logging
+from contextlib import suppress
 
-client = Groq()
+import httpx
+from groq import Groq, AsyncGroq, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+from .admission import admission, ADMISSION_COMPLETION_TOKENS
+from .prompt_builder import build_messages, estimate_tokens
+from .router import choose_model
+from ..utils.metrics import STAGE_SECONDS, PROMPT_TOKENS, GENERATION_TOKENS_PER_SECOND, HEDGE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive connection pool per client, shared by every request in
+# the process. httpx drops idle connections after 5s by default, so chats
+# a few seconds apart each paid a fresh TLS handshake to Groq.
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+
+_limits = httpx.Limits(
+    max_connections=GROQ_MAX_CONNECTIONS,
+    max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+    keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+)
+
+# Hedged streams: when the first token hasn't arrived after
+# HEDGE_TTFT_SECONDS, the same request is sent again and whichever stream
+# produces a token first is used; the other is closed. That bounds the tail
+# TTFT that a slow Groq replica or a stalled connection would otherwise cause.
+# Hedges are capped at HEDGE_MAX_RATIO of streams (with a small burst) and
+# only fire when admission control (admission.py) has request / token budget
+# to spare right now. 0 disables hedging.
+HEDGE_TTFT_SECONDS = float(os.getenv("HEDGE_TTFT_SECONDS", "1.5"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+HEDGE_BURST = 5
+
+_hedge_credit = float(HEDGE_BURST)
+
+client = Groq(http_client=DefaultHttpxClient(limits=_limits))
+async_client = AsyncGroq(http_client=DefaultAsyncHttpxClient(limits=_limits))
 
 SYSTEM_PROMPT = """You are an AI assistant for i95Dev, a B2B eCommerce, ERP, and system integration company.
 
@@ -45,39 +85,192 @@ Provide accurate, grounded, and trustworthy explanations of i95Dev’s services
 
 
 
+# -------------------------
+# PROMPT MESSAGES
+# -------------------------
+
+def _build_messages(query: str, context, history: list):
+    """
+    Token-budgeted messages (trims/compacts history and dedupes context
+    chunks) and the model to send them to, routed on the context kept.
+    """
+    with STAGE_SECONDS.time(stage="prompt_build"):
+        messages, stats = build_messages(SYSTEM_PROMPT, query, context, history)
+    PROMPT_TOKENS.observe(stats["prompt_tokens"])
+    return messages, choose_model(query, stats["context_tokens"], history)
+
+
+def _log_usage(usage):
+    if usage is not None:
+        logger.info(
+            "GROQ usage: prompt=%s completion=%s",
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+        )
+
+
+def _stream_usage(chunk):
+    # Groq reports usage on the final stream chunk under x_groq
+    return getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+
+def _observe_generation(start, first_token_at, tokens):
+    end = time.perf_counter()
+    STAGE_SECONDS.observe(end - start, stage="llm_generation")
+    if first_token_at is not None and tokens and end > first_token_at:
+        GENERATION_TOKENS_PER_SECOND.observe(tokens / (end - first_token_at))
+
+
+def _take_hedge(messages):
+    global _hedge_credit
+    if _hedge_credit < 1:
+        return False
+    if admission is not None:
+        tokens = sum(estimate_tokens(m["content"]) for m in messages) + ADMISSION_COMPLETION_TOKENS
+        if not admission.try_take(tokens):
+            return False
+    _hedge_credit -= 1
+    return True
+
+
+class _Attempt:
+    """One streaming request, read a content token at a time."""
+
+    def __init__(self, model, messages):
+        self.model = model
+        self.messages = messages
+        self.completion = None
+        self.usage = None
+
+    async def start(self):
+        """Send the request; returns the first content token."""
+        self.completion = await async_client.chat.completions.create(
+            model=self.model,
+            messages=self.messages,
+            temperature=0.2,
+            stream=True
+        )
+        return await self.next_token()
+
+    async def next_token(self):
+        """The next content token, or None at the end of the stream."""
+        while True:
+            try:
+                chunk = await self.completion.__anext__()
+            except StopAsyncIteration:
+                return None
+            self.usage = _stream_usage(chunk) or self.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content
+
+    async def close(self):
+        # Closing the HTTP response tells Groq to stop generating
+        if self.completion is not None:
+            await self.completion.close()
+
+
+async def _afirst_token(model, messages):
+    """
+    Start the stream and wait for its first token, hedging after
+    HEDGE_TTFT_SECONDS. Returns the winning attempt and its first token.
+    """
+    global _hedge_credit
+    primary = _Attempt(model, messages)
+    if HEDGE_TTFT_SECONDS <= 0:
+        try:
+            return primary, await primary.start()
+        except BaseException:
+            await primary.close()
+            raise
+
+    _hedge_credit = min(HEDGE_BURST, _hedge_credit + HEDGE_MAX_RATIO)
+    attempts = {asyncio.create_task(primary.start()): primary}
+    winner = None
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=HEDGE_TTFT_SECONDS)
+        if not done:
+            if _take_hedge(messages):
+                HEDGE_EVENTS.inc(outcome="fired")
+                backup = _Attempt(model, messages)
+                attempts[asyncio.create_task(backup.start())] = backup
+            else:
+                HEDGE_EVENTS.inc(outcome="skipped_budget")
+
+        # First attempt to produce a token wins; errors only count when all fail
+        pending, errors = set(attempts), []
+        while winner is None and pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    break
+                errors.append(task.exception())
+        if winner is None:
+            raise errors[0]
+
+        if len(attempts) > 1:
+            HEDGE_EVENTS.inc(outcome="primary_won" if attempts[winner] is primary else "backup_won")
+        return attempts[winner], winner.result()
+    finally:
+        for task, attempt in attempts.items():
+            if task is not winner:
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+                with suppress(Exception):
+                    await attempt.close()
+
+
+async def awarm_up():
+    """Open a pooled connection to Groq and check the API key, without generating."""
+    await async_client.models.list()
+
+
+async def aclose():
+    await async_client.close()
+
+
+async def acomplete(messages: list, model: str, max_tokens: int = 64) -> str:
+    """Short deterministic completion, e.g. on a small model for query rewriting."""
+    completion = await async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0,
+        max_tokens=max_tokens
+    )
+    return completion.choices[0].message.content or ""
+
+
 # -------------------------
 # NON-STREAMING RESPONSE
 # -------------------------
 
-def generate_response(query: str, context: str, history: list) -> str:
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "system",
-            "content": f"Relevant i95Dev context:\n{context}"
-        }
-    ]
-
-    # 🔥 Proper short-term memory
-    for msg in history:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-
-    # 🔥 Add current user question normally
-    messages.append({
-        "role": "user",
-        "content": query
-    })
+def generate_response(query: str, context: list, history: list) -> str:
 
+    messages, model = _build_messages(query, context, history)
     completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+        model=model,
         messages=messages,
         temperature=0.2
     )
 
+    _log_usage(getattr(completion, "usage", None))
+    return completion.choices[0].message.content
+
+
+async def agenerate_response(query: str, context: list, history: list) -> str:
+
+    messages, model = _build_messages(query, context, history)
+    start = time.perf_counter()
+    completion = await async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.2
+    )
+
+    usage = getattr(completion, "usage", None)
+    _log_usage(usage)
+    _observe_generation(start, start, getattr(usage, "completion_tokens", 0))
     return completion.choices[0].message.content
 
 
@@ -85,37 +278,52 @@ def generate_response(query: str, context: str, history: list) -> str:
 # STREAMING RESPONSE
 # -------------------------
 
-def stream_response(query: str, context: str, history: list):
-
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "system",
-            "content": f"Relevant i95Dev context:\n{context}"
-        }
-    ]
-
-    # 🔥 Preserve short-term memory
-    for msg in history:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-
-    # 🔥 Current question only
-    messages.append({
-        "role": "user",
-        "content": query
-    })
+def stream_response(query: str, context: list, history: list):
 
+    messages, model = _build_messages(query, context, history)
     completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+        model=model,
         messages=messages,
         temperature=0.2,
         stream=True
     )
 
     for chunk in completion:
+        _log_usage(_stream_usage(chunk))
+        if not chunk.choices:
+            continue
         delta = chunk.choices[0].delta.content
         if delta:
             yield delta
+
+
+async def astream_response(query: str, context: list, history: list):
+    """
+    Async token stream via AsyncGroq — keeps the event loop free while
+    waiting on Groq, so one worker can serve many chats concurrently.
+    The model is routed by complexity (router.py) and a slow first token
+    is hedged (HEDGE_TTFT_SECONDS).
+    """
+
+    messages, model = _build_messages(query, context, history)
+    start = time.perf_counter()
+    attempt, token = await _afirst_token(model, messages)
+
+    first_token_at = None
+    tokens = 0
+    try:
+        while token is not None:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                STAGE_SECONDS.observe(first_token_at - start, stage="llm_ttft")
+            tokens += 1
+            yield token
+            token = await attempt.next_token()
+
+        _log_usage(attempt.usage)
+        _observe_generation(
+            start, first_token_at, getattr(attempt.usage, "completion_tokens", None) or tokens
+        )
+    finally:
+        # Also stops generation when the consumer goes away early (client disconnect)
+        await attempt.close()
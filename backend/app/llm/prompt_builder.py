@@ -0,0 +1,182 @@
+
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Token-budgeted prompt assembly.
+#
+# Token counts use a fast local approximation of Llama-style BPE (words split
+# into <=6-char pieces, punctuation counted separately) — within ~10-15% on
+# English prose, which is plenty for budgeting.
+#
+#   CONTEXT_TOKEN_BUDGET  retrieved chunks, in rank order, whole chunks only
+#   HISTORY_TOKEN_BUDGET  most recent turns kept verbatim; older turns are
+#                         compacted into a short "earlier in this
+#                         conversation" note (at most SUMMARY_TOKEN_BUDGET)
+# Context chunks whose text is already present in the history (e.g. quoted in
+# an earlier answer) or duplicated within the context are dropped.
+#
+# History entries with role "system" carry an earlier summary (sessions in
+# conversation_store.py compact old turns the same way); their lines are
+# merged ahead of the ones compacted here.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "200"))
+DUPLICATE_OVERLAP = 0.8  # share of a chunk's 5-word shingles already seen
+
+_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def _message_tokens(message):
+    # ~4 tokens of chat-template overhead per message
+    return estimate_tokens(message["content"]) + 4
+
+
+def _shingles(text, n=5):
+    words = _WORD_RE.findall((text or "").lower())
+    return {tuple(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+
+
+def _split_chunks(context):
+    # Chunk texts can span lines (tables, lists); a plain string is one chunk
+    if isinstance(context, str):
+        context = [context]
+    return [c for c in context if c and c.strip()]
+
+
+def context_tokens(context):
+    """Estimated tokens of retrieved context (chunk texts or one string)."""
+    return sum(estimate_tokens(c) for c in _split_chunks(context))
+
+
+def select_context(chunks, history, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Keep chunks in rank order within the token budget, skipping ones that
+    are (near-)duplicates of earlier chunks or of the conversation history.
+    """
+    seen = set()
+    for msg in history:
+        seen |= _shingles(msg["content"])
+
+    kept, dropped, used = [], 0, 0
+    for chunk in chunks:
+        shingles = _shingles(chunk)
+        overlap = len(shingles & seen) / len(shingles) if shingles else 1.0
+        tokens = estimate_tokens(chunk)
+        if overlap >= DUPLICATE_OVERLAP or (kept and used + tokens > budget):
+            dropped += 1
+            continue
+        kept.append(chunk)
+        seen |= shingles
+        used += tokens
+    return kept, dropped
+
+
+def _first_sentence(text, limit=160):
+    sentence = _SENTENCE_RE.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def summary_lines(messages):
+    """One "- User asked: <first sentence>" line per message."""
+    lines = []
+    for msg in messages:
+        who = "User asked" if msg["role"] == "user" else "Assistant answered"
+        lines.append(f"- {who}: {_first_sentence(msg['content'])}")
+    return lines
+
+
+def fit_lines(lines, budget=SUMMARY_TOKEN_BUDGET):
+    """The most recent lines that fit the token budget, in order."""
+    kept, used = [], 0
+    for line in reversed(lines):
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+def compact_history(history, budget=HISTORY_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET,
+                    earlier=()):
+    """
+    Keep the most recent turns that fit the budget verbatim and compact the
+    rest into a short note, after any `earlier` summary lines. Returns
+    (recent_messages, summary_or_None).
+    """
+    recent, used = [], 0
+    for msg in reversed(history):
+        tokens = _message_tokens(msg)
+        if used + tokens > budget:
+            break
+        recent.append(msg)
+        used += tokens
+    recent.reverse()
+
+    older = history[:len(history) - len(recent)]
+    lines = fit_lines(list(earlier) + summary_lines(older), summary_budget)
+    if not lines:
+        return recent, None
+    return recent, "Earlier in this conversation:\n" + "\n".join(lines)
+
+
+def build_messages(system_prompt, query, context, history):
+    """
+    Assemble the chat messages within the token budgets.
+    Returns (messages, stats) where stats holds estimated token counts.
+    """
+    earlier = [
+        line
+        for msg in history
+        if msg.get("role") == "system" and msg.get("content")
+        for line in msg["content"].splitlines()
+        if line.strip()
+    ]
+    history = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in history
+        if msg.get("content") and msg.get("role") != "system"
+    ]
+    recent, summary = compact_history(history, earlier=earlier)
+    chunks, dropped_chunks = select_context(_split_chunks(context), recent)
+    context_text = "\n".join(chunks)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "system",
+            "content": f"Relevant i95Dev context:\n{context_text}"
+        }
+    ]
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    messages.extend(recent)
+    messages.append({"role": "user", "content": query})
+
+    stats = {
+        "prompt_tokens": sum(_message_tokens(m) for m in messages),
+        "context_tokens": estimate_tokens(context_text),
+        "history_tokens": sum(_message_tokens(m) for m in recent),
+        "summary_tokens": estimate_tokens(summary) if summary else 0,
+        "context_chunks": len(chunks),
+        "dropped_chunks": dropped_chunks,
+        "history_turns": len(recent),
+        "compacted_turns": len(history) - len(recent) + len(earlier),
+    }
+    logger.info(
+        "PROMPT ~%(prompt_tokens)d tokens (context=%(context_tokens)d in "
+        "%(context_chunks)d chunks, %(dropped_chunks)d dropped; history=%(history_tokens)d "
+        "in %(history_turns)d turns, %(compacted_turns)d compacted)", stats
+    )
+    return messages, stats
@@ -0,0 +1,61 @@
+import os
+import re
+
+from ..utils.metrics import MODEL_ROUTES
+
+# Model routing: the 70B model for questions that need it, a small fast
+# model for the rest.
+#
+# Most traffic is greetings and short single-fact lookups ("what is BC?",
+# "do you have a Shopify connector?") over a few retrieved chunks; the 8B
+# model answers those as well as the 70B one at a fraction of the
+# time-to-first-token. A query goes to LLM_FAST_MODEL when it is small talk,
+# or when it is a short (<= ROUTER_FAST_MAX_QUERY_WORDS) single question
+# with no comparison / explanation / planning wording, no conversation
+# history to reason over, and at most ROUTER_FAST_MAX_CONTEXT_TOKENS of
+# context in the prompt (after prompt_builder trims retrieval to
+# CONTEXT_TOKEN_BUDGET; four typical chunks come to ~1300). Everything else
+# goes to LLM_MODEL. MODEL_ROUTING=0 sends everything to LLM_MODEL.
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") == "1"
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+ROUTER_FAST_MAX_QUERY_WORDS = int(os.getenv("ROUTER_FAST_MAX_QUERY_WORDS", "12"))
+ROUTER_FAST_MAX_CONTEXT_TOKENS = int(os.getenv("ROUTER_FAST_MAX_CONTEXT_TOKENS", "2000"))
+
+_SMALL_TALK_RE = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|thx|ok|okay|cool|great|bye|goodbye|"
+    r"good (morning|afternoon|evening))( there| so much| again)?[\s!.,]*$",
+    re.IGNORECASE,
+)
+_COMPLEX_RE = re.compile(
+    r"\b(compare[sd]?|comparison|vs|versus|difference|differences|differ|better|"
+    r"pros|cons|trade-?offs?|explain|why|steps|step-by-step|recommend\w*|should|"
+    r"strategy|plan|roadmap|architecture|migrat\w*|implement\w*|best)\b",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _route(query, context_tokens, history):
+    text = (query or "").strip()
+    if _SMALL_TALK_RE.match(text):
+        return LLM_FAST_MODEL, "small_talk"
+    if history:
+        return LLM_MODEL, "follow_up"
+    if text.count("?") > 1 or _COMPLEX_RE.search(text):
+        return LLM_MODEL, "complex"
+    if len(_WORD_RE.findall(text)) > ROUTER_FAST_MAX_QUERY_WORDS:
+        return LLM_MODEL, "long_query"
+    if context_tokens > ROUTER_FAST_MAX_CONTEXT_TOKENS:
+        return LLM_MODEL, "large_context"
+    return LLM_FAST_MODEL, "simple"
+
+
+def choose_model(query, context_tokens, history):
+    """Model for a generation, by query complexity and prompt context size."""
+    if not MODEL_ROUTING:
+        return LLM_MODEL
+    model, reason = _route(query, context_tokens, history)
+    MODEL_ROUTES.inc(model=model, reason=reason)
+    return model
@@ -11,8 +11,10 @@ if "messages" not in st.session_state:
 user_input = st.chat_input("Ask about i95Dev services...")
 
 if user_input:
+    # History excludes the question being asked (chat() appends it itself)
+    history = list(st.session_state.messages)
     st.session_state.messages.append({"role": "user", "content": user_input})
-    response = chat(user_input, st.session_state.messages)
+    response = chat(user_input, history)
     st.session_state.messages.append({"role": "assistant", "content": response})
 
 for msg in st.session_state.messages:
@@ -1,2 +1,287 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
 
-# Placeholder for DB-backed conversation storage
+from ..llm.prompt_builder import summary_lines, fit_lines
+from ..retrieval.condense import content_words
+from ..utils.metrics import SESSION_EVENTS
+
+# Server-side conversation history, keyed by session ID, so clients send
+# only the new message instead of the whole transcript.
+#
+# CONVERSATION_STORE picks where sessions live:
+#   memory  an in-process LRU (SESSION_CACHE_SIZE, SESSION_TTL) (default) —
+#           sessions are per worker
+#   sqlite  CONVERSATION_DB_PATH, one JSON row per session
+#   redis   CONVERSATION_REDIS_URL (defaults to CACHE_REDIS_URL), shared
+#           by every worker; any Redis-compatible server works
+# With a backend, every get() reads it, since another worker may have
+# recorded a turn since. The LRU copy is only reused (for its retrieval)
+# while its total / updated_at still match the stored session, and serves
+# alone only when the backend can't be read.
+#
+# A session keeps its last SESSION_MAX_MESSAGES messages verbatim; older
+# ones are folded into summary lines (prompt_builder.summary_lines), so
+# stored history stays bounded however long the chat gets.
+#
+# Clients report how many messages they had before the new one
+# (history_length). When that differs from the session's count — an edited
+# or regenerated message, a session evicted or living on another worker —
+# the API answers 409 and the client resends its messages, which replace the
+# stored history.
+#
+# The last turn's retrieval is kept with the session (in process only). It
+# is reused for follow-ups that refer back to it and ask nothing new ("tell
+# me more about that"); other follow-ups are condensed against its query
+# (retrieval/condense.py).
+
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_DB_PATH = os.getenv(
+    "CONVERSATION_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "conversations.db")
+)
+CONVERSATION_REDIS_URL = os.getenv("CONVERSATION_REDIS_URL", os.getenv("CACHE_REDIS_URL", ""))
+CONVERSATION_PREFIX = os.getenv("CACHE_PREFIX", "i95dev-chatbot") + ":session"
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "12"))
+SESSION_REUSE_RETRIEVAL = os.getenv("SESSION_REUSE_RETRIEVAL", "1") == "1"
+
+_FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|that|this|those|these|they|them|their|more|else|same|above|one)\b",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def is_follow_up(query):
+    """
+    Refers back to the previous answer and asks nothing new of its own —
+    the previous turn's chunks still apply.
+    """
+    return _FOLLOW_UP_RE.search(query or "") is not None and not content_words(query)
+
+
+class Session:
+    def __init__(self, session_id, messages=None, summary=None, total=0, updated_at=None):
+        self.id = session_id
+        self.messages = messages or []
+        self.summary = summary or []
+        # Messages ever exchanged, as counted by the client
+        self.total = total
+        self.updated_at = updated_at or time.time()
+        self.retrieval = None
+        self.lock = threading.Lock()
+
+    def history(self):
+        """History for prompt_builder: summary (as a system entry) + recent messages."""
+        if not self.summary:
+            return list(self.messages)
+        return [{"role": "system", "content": "\n".join(self.summary)}] + self.messages
+
+    @property
+    def retrieval_query(self):
+        """The standalone query the last turn was retrieved on, if known."""
+        return self.retrieval.get("query") if self.retrieval else None
+
+    def reusable_retrieval(self, query):
+        if SESSION_REUSE_RETRIEVAL and self.retrieval is not None and is_follow_up(query):
+            return self.retrieval
+        return None
+
+    def _compact(self):
+        overflow = len(self.messages) - SESSION_MAX_MESSAGES
+        if overflow > 0:
+            self.summary = fit_lines(self.summary + summary_lines(self.messages[:overflow]))
+            self.messages = self.messages[overflow:]
+
+    def as_dict(self):
+        return {
+            "messages": self.messages,
+            "summary": self.summary,
+            "total": self.total,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, session_id, data):
+        return cls(session_id, data.get("messages"), data.get("summary"),
+                   data.get("total", 0), data.get("updated_at"))
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - SESSION_TTL:
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data, ensure_ascii=False), data["updated_at"]),
+            )
+            self._conn.commit()
+
+    def prune(self):
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - SESSION_TTL,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+
+class RedisBackend:
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def load(self, session_id):
+        raw = self._redis.get(f"{CONVERSATION_PREFIX}:{session_id}")
+        return json.loads(raw) if raw else None
+
+    def save(self, session_id, data):
+        self._redis.set(
+            f"{CONVERSATION_PREFIX}:{session_id}",
+            json.dumps(data, ensure_ascii=False),
+            ex=max(1, int(SESSION_TTL)),
+        )
+
+    def prune(self):
+        # Keys expire on their own
+        return 0
+
+
+class ConversationStore:
+    def __init__(self, backend=None, maxsize=SESSION_CACHE_SIZE):
+        self.backend = backend
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, session):
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+    def _persist(self, session):
+        if self.backend is None:
+            return
+        try:
+            self.backend.save(session.id, session.as_dict())
+        except Exception as e:
+            # The in-process copy still serves this worker
+            logger.warning(f"Could not persist session {session.id}: {e}")
+
+    def get(self, session_id):
+        with self._lock:
+            local = self._sessions.get(session_id)
+            if local is not None:
+                if local.updated_at >= time.time() - SESSION_TTL:
+                    self._sessions.move_to_end(session_id)
+                else:
+                    del self._sessions[session_id]
+                    local = None
+        if self.backend is None:
+            return local
+
+        try:
+            data = self.backend.load(session_id)
+        except Exception as e:
+            logger.warning(f"Could not load session {session_id}: {e}")
+            return local
+        if data is None:
+            # Never persisted (save failed) or expired there
+            return local
+        session = Session.from_dict(session_id, data)
+        if local is not None and (local.total, local.updated_at) == (session.total, session.updated_at):
+            # Nobody else recorded a turn: keep this worker's copy and its retrieval
+            return local
+        self._remember(session)
+        return session
+
+    def create(self, session_id=None):
+        session = Session(session_id or new_session_id())
+        self._remember(session)
+        SESSION_EVENTS.inc(event="created")
+        return session
+
+    def replace(self, session_id, messages, total=None):
+        """Resync: the client's messages become the session's history."""
+        session = Session(session_id, total=len(messages) if total is None else total)
+        session.messages = [
+            {"role": m["role"], "content": m["content"]}
+            for m in messages
+            if m.get("content") and m.get("role") in ("user", "assistant")
+        ]
+        session._compact()
+        self._remember(session)
+        self._persist(session)
+        SESSION_EVENTS.inc(event="resync")
+        return session
+
+    def record_turn(self, session, question, answer, retrieval=None):
+        with session.lock:
+            session.messages.append({"role": "user", "content": question})
+            session.messages.append({"role": "assistant", "content": answer})
+            session.total += 2
+            session.updated_at = time.time()
+            session.retrieval = retrieval
+            session._compact()
+        self._remember(session)
+        self._persist(session)
+
+    def prune(self):
+        """Drop expired sessions from the backend (the LRU expires lazily)."""
+        return self.backend.prune() if self.backend is not None else 0
+
+    def stats(self):
+        return {
+            "backend": CONVERSATION_STORE if self.backend is not None else "memory",
+            "cached_sessions": len(self._sessions),
+            "maxsize": self.maxsize,
+        }
+
+
+def _make_backend():
+    if CONVERSATION_STORE == "sqlite":
+        return SQLiteBackend(CONVERSATION_DB_PATH)
+    if CONVERSATION_STORE == "redis":
+        if not CONVERSATION_REDIS_URL:
+            raise ValueError("CONVERSATION_STORE=redis needs CONVERSATION_REDIS_URL or CACHE_REDIS_URL")
+        return RedisBackend(CONVERSATION_REDIS_URL)
+    return None
+
+
+conversation_store = ConversationStore(_make_backend())
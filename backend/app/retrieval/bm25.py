@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+
+import numpy as np
+
+from ..ingestion.chunk_store import page_chunks
+from ..ingestion.taxonomy import tag_page
+from ..utils.cache import bump_generation
+from ..vectorstore.filters import MetadataPartitions
+
+# Local BM25 (lexical) index over the chunk store, used alongside the
+# vector search. MiniLM embeddings are weak on product names and acronyms
+# ("BC", "GP", "Magento 2", "NetSuite connector"); exact term matching
+# catches those.
+#
+# On disk (BM25_INDEX_DIR), built at ingest time by build_index():
+#   postings.npz — CSR postings: term offsets, doc ids (int32), term
+#                  frequencies (uint16) and doc lengths
+#   meta.json    — {"terms": [...], "ids": [...], "metadata": [...], "avgdl"}
+#
+# Scoring is a handful of vectorised NumPy ops per query term. Rebuilt
+# files are picked up within BM25_RELOAD_SECONDS.
+
+BM25_INDEX_DIR = os.getenv(
+    "BM25_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "bm25_index")
+)
+BM25_RELOAD_SECONDS = float(os.getenv("BM25_RELOAD_SECONDS", "5"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+POSTINGS_FILE = "postings.npz"
+META_FILE = "meta.json"
+
+# Kept deliberately small: short tokens like "bc", "gp", "ax", "2" carry
+# meaning in this corpus and must survive.
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its me my of on
+or our the their there this to us was we what when where which who why will
+with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in STOPWORDS:
+            continue
+        # Light plural folding ("connectors" -> "connector"), never on
+        # short tokens so acronyms stay intact
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, terms, offsets, doc_ids, tfs, doc_len, ids, metadata, mtime=None):
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.ids = ids
+        self.metadata = metadata
+        self.partitions = MetadataPartitions(metadata)
+        self.mtime = mtime
+        n = len(ids)
+        self.avgdl = float(doc_len.mean()) if n else 0.0
+        # Per-document length normalisation, precomputed once
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / self.avgdl) if n else doc_len
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)) if n else df
+
+    def __len__(self):
+        return len(self.ids)
+
+    def doc_fraction(self, term):
+        """Share of chunks containing a (tokenized) term; 0.0 if unseen."""
+        t = self.vocab.get(term)
+        if t is None or not self.ids:
+            return 0.0
+        return (self.offsets[t + 1] - self.offsets[t]) / len(self.ids)
+
+    def search(self, query, top_k=20, filter=None):
+        """
+        Pinecone-shaped plain matches ({"id", "score", "metadata"}),
+        optionally restricted by a metadata filter (filters.py).
+        """
+        if not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float64)
+            scores[docs] += self.idf[t] * tf * (BM25_K1 + 1) / (tf + self.norm[docs])
+
+        if filter:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[self.partitions.rows(filter)] = True
+            scores[~allowed] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return []
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in hits
+        ]
+
+
+def build_index(docs, index_dir=None):
+    """
+    Build and persist the index. `docs` yields (chunk_id, text, metadata);
+    metadata should carry at least "text" and "source" like the vector
+    store's. Returns the number of documents indexed.
+    """
+    index_dir = index_dir or BM25_INDEX_DIR
+    ids, metadata, lengths = [], [], []
+    postings = {}
+
+    for doc, (chunk_id, text, meta) in enumerate(docs):
+        counts = Counter(tokenize(text))
+        ids.append(chunk_id)
+        metadata.append(meta)
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    doc_ids, tfs = [], []
+    for i, term in enumerate(terms):
+        for doc, tf in postings[term]:
+            doc_ids.append(doc)
+            tfs.append(min(tf, 65535))
+        offsets[i + 1] = len(doc_ids)
+
+    os.makedirs(index_dir, exist_ok=True)
+    postings_path = os.path.join(index_dir, POSTINGS_FILE)
+    meta_path = os.path.join(index_dir, META_FILE)
+    with open(postings_path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            offsets=offsets,
+            doc_ids=np.asarray(doc_ids, dtype=np.int32),
+            tfs=np.asarray(tfs, dtype=np.uint16),
+            doc_len=np.asarray(lengths, dtype=np.int32),
+        )
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"terms": terms, "ids": ids, "metadata": metadata}, f, ensure_ascii=False)
+    # meta.json last: its mtime is what readers watch
+    os.replace(postings_path + ".tmp", postings_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    bump_generation()
+    return len(ids)
+
+
+def _store_docs(store):
+    for page in store.iter_pages():
+        tags = tag_page(
+            page["url"], page["title"], page["headings"],
+            "\n".join(chunk["content"] for chunk in page["chunks"]),
+        )
+        for chunk in page_chunks(page):
+            yield (
+                chunk["chunk_id"],
+                f"{chunk['title']}\n{chunk['content']}",
+                {"text": chunk["content"], "source": chunk["url"], "title": chunk["title"], **tags},
+            )
+
+
+def build_from_store(store, index_dir=None):
+    """Build the index from every live chunk in a ChunkStore, with service tags."""
+    return build_index(_store_docs(store), index_dir)
+
+
+_index = None
+_checked_at = 0.0
+_load_lock = threading.Lock()
+
+
+def _meta_mtime():
+    try:
+        return os.stat(os.path.join(BM25_INDEX_DIR, META_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _read_index():
+    mtime = _meta_mtime()
+    if mtime is None:
+        return None
+    with open(os.path.join(BM25_INDEX_DIR, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with np.load(os.path.join(BM25_INDEX_DIR, POSTINGS_FILE)) as arrays:
+        return BM25Index(
+            meta["terms"], arrays["offsets"], arrays["doc_ids"], arrays["tfs"],
+            arrays["doc_len"], meta["ids"], meta["metadata"], mtime,
+        )
+
+
+def get_index():
+    """The current index, or None when none has been built."""
+    global _index, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < BM25_RELOAD_SECONDS:
+        return _index
+    with _load_lock:
+        _checked_at = now
+        mtime = _meta_mtime()
+        if mtime is None:
+            _index = None
+        elif _index is None or mtime != _index.mtime:
+            previous = _index
+            _index = _read_index()
+            if previous is not None:
+                # Rebuilt by another process — drop cached retrieval results
+                bump_generation(shared=False)
+    return _index
+
+
+def search(query, top_k=20, filter=None):
+    index = get_index()
+    return index.search(query, top_k, filter) if index is not None else []
@@ -0,0 +1,262 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+
+from . import bm25
+from .retriever import aretrieve, normalize_query
+from ..ingestion.taxonomy import query_tags, strip_mentions
+from ..llm.groq_client import acomplete
+from ..utils.cache import make_cache
+from ..utils.metrics import STAGE_SECONDS, CONDENSE_EVENTS
+
+# Standalone retrieval queries for follow-ups. Only the latest user message
+# used to be retrieved on, so "how long does that take?" or "the second
+# one" pulled unrelated chunks and the model answered "I don't have that
+# information".
+#
+# A message that refers back or is too short to stand alone (one generic
+# word like "pricing?") is condensed with rules, in microseconds and without
+# a model call. These always refer back, however long the message: "what
+# about ...", "the same", ordinals, "which one is better?", a leading
+# conjunction ("and for BC?") and a pronoun as the subject ("can it sync
+# tier prices?", "is that included?"). Any other pronoun ("is there a guide
+# on it?") only does when the message names no platform / ERP and has at
+# most MAX_REFERENCE_WORDS content words of its own. "That" introducing a
+# clause ("a connector that syncs orders") is no reference. The rewrite:
+#   - an ordinal ("the second one") resolves to that item of the last
+#     assistant answer's list
+#   - otherwise the content words of the previous standalone question are
+#     appended, minus any platform / ERP the new message replaces ("what
+#     about Shopify?" after a BigCommerce question)
+# The previous standalone question is the last turn's retrieval query when
+# the session has one, otherwise it is rebuilt by condensing the history.
+#
+# CONDENSE_MODE=llm also asks a small Groq model for the rewrite. The rule
+# rewrite is retrieved concurrently, and used when the model doesn't answer
+# within CONDENSE_TIMEOUT or agrees with it, so the model adds at most
+# CONDENSE_TIMEOUT to a follow-up. Model rewrites are cached per
+# conversation state. CONDENSE_MODE=off retrieves on the raw message.
+
+CONDENSE_MODE = os.getenv("CONDENSE_MODE", "rules")
+CONDENSE_MODEL = os.getenv("CONDENSE_MODEL", "llama-3.1-8b-instant")
+CONDENSE_TIMEOUT = float(os.getenv("CONDENSE_TIMEOUT", "0.5"))
+CONDENSE_CACHE_SIZE = int(os.getenv("CONDENSE_CACHE_SIZE", "1024"))
+CONDENSE_CACHE_TTL = float(os.getenv("CONDENSE_CACHE_TTL", "3600"))
+
+# A one-word question stands alone when that word is rare in the corpus
+# ("SessionReaper?"), not when it's generic ("pricing?")
+RARE_TERM_FRACTION = 0.02
+CONDENSE_HISTORY_MESSAGES = 4
+MAX_CARRIED_WORDS = 12
+MAX_REFERENCE_WORDS = 3
+MAX_ITEM_WORDS = 12
+
+STOPWORDS = frozenset("""
+a about also an and any are as at be been but by can could did do does for
+from get give go has have how i if in into is it its just know let like me
+more my no not of on or our please say should so tell than that the their
+them then there these they this those to us was we what when where which who
+why will with would you your yes ok okay thanks thank else same again other
+explain describe one ones show much many
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9.+]*[a-z0-9]|[a-z0-9]")
+_POSSESSIVE_RE = re.compile(r"['’](?:s|re|ll|ve|d|m|t)\b")
+_REFERENCE_RE = re.compile(
+    r"\b(same|above|former|latter|what about|how about|and what|else)\b",
+    re.IGNORECASE,
+)
+# "Which one is better?": a comparison between options named earlier
+_WHICH_ONE_RE = re.compile(
+    r"\bwhich (one|ones)\b.*\b(better|best|cheaper|faster|easier|recommend\w*)\b",
+    re.IGNORECASE,
+)
+_LEADING_CONJUNCTION_RE = re.compile(r"^\W*(and|but|or|also|plus)\b", re.IGNORECASE)
+_SUBJECT_PRONOUN_RE = re.compile(
+    r"(^\W*|\b(can|could|does|do|did|is|are|was|were|will|would|should|has|have)\s+)"
+    r"(it|they|that|this|these|those)\b",
+    re.IGNORECASE,
+)
+_PRONOUN_RE = re.compile(
+    r"(\w+\W+)?\b(it|its|this|that|these|those|they|them|their)\b",
+    re.IGNORECASE,
+)
+ORDINALS = {
+    "first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2,
+    "fourth": 3, "4th": 3, "fifth": 4, "5th": 4, "last": -1,
+}
+_ORDINAL_RE = re.compile(
+    r"\b(" + "|".join(ORDINALS) + r")\b|\b(?:number|no\.?|option|#)\s*(\d)\b",
+    re.IGNORECASE,
+)
+_LIST_ITEM_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+(.+)$", re.MULTILINE)
+
+condensed_cache = make_cache("condensed_queries", CONDENSE_CACHE_SIZE, CONDENSE_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
+
+
+def content_words(text):
+    text = _POSSESSIVE_RE.sub("", (text or "").lower())
+    return [w for w in _WORD_RE.findall(text) if w not in STOPWORDS]
+
+
+def _rare(word):
+    index = bm25.get_index()
+    if index is None:
+        return False
+    terms = bm25.tokenize(word)
+    return bool(terms) and all(index.doc_fraction(t) < RARE_TERM_FRACTION for t in terms)
+
+
+def _has_pronoun(query):
+    for match in _PRONOUN_RE.finditer(query):
+        before = (match.group(1) or "").strip(" ,;:").lower()
+        # "a connector that syncs orders": a clause, not a reference
+        if match.group(2).lower() == "that" and before and before not in STOPWORDS:
+            continue
+        return True
+    return False
+
+
+def needs_context(query):
+    """Whether a message leans on earlier turns to be understood."""
+    query = query or ""
+    if (
+        _REFERENCE_RE.search(query)
+        or _ORDINAL_RE.search(query)
+        or _WHICH_ONE_RE.search(query)
+        or _LEADING_CONJUNCTION_RE.match(query)
+        or _SUBJECT_PRONOUN_RE.search(query)
+    ):
+        return True
+    words = content_words(query)
+    if _has_pronoun(query):
+        names_own = any(query_tags(query).values())
+        return not names_own and len(words) <= MAX_REFERENCE_WORDS
+    return len(words) == 0 or (len(words) == 1 and not _rare(words[0]))
+
+
+def _list_item(query, history):
+    match = _ORDINAL_RE.search(query)
+    if match is None:
+        return None
+    position = ORDINALS[match.group(1).lower()] if match.group(1) else int(match.group(2)) - 1
+    answer = next((m["content"] for m in reversed(history) if m.get("role") == "assistant"), "")
+    items = _LIST_ITEM_RE.findall(answer)
+    if not items or not -len(items) <= position < len(items):
+        return None
+    # "**Shopify SAP Business One Connect**: syncs orders..." -> the name
+    item = re.split(r":|\s[-–—]\s", items[position].replace("**", ""), maxsplit=1)[0]
+    return " ".join(item.split()[:MAX_ITEM_WORDS])
+
+
+def _rewrite(query, history, previous):
+    if not needs_context(query):
+        return query
+    item = _list_item(query, history)
+    if item:
+        return f"{query.strip()} {item}"
+    if not previous:
+        return query
+
+    replaced = [field for field, tags in query_tags(query).items() if tags]
+    if replaced:
+        previous = strip_mentions(previous, replaced)
+    own = set(content_words(query))
+    carried = [w for w in dict.fromkeys(content_words(previous)) if w not in own]
+    if not carried:
+        return query
+    return f"{query.strip()} {' '.join(carried[:MAX_CARRIED_WORDS])}"
+
+
+def previous_question(history):
+    """The last user question in `history`, condensed to stand alone."""
+    previous = None
+    for i, msg in enumerate(history):
+        if msg.get("role") == "user":
+            previous = _rewrite(msg["content"], history[:i], previous)
+    return previous
+
+
+def condense(query, history, previous=None):
+    """
+    Rule-based standalone retrieval query for `query` given the chat
+    history. `previous` is the last turn's retrieval query, if known.
+    """
+    if CONDENSE_MODE == "off" or not history:
+        return query
+    if previous is None:
+        previous = previous_question(history)
+    return _rewrite(query, history, previous)
+
+
+def _llm_messages(query, history):
+    lines = []
+    for msg in history[-CONDENSE_HISTORY_MESSAGES:]:
+        if msg.get("role") in ("user", "assistant"):
+            who = "User" if msg["role"] == "user" else "Assistant"
+            lines.append(f"{who}: {msg['content'][:400]}")
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Rewrite the user's last message as a standalone search query for "
+                "i95Dev's website, resolving references to earlier messages. "
+                "Reply with the query only."
+            ),
+        },
+        {"role": "user", "content": "\n".join(lines) + f"\n\nLast message: {query}"},
+    ]
+
+
+async def _allm_condense(query, history):
+    key = hashlib.sha1(
+        repr([(m.get("role"), m.get("content")) for m in history[-CONDENSE_HISTORY_MESSAGES:]]
+             + [query]).encode("utf-8")
+    ).hexdigest()
+    rewritten = condensed_cache.get(key)
+    if rewritten is not None:
+        return rewritten
+
+    try:
+        with STAGE_SECONDS.time(stage="condense"):
+            text = await asyncio.wait_for(
+                acomplete(_llm_messages(query, history), CONDENSE_MODEL), CONDENSE_TIMEOUT
+            )
+    except asyncio.TimeoutError:
+        return None
+    except Exception as e:
+        logger.warning(f"Query condensation failed: {e}")
+        return None
+
+    rewritten = text.strip().splitlines()[0].strip().strip('"') if text.strip() else ""
+    if not rewritten or len(rewritten) > 300:
+        return None
+    condensed_cache.set(key, rewritten)
+    return rewritten
+
+
+async def acondense_retrieve(query, history, previous=None, top_k=4):
+    """
+    aretrieve() on the standalone version of `query`. The result's "query"
+    is the query actually retrieved on, to pass back as `previous` next turn.
+    """
+    rewritten = condense(query, history, previous)
+    if rewritten == query:
+        CONDENSE_EVENTS.inc(outcome="standalone")
+        return await aretrieve(query, top_k)
+    if CONDENSE_MODE != "llm":
+        CONDENSE_EVENTS.inc(outcome="rules")
+        return await aretrieve(rewritten, top_k)
+
+    speculative = asyncio.ensure_future(aretrieve(rewritten, top_k))
+    better = await _allm_condense(query, history)
+    if better is None or normalize_query(better) == normalize_query(rewritten):
+        CONDENSE_EVENTS.inc(outcome="llm_fallback" if better is None else "llm_agreed")
+        return await speculative
+    speculative.cancel()
+    CONDENSE_EVENTS.inc(outcome="llm")
+    return await aretrieve(better, top_k)
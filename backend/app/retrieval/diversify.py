@@ -0,0 +1,71 @@
+import numpy as np
+
+# Post-retrieval selection: turn an over-fetched candidate list into the
+# top_k chunks that carry the most distinct information per prompt token.
+#
+#   - maximal marginal relevance (MMR): each pick maximises
+#       lambda * relevance - (1 - lambda) * max cosine to the chunks already picked
+#   - near-duplicate suppression: candidates whose cosine to an already
+#     picked chunk exceeds dup_threshold are dropped outright
+#   - per-source cap: at most max_per_source chunks from one URL
+#
+# Similarities come from the stored chunk embeddings (vector query with
+# include_values), so no extra model calls are made. Everything is a few
+# NumPy ops over an (n x n) matrix with n ~ 20.
+
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def mmr_select(matches, vectors, top_k, lambda_=0.7, dup_threshold=0.95, max_per_source=2):
+    """
+    Pick up to top_k of `matches` (ranked {"id", "score", "metadata"}).
+    `vectors` is row-aligned with matches; a row of None (no stored
+    vector) is treated as dissimilar to everything. Relevance is the
+    match score min-max scaled to [0, 1], so cosine and RRF scores both
+    work. Returns the selected matches in pick order.
+    """
+    n = len(matches)
+    if n == 0:
+        return []
+
+    present = np.array([v is not None for v in vectors])
+    dim = next((len(v) for v in vectors if v is not None), 1)
+    unit = _unit_rows([v if v is not None else np.zeros(dim) for v in vectors])
+    sim = unit @ unit.T
+    sim[~present, :] = 0.0
+    sim[:, ~present] = 0.0
+
+    scores = np.array([m.get("score", 0.0) for m in matches], dtype=np.float64)
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.ones(n)
+
+    sources = [m.get("metadata", {}).get("source") for m in matches]
+    per_source = {}
+
+    available = np.ones(n, dtype=bool)
+    max_sim = np.zeros(n)
+    selected = []
+
+    while len(selected) < top_k and available.any():
+        mmr = lambda_ * relevance - (1 - lambda_) * max_sim
+        mmr[~available] = -np.inf
+        pick = int(np.argmax(mmr))
+        available[pick] = False
+
+        source = sources[pick]
+        if source is not None and per_source.get(source, 0) >= max_per_source:
+            continue
+
+        selected.append(pick)
+        if source is not None:
+            per_source[source] = per_source.get(source, 0) + 1
+
+        max_sim = np.maximum(max_sim, sim[pick])
+        # Near-duplicates of what was just picked can never add information
+        available &= sim[pick] < dup_threshold
+
+    return [matches[i] for i in selected]
@@ -0,0 +1,149 @@
+import os
+import logging
+
+import numpy as np
+
+from .bm25 import tokenize
+from .retriever import normalize_query, aembed_query
+from ..embeddings.embedder import aembed_texts
+from ..ingestion.chunk_store import open_store
+from ..ingestion.faq import page_faqs
+from ..ingestion.taxonomy import query_tags
+from ..utils.cache import register_cache
+from ..utils.metrics import STAGE_SECONDS
+
+# FAQ fast path: canonical answers for questions the site already answers.
+#
+# Q/A pairs extracted at ingest time (ingestion/faq.py) are loaded from the
+# chunk store into memory at startup (lifespan warm-up), with one embedding
+# per question. A user question is answered straight from the FAQ, with no
+# retrieval and no LLM call, when it matches with high confidence:
+#   exact     same normalized text
+#   lexical   token-set Jaccard (BM25 tokens) >= FAQ_LEXICAL_THRESHOLD
+#   semantic  some token overlap (>= FAQ_CANDIDATE_OVERLAP) and question
+#             embedding cosine >= FAQ_SEMANTIC_THRESHOLD
+# A question naming a platform / ERP only matches FAQs naming the same one.
+# Exact and lexical matches cost microseconds; the semantic check embeds
+# only lexically plausible questions, through the query embedding cache, so
+# a miss hands retrieval an embedding it would have computed anyway.
+
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "1") == "1"
+FAQ_LEXICAL_THRESHOLD = float(os.getenv("FAQ_LEXICAL_THRESHOLD", "0.8"))
+FAQ_CANDIDATE_OVERLAP = float(os.getenv("FAQ_CANDIDATE_OVERLAP", "0.3"))
+FAQ_SEMANTIC_THRESHOLD = float(os.getenv("FAQ_SEMANTIC_THRESHOLD", "0.88"))
+
+logger = logging.getLogger(__name__)
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def _tags_compatible(wanted, entry_tags):
+    return all(set(tags) <= set(entry_tags[field]) for field, tags in wanted.items())
+
+
+class _Entries:
+    """The loaded pairs and their lookup structures, swapped in whole on reload."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.exact = {normalize_query(e["question"]): i for i, e in enumerate(entries)}
+        self.tokens = [set(tokenize(e["question"])) for e in entries]
+        self.tags = [query_tags(e["question"]) for e in entries]
+        self.matrix = None
+
+
+class FaqIndex:
+
+    def __init__(self, name="faq"):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.matched = {"exact": 0, "lexical": 0, "semantic": 0}
+        self._data = _Entries([])
+
+    def load(self, store=None):
+        """(Re)load the Q/A pairs from the chunk store. Returns their count."""
+        entries, seen = [], set()
+        for page in (store or open_store()).iter_pages():
+            for faq in page_faqs(page):
+                key = normalize_query(faq["question"])
+                if key not in seen:
+                    seen.add(key)
+                    entries.append({**faq, "source": page["url"]})
+        self._data = _Entries(entries)
+        return len(entries)
+
+    @property
+    def entries(self):
+        return self._data.entries
+
+    async def aembed(self):
+        """Embed the questions, enabling semantic matches."""
+        data = self._data
+        if data.entries:
+            data.matrix = _unit_rows(await aembed_texts([e["question"] for e in data.entries]))
+
+    def _hit(self, data, index, how):
+        self.hits += 1
+        self.matched[how] += 1
+        return data.entries[index]
+
+    async def amatch(self, query):
+        """The FAQ entry answering `query` with high confidence, or None."""
+        data = self._data
+        if not data.entries:
+            return None
+        with STAGE_SECONDS.time(stage="faq_match"):
+            exact = data.exact.get(normalize_query(query))
+            if exact is not None:
+                return self._hit(data, exact, "exact")
+
+            tokens = set(tokenize(query))
+            tags = query_tags(query)
+            candidates = [
+                (score, i) for i, score in enumerate(_jaccard(tokens, t) for t in data.tokens)
+                if score >= FAQ_CANDIDATE_OVERLAP and _tags_compatible(tags, data.tags[i])
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+            score, best = max(candidates)
+            if score >= FAQ_LEXICAL_THRESHOLD:
+                return self._hit(data, best, "lexical")
+
+        if data.matrix is not None:
+            try:
+                query_vec = _unit_rows(await aembed_query(query)).reshape(-1)
+            except Exception as e:
+                logger.warning(f"FAQ match: query embedding failed: {e}")
+            else:
+                rows = [i for _, i in candidates]
+                scores = data.matrix[rows] @ query_vec
+                if scores.max() >= FAQ_SEMANTIC_THRESHOLD:
+                    return self._hit(data, rows[int(np.argmax(scores))], "semantic")
+        self.misses += 1
+        return None
+
+    def clear_local(self):
+        # Loaded from the chunk store at startup; not tied to the cache generation
+        pass
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "size": len(self._data.entries),
+            "embedded": self._data.matrix is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            **{f"{how}_hits": count for how, count in self.matched.items()},
+        }
+
+
+faq_index = register_cache(FaqIndex()) if FAQ_ENABLED else None
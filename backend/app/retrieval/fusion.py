@@ -0,0 +1,30 @@
+# Rank fusion for hybrid (vector + BM25) retrieval.
+#
+# Reciprocal rank fusion only looks at ranks, so cosine similarities and
+# BM25 scores (different scales, different distributions) can be combined
+# without any calibration: score(d) = sum over lists of 1 / (k + rank).
+
+RRF_K = 60
+
+
+def rrf_fuse(result_lists, top_k, k=RRF_K, names=("vector", "bm25")):
+    """
+    Fuse ranked lists of {"id", "score", "metadata"} matches. Each fused
+    match keeps the metadata of its first occurrence, gets the RRF score
+    as "score" and the per-list scores as "<name>_score".
+    """
+    fused = {}
+    for name, matches in zip(names, result_lists):
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {
+                    "id": match["id"],
+                    "score": 0.0,
+                    "metadata": match.get("metadata") or {},
+                }
+            entry["score"] += 1.0 / (k + rank)
+            entry[f"{name}_score"] = match.get("score", 0)
+
+    ranked = sorted(fused.values(), key=lambda m: m["score"], reverse=True)
+    return ranked[:top_k]
@@ -1,50 +1,296 @@
-from ..embeddings.embedder import embed_texts
-from ..vectorstore.pinecone_client import query_embedding
+import os
+import re
+import asyncio
+import logging
 
-DEBUG = True  # Turn off in production
+import numpy as np
 
+from . import bm25
+from .fusion import rrf_fuse, RRF_K
+from .diversify import mmr_select
+from ..embeddings.embedder import embed_texts, aembed_texts
+from ..ingestion.taxonomy import query_filter, GENERAL
+from ..vectorstore.vector_store import query_embedding, aquery_embedding, fetch_embeddings
+from ..utils.cache import make_cache
+from ..utils.metrics import STAGE_SECONDS
+from ..utils import tracing
+
+# Repeated questions skip both the embedding call and the vector query.
+# Entries are invalidated automatically when the index is rebuilt.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+embedding_cache = make_cache("query_embeddings", QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+results_cache = make_cache("retrieval_results", QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+# Hybrid retrieval: when a BM25 index has been built (bm25.py), lexical and
+# vector candidates are fused with reciprocal rank fusion.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+
+# Over-fetch, then pick top_k with MMR + near-duplicate suppression + a
+# per-source cap (diversify.py) so overlapping chunks don't crowd the prompt.
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+MMR_ENABLED = os.getenv("MMR_ENABLED", "1") == "1"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+MAX_CHUNKS_PER_SOURCE = int(os.getenv("MAX_CHUNKS_PER_SOURCE", "2"))
+
+# Questions naming a service (e.g. "Magento GP connector") or a page type
+# ("success stories") only search chunks tagged for it or for no service
+# at all (taxonomy.py), so other connectors' pages never reach the prompt.
+# Falls back to the whole index when the filter leaves fewer than top_k.
+SERVICE_FILTER = os.getenv("SERVICE_FILTER", "1") == "1"
+
+
+def normalize_query(query):
+    """Cache key for a question: case, whitespace and trailing punctuation ignored."""
+    return re.sub(r"\s+", " ", query or "").strip().lower().rstrip("?!. ")
+
+
+logger = logging.getLogger(__name__)
+
+
+def _to_plain(results):
+    # Pinecone responses are SDK objects; cache plain dicts. Stored vectors
+    # (include_values) are split off for MMR and never cached.
+    matches, values = [], {}
+    for match in results.get("matches", []):
+        matches.append({
+            "id": match.get("id"),
+            "score": match.get("score", 0),
+            "metadata": dict(match.get("metadata") or {}),
+        })
+        if match.get("values"):
+            values[match.get("id")] = np.asarray(match.get("values"), dtype=np.float32)
+    return {"matches": matches, "values": values}
+
+
+def _trace_matches(query, matches, top_k, metadata_filter):
+    services = {m["metadata"].get("service", "UNKNOWN") for m in matches} - {GENERAL}
+    tracing.TRACER("retrieval", {
+        "query": query,
+        "top_k": top_k,
+        "filter": metadata_filter,
+        "matches": [
+            {
+                "rank": i,
+                "score": round(m.get("score", 0), 4),
+                "service": m["metadata"].get("service", "UNKNOWN"),
+                "source": m["metadata"].get("source", "N/A"),
+                "preview": m["metadata"].get("text", "")[:300].replace("\n", " "),
+            }
+            for i, m in enumerate(matches, start=1)
+        ],
+        # Retrieved chunks spanning several services can mix up answers
+        "multiple_services": sorted(services) if len(services) > 1 else [],
+    })
+
+
+def _build_chunks(query, results, top_k):
+    matches = results.get("matches", [])
+    if tracing.TRACER is not None:
+        _trace_matches(query, matches, top_k, results.get("filter"))
+    return [m["metadata"].get("text", "") for m in matches]
+
+
+def _lexical(query, candidates, metadata_filter):
+    with STAGE_SECONDS.time(stage="bm25"):
+        return bm25.search(query, candidates, metadata_filter)
+
+
+def _filter_for(query):
+    return query_filter(query) if SERVICE_FILTER else None
+
+
+def _too_narrow(metadata_filter, dense, top_k):
+    # Also covers an index whose chunks predate tagging (nothing matches)
+    return metadata_filter is not None and len(dense["matches"]) < top_k
+
+
+def _fuse(dense, lexical, limit):
+    if lexical is None:
+        return dense["matches"][:limit]
+    return rrf_fuse([dense["matches"], lexical], limit, k=RRF_K)
+
+
+def _candidates(top_k):
+    """
+    (candidates fetched per retriever, hybrid?). Fusion and MMR both
+    need more candidates than they return.
+    """
+    hybrid = HYBRID_SEARCH and bm25.get_index() is not None
+    if hybrid or MMR_ENABLED:
+        return max(top_k, RETRIEVAL_CANDIDATES), hybrid
+    return top_k, hybrid
+
+
+def _missing_values(pool, values):
+    return [m["id"] for m in pool if m["id"] not in values]
+
+
+def _fetch_values(chunk_ids):
+    # BM25-only candidates have no vector yet; one batched fetch. On
+    # failure they just count as dissimilar to everything in MMR.
+    try:
+        fetched = fetch_embeddings(chunk_ids)
+    except Exception as e:
+        logger.warning(f"Could not fetch vectors for MMR: {e}")
+        return {}
+    return {cid: np.asarray(vec, dtype=np.float32) for cid, vec in fetched.items()}
+
+
+def _select(pool, values, top_k):
+    if not MMR_ENABLED:
+        return pool[:top_k]
+    with STAGE_SECONDS.time(stage="rerank"):
+        return mmr_select(
+            pool,
+            [values.get(m["id"]) for m in pool],
+            top_k,
+            lambda_=MMR_LAMBDA,
+            dup_threshold=DEDUP_THRESHOLD,
+            max_per_source=MAX_CHUNKS_PER_SOURCE,
+        )
+
+
+def _search(query, top_k):
+    """
+    Returns the Pinecone-shaped results plus the query embedding
+    ("query_vec") they were retrieved with.
+    """
+    key = normalize_query(query)
+    results = results_cache.get(f"{top_k}:{key}")
+    if results is not None:
+        return results
+
+    candidates, hybrid = _candidates(top_k)
+    metadata_filter = _filter_for(query)
+    lexical = _lexical(query, candidates, metadata_filter) if hybrid else None
 
-def retrieve_context(query, top_k=4):
     # Generate query embedding
-    query_vec = embed_texts([query])[0]
+    query_vec = embedding_cache.get(key)
+    if query_vec is None:
+        with STAGE_SECONDS.time(stage="embed"):
+            query_vec = embed_texts([query])[0]
+        embedding_cache.set(key, query_vec)
+
+    # Query the vector store
+    with STAGE_SECONDS.time(stage="vector_query"):
+        dense = _to_plain(query_embedding(
+            query_vec, candidates, include_values=MMR_ENABLED, filter=metadata_filter
+        ))
+    if _too_narrow(metadata_filter, dense, top_k):
+        metadata_filter = None
+        lexical = _lexical(query, candidates, None) if hybrid else None
+        with STAGE_SECONDS.time(stage="vector_query"):
+            dense = _to_plain(query_embedding(query_vec, candidates, include_values=MMR_ENABLED))
+
+    pool = _fuse(dense, lexical, candidates if MMR_ENABLED else top_k)
+    values = dense["values"]
+    missing = _missing_values(pool, values) if MMR_ENABLED else []
+    if missing:
+        values.update(_fetch_values(missing))
+
+    results = {
+        "matches": _select(pool, values, top_k),
+        "query_vec": query_vec,
+        "filter": metadata_filter,
+    }
+    results_cache.set(f"{top_k}:{key}", results)
+    return results
+
 
-    # Query Pinecone
-    results = query_embedding(query_vec, top_k)
+async def _aembed(query, key):
+    query_vec = embedding_cache.get(key)
+    if query_vec is None:
+        with STAGE_SECONDS.time(stage="embed"):
+            query_vec = (await aembed_texts([query]))[0]
+        embedding_cache.set(key, query_vec)
+    return query_vec
 
-    if DEBUG:
-        print("\n" + "=" * 70)
-        print(f"🔍 TOP {top_k} RETRIEVED CHUNKS FOR QUERY:")
-        print(f"❓ {query}")
-        print("=" * 70)
 
-    contexts = []
-    detected_services = set()
+async def aembed_query(query):
+    """Query embedding through the embedding cache that retrieval uses."""
+    return await _aembed(query, normalize_query(query))
 
-    for i, match in enumerate(results.get("matches", []), start=1):
-        score = round(match.get("score", 0), 4)
-        metadata = match.get("metadata", {})
 
-        text = metadata.get("text", "")
-        source = metadata.get("source", "N/A")
-        service = metadata.get("service", "UNKNOWN")
+async def _avector_query(query_vec, candidates, metadata_filter):
+    with STAGE_SECONDS.time(stage="vector_query"):
+        return _to_plain(await aquery_embedding(
+            query_vec, candidates, include_values=MMR_ENABLED, filter=metadata_filter
+        ))
 
-        detected_services.add(service)
-        contexts.append(text)
 
-        if DEBUG:
-            preview = text[:300].replace("\n", " ")
-            print(f"\n📌 Rank #{i}")
-            print(f"Score   : {score}")
-            print(f"Service : {service}")
-            print(f"Source  : {source}")
-            print(f"Preview : {preview}...")
+async def _adense(query, key, candidates, metadata_filter):
+    query_vec = await _aembed(query, key)
+    return await _avector_query(query_vec, candidates, metadata_filter), query_vec
 
-    if DEBUG and len(detected_services) > 1:
-        print("\n⚠️ WARNING: Retrieved chunks span multiple services:")
-        for svc in detected_services:
-            print(f" - {svc}")
 
-    if DEBUG:
-        print("=" * 70 + "\n")
+async def _asearch(query, top_k):
+    key = normalize_query(query)
+    results = results_cache.get(f"{top_k}:{key}")
+    if results is not None:
+        return results
+
+    candidates, hybrid = _candidates(top_k)
+    metadata_filter = _filter_for(query)
+    dense_task = asyncio.ensure_future(_adense(query, key, candidates, metadata_filter))
+    # BM25 is pure CPU and sub-millisecond: score it on the loop while the
+    # embedding / vector query round trips are in flight
+    lexical = _lexical(query, candidates, metadata_filter) if hybrid else None
+    dense, query_vec = await dense_task
+    if _too_narrow(metadata_filter, dense, top_k):
+        metadata_filter = None
+        dense = await _avector_query(query_vec, candidates, None)
+        lexical = _lexical(query, candidates, None) if hybrid else None
+
+    pool = _fuse(dense, lexical, candidates if MMR_ENABLED else top_k)
+    values = dense["values"]
+    missing = _missing_values(pool, values) if MMR_ENABLED else []
+    if missing:
+        values.update(await asyncio.to_thread(_fetch_values, missing))
+
+    results = {
+        "matches": _select(pool, values, top_k),
+        "query_vec": query_vec,
+        "filter": metadata_filter,
+    }
+    results_cache.set(f"{top_k}:{key}", results)
+    return results
+
+
+def _retrieval(query, results, top_k):
+    chunks = _build_chunks(query, results, top_k)
+    return {
+        "query": query,
+        # Whole chunk texts, for prompt assembly; "context" joins them
+        "chunks": chunks,
+        "context": "\n".join(chunks),
+        "matches": results["matches"],
+        "chunk_ids": [match["id"] for match in results["matches"]],
+        "query_vec": results["query_vec"],
+    }
+
+
+def retrieve(query, top_k=4):
+    """
+    Retrieve context for a query along with the matches, their chunk IDs
+    and the query embedding (used by the answer cache).
+    """
+    return _retrieval(query, _search(query, top_k), top_k)
+
+
+async def aretrieve(query, top_k=4):
+    """
+    Async retrieve() used by the API — embedding and vector query never
+    block the event loop.
+    """
+    return _retrieval(query, await _asearch(query, top_k), top_k)
+
+
+def retrieve_context(query, top_k=4):
+    return retrieve(query, top_k)["context"]
+
 
-    return "\n".join(contexts)
+async def aretrieve_context(query, top_k=4):
+    return (await aretrieve(query, top_k))["context"]
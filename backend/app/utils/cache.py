@@ -0,0 +1,245 @@
+
+import os
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+# Small bounded caches for the request path.
+#
+# LRUCache is per-process (LRU + per-entry TTL). When CACHE_REDIS_URL is set,
+# make_cache() returns a RedisCache instead so every uvicorn worker shares
+# one cache. Keys are namespaced by an index generation that is bumped
+# whenever the vector store is written to, so re-ingestion invalidates
+# everything at once. The generation is shared across processes (ingestion
+# scripts included): through Redis when CACHE_REDIS_URL is set, otherwise
+# through CACHE_GENERATION_FILE, whose mtime is checked at most every
+# CACHE_GENERATION_CHECK_SECONDS (like the BM25 index and local vector
+# store reloads). The file only reaches processes on the same filesystem;
+# ingestion run elsewhere needs Redis.
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "i95dev-chatbot")
+CACHE_GENERATION_CHECK_SECONDS = float(os.getenv("CACHE_GENERATION_CHECK_SECONDS", "2"))
+CACHE_GENERATION_FILE = os.getenv(
+    "CACHE_GENERATION_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".cache_generation")
+)
+
+_caches = []
+_redis = None
+_local_generation = 0
+_generation = None
+_generation_checked_at = 0.0
+_file_generation = 0
+_file_mtime = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(CACHE_REDIS_URL)
+    return _redis
+
+
+def _read_file_generation():
+    global _file_generation, _file_mtime
+    try:
+        mtime = os.stat(CACHE_GENERATION_FILE).st_mtime_ns
+        if mtime != _file_mtime:
+            with open(CACHE_GENERATION_FILE, "r", encoding="utf-8") as f:
+                _file_generation = int(f.read().strip() or 0)
+            _file_mtime = mtime
+    except (OSError, ValueError):
+        pass
+    return _file_generation
+
+
+def _write_file_generation():
+    global _file_generation, _file_mtime
+    generation = _read_file_generation() + 1
+    tmp = f"{CACHE_GENERATION_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(tmp, CACHE_GENERATION_FILE)
+        _file_generation = generation
+        _file_mtime = os.stat(CACHE_GENERATION_FILE).st_mtime_ns
+    except OSError:
+        # Read-only checkout: invalidation stays in this process
+        pass
+
+
+def current_generation():
+    """Index generation that cache keys are namespaced by."""
+    global _generation, _generation_checked_at
+    now = time.monotonic()
+    if not CACHE_REDIS_URL:
+        if _generation is None or now - _generation_checked_at >= CACHE_GENERATION_CHECK_SECONDS:
+            generation = (_read_file_generation(), _local_generation)
+            if _generation is not None and generation != _generation:
+                # Another process re-indexed: drop this one's stale entries
+                for cache in _caches:
+                    cache.clear_local()
+            _generation = generation
+            _generation_checked_at = now
+        return _generation
+
+    if _generation is None or now - _generation_checked_at >= CACHE_GENERATION_CHECK_SECONDS:
+        try:
+            _generation = int(_get_redis().get(f"{CACHE_PREFIX}:generation") or 0)
+        except Exception:
+            _generation = _generation or 0
+        _generation_checked_at = now
+    return _generation
+
+
+def bump_generation(shared=True):
+    """
+    Invalidate every cache (call after the index changes). shared=False
+    only invalidates this process, for a change another process already
+    announced (e.g. reloading an index it rebuilt).
+    """
+    global _local_generation, _generation
+    _local_generation += 1
+    if CACHE_REDIS_URL:
+        if shared:
+            try:
+                _generation = int(_get_redis().incr(f"{CACHE_PREFIX}:generation"))
+            except Exception:
+                _generation = None
+    else:
+        if shared:
+            _write_file_generation()
+        _generation = (_file_generation, _local_generation)
+    for cache in _caches:
+        cache.clear_local()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, name, maxsize=1024, ttl=3600.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return (current_generation(), key)
+
+    def get(self, key):
+        key = self._key(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        key = self._key(key)
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear_local(self):
+        with self._lock:
+            self._data.clear()
+
+    clear = clear_local
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+    """
+    Same interface as LRUCache, backed by Redis (or any Redis-compatible
+    server) so all workers share entries. Size is bounded by TTL and the
+    server's maxmemory/LRU policy. Values are pickled — only point this at
+    a Redis instance you trust.
+    """
+
+    def __init__(self, name, ttl=3600.0):
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        _get_redis()  # fail fast if the redis package is missing
+
+    def _key(self, key):
+        return f"{CACHE_PREFIX}:{self.name}:{current_generation()}:{key}"
+
+    def get(self, key):
+        try:
+            raw = _get_redis().get(self._key(key))
+        except Exception:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            _get_redis().set(
+                self._key(key),
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                ex=max(1, int(self.ttl if ttl is None else ttl)),
+            )
+        except Exception:
+            self.errors += 1
+
+    def clear_local(self):
+        # Old generations simply stop being read and expire via TTL
+        pass
+
+    def clear(self):
+        bump_generation()
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def register_cache(cache):
+    """Track a cache object (needs name, clear_local() and stats())."""
+    _caches.append(cache)
+    return cache
+
+
+def make_cache(name, maxsize=1024, ttl=3600.0):
+    cache = RedisCache(name, ttl) if CACHE_REDIS_URL else LRUCache(name, maxsize, ttl)
+    return register_cache(cache)
+
+
+def cache_stats():
+    return {cache.name: cache.stats() for cache in _caches}
@@ -0,0 +1,168 @@
+
+import time
+import threading
+from contextlib import contextmanager
+
+from .cache import cache_stats
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4), kept
+# in-process so the request path does not depend on a client library.
+# Exposed on GET /metrics.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKENS_PER_SECOND_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+PROMPT_TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+# ---------------- Chat pipeline metrics ---------------- #
+
+STAGE_SECONDS = Histogram(
+    "chatbot_stage_seconds",
+    "Latency of each chat pipeline stage",
+    labelnames=("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "chatbot_request_seconds",
+    "End-to-end request latency",
+    labelnames=("endpoint", "status"),
+)
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "chatbot_generation_tokens_per_second",
+    "LLM output tokens per second after the first token",
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "chatbot_prompt_tokens",
+    "Estimated prompt tokens per LLM call",
+    buckets=PROMPT_TOKEN_BUCKETS,
+)
+SESSION_EVENTS = Counter(
+    "chatbot_session_events_total",
+    "Conversation store events (created, resync, out_of_sync, retrieval_reused)",
+    labelnames=("event",),
+)
+
+CONDENSE_EVENTS = Counter(
+    "chatbot_condense_total",
+    "Retrieval queries by condensation outcome (standalone, rules, llm, llm_agreed, llm_fallback)",
+    labelnames=("outcome",),
+)
+
+ADMISSION_EVENTS = Counter(
+    "chatbot_admission_total",
+    "Generation admission decisions (admitted, queued, rejected_*, upstream_429)",
+    labelnames=("outcome",),
+)
+
+MODEL_ROUTES = Counter(
+    "chatbot_model_routes_total",
+    "Generations by routed model and reason (router.py)",
+    labelnames=("model", "reason"),
+)
+
+HEDGE_EVENTS = Counter(
+    "chatbot_llm_hedges_total",
+    "Hedged Groq streams (fired, skipped_budget, primary_won, backup_won)",
+    labelnames=("outcome",),
+)
+
+COALESCE_EVENTS = Counter(
+    "chatbot_coalesced_requests_total",
+    "Requests by single-flight role; each follower is an upstream run saved",
+    labelnames=("group", "role"),
+)
+
+
+def _render_caches():
+    lines = [
+        "# HELP chatbot_cache_requests_total Cache lookups by result",
+        "# TYPE chatbot_cache_requests_total counter",
+    ]
+    for name, stats in sorted(cache_stats().items()):
+        lines.append(f'chatbot_cache_requests_total{{cache="{name}",result="hit"}} {stats.get("hits", 0)}')
+        lines.append(f'chatbot_cache_requests_total{{cache="{name}",result="miss"}} {stats.get("misses", 0)}')
+    return lines
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+import asyncio
+import weakref
+
+from .metrics import COALESCE_EVENTS
+
+# In-flight request coalescing ("single flight").
+#
+# Caches only help once an answer exists; when a marketing email goes out,
+# dozens of visitors ask the same opening question within the same few
+# seconds and each would run its own embed -> vector query -> Groq chain.
+# SingleFlight lets concurrent callers with the same key share one upstream
+# run: the first caller (leader) starts it as a background task, later ones
+# (followers) subscribe to it. Every chunk the upstream produces is buffered,
+# so a follower joining mid-stream first gets the prefix, then the rest live.
+#
+# The upstream task is detached from any one caller: the leader
+# disconnecting doesn't cut off the followers. It is cancelled only when
+# every subscriber has gone. Once it finishes the key is free again (by then
+# the answer cache holds the result).
+#
+# Runs on the API's event loop; no locking needed.
+
+
+class _Flight:
+    def __init__(self, key):
+        self.key = key
+        self.ready = asyncio.get_running_loop().create_future()
+        # Nobody may be left to retrieve a failure; don't warn about it
+        self.ready.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def changed(self):
+        await self._changed.wait()
+
+
+class _Subscription:
+    """One caller's interest in a flight; leave() exactly once (idempotent)."""
+
+    def __init__(self, group, flight):
+        self._group = group
+        self.flight = flight
+        self.left = False
+        flight.subscribers += 1
+
+    def leave(self):
+        if not self.left:
+            self.left = True
+            self._group._leave(self.flight)
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        self._flights = {}
+
+    async def join(self, key, prepare):
+        """
+        Share `prepare` between concurrent callers with the same key.
+
+        `prepare()` is a coroutine returning (meta, async iterator of chunks);
+        it runs once per flight. Returns the flight's meta and this caller's
+        chunk stream. An exception from `prepare()` is raised to every caller.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(flight, prepare))
+            self.leaders += 1
+            COALESCE_EVENTS.inc(group=self.name, role="leader")
+        else:
+            self.followers += 1
+            COALESCE_EVENTS.inc(group=self.name, role="follower")
+
+        subscription = _Subscription(self, flight)
+        try:
+            meta = await asyncio.shield(flight.ready)
+        except BaseException:
+            subscription.leave()
+            raise
+        stream = self._follow(subscription)
+        # The stream's finally leaves; this covers one never started
+        weakref.finalize(stream, subscription.leave)
+        return meta, stream
+
+    async def _run(self, flight, prepare):
+        stream = None
+        try:
+            meta, stream = await prepare()
+            flight.ready.set_result(meta)
+            async for chunk in stream:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            if not flight.ready.done():
+                flight.ready.cancel()
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            if not flight.ready.done():
+                flight.ready.set_exception(e)
+            flight.error = e
+        finally:
+            if stream is not None and hasattr(stream, "aclose"):
+                await stream.aclose()
+            flight.finished = True
+            flight.notify()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def _follow(self, subscription):
+        flight = subscription.flight
+        sent = 0
+        try:
+            while True:
+                while sent < len(flight.chunks):
+                    yield flight.chunks[sent]
+                    sent += 1
+                if flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed()
+        finally:
+            subscription.leave()
+
+    def _leave(self, flight):
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.finished:
+            # Nobody is listening any more: stop the upstream call
+            flight.task.cancel()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "subscribers": sum(f.subscribers for f in self._flights.values()),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -0,0 +1,77 @@
+
+import os
+import json
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Server-Sent Events framing for /chat/stream.
+#
+#   event: start   data: {"id": <message id>}
+#   event: delta   data: {"id": ..., "delta": "<token text>"}
+#   event: done    data: {"id": ...}
+#   event: error   data: {"id": ..., "message": "..."}
+#   : ping         comment line every SSE_HEARTBEAT_SECONDS while waiting
+#
+# Tokens are pumped from the chat generator by a separate task into a small
+# bounded queue. When the client disconnects, Starlette cancels the response
+# and the finally-block cancels that task, which closes the upstream Groq
+# stream instead of letting it generate into the void.
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_QUEUE_SIZE = 64
+
+ERROR_MESSAGE = "Something went wrong while generating the response. Please try again."
+
+HEARTBEAT = ": ping\n\n"
+
+_DONE = object()
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _pump(tokens, queue):
+    try:
+        async for token in tokens:
+            await queue.put(token)
+        await queue.put(_DONE)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await queue.put(e)
+    finally:
+        await tokens.aclose()
+
+
+async def sse_stream(tokens, message_id, heartbeat=None):
+    """
+    Wrap an async token generator in SSE start/delta/done/error events
+    with heartbeats.
+    """
+    heartbeat = heartbeat or SSE_HEARTBEAT_SECONDS
+    queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    producer = asyncio.create_task(_pump(tokens, queue))
+
+    try:
+        yield sse_event("start", {"id": message_id})
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+
+            if item is _DONE:
+                yield sse_event("done", {"id": message_id})
+                return
+            if isinstance(item, Exception):
+                logger.error("STREAM ERROR [%s]: %r", message_id, item, exc_info=item)
+                yield sse_event("error", {"id": message_id, "message": ERROR_MESSAGE})
+                return
+            yield sse_event("delta", {"id": message_id, "delta": item})
+    finally:
+        # Client went away (or we finished): stop the upstream generation
+        producer.cancel()
@@ -0,0 +1,82 @@
+
+import os
+import uuid
+import logging
+from contextvars import ContextVar
+
+# Request IDs and an opt-in tracing hook.
+#
+# Every HTTP request gets an ID (taken from an incoming X-Request-Id header or
+# generated) that is stored in a context variable, added to every log record
+# as %(request_id)s and echoed back in the X-Request-Id response header.
+#
+# TRACER is None unless TRACE_RETRIEVAL=1 (or set_tracer() was called), and
+# hot paths only build trace payloads behind `if tracing.TRACER is not None`,
+# so tracing costs one attribute check when disabled.
+
+request_id_var = ContextVar("request_id", default="-")
+
+logger = logging.getLogger("app.trace")
+
+TRACER = None
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(level=logging.INFO):
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+        force=True,
+    )
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter())
+
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware (safe for streaming responses)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        request_id = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def log_tracer(event, payload):
+    logger.info("TRACE %s %s", event, payload)
+
+
+def set_tracer(tracer):
+    """Install a callable(event, payload), or None to disable tracing."""
+    global TRACER
+    TRACER = tracer
+
+
+if os.getenv("TRACE_RETRIEVAL", "").lower() in ("1", "true", "yes"):
+    set_tracer(log_tracer)
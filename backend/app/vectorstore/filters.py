@@ -0,0 +1,62 @@
+import numpy as np
+
+# Metadata filters for the local indexes (local_store.py, bm25.py), in the
+# subset of Pinecone's filter syntax the retriever uses:
+#   {"field": value}  {"field": {"$eq": value}}  {"field": {"$in": [values]}}
+# with several fields ANDed. A list-valued field matches when any element
+# does, as in Pinecone.
+#
+# The index is pre-partitioned: per field, value -> sorted row indices,
+# built once per snapshot on first use, and the resolved rows of each
+# distinct filter are memoised (queries only produce a handful). A filtered
+# query then scores only those rows instead of the whole matrix.
+
+
+class MetadataPartitions:
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self._fields = {}
+        self._resolved = {}
+
+    def _partitions(self, field):
+        partitions = self._fields.get(field)
+        if partitions is None:
+            rows = {}
+            for row, meta in enumerate(self.metadata):
+                values = (meta or {}).get(field)
+                if values is None:
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    rows.setdefault(value, []).append(row)
+            partitions = self._fields[field] = {
+                value: np.asarray(r, dtype=np.int64) for value, r in rows.items()
+            }
+        return partitions
+
+    def rows(self, metadata_filter):
+        """Sorted row indices matching every condition of the filter."""
+        key = repr(sorted(metadata_filter.items()))
+        rows = self._resolved.get(key)
+        if rows is None:
+            rows = self._resolved[key] = self._resolve(metadata_filter)
+        return rows
+
+    def _resolve(self, metadata_filter):
+        selected = None
+        for field, condition in metadata_filter.items():
+            if isinstance(condition, dict):
+                if set(condition) - {"$eq", "$in"}:
+                    raise ValueError(f"Unsupported filter operator in {condition}")
+                values = list(condition.get("$in", [])) + (
+                    [condition["$eq"]] if "$eq" in condition else []
+                )
+            else:
+                values = [condition]
+
+            partitions = self._partitions(field)
+            parts = [partitions[v] for v in values if v in partitions]
+            rows = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+        if selected is None:
+            return np.arange(len(self.metadata))
+        return selected
@@ -0,0 +1,292 @@
+
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+from ..utils.cache import bump_generation
+from .filters import MetadataPartitions
+
+# Local, in-process alternative to Pinecone for a small corpus.
+#
+# On disk (LOCAL_INDEX_DIR):
+#   vectors-<version>.f32  — row-major float32 matrix (n x 384), unit-normalised
+#                            rows, memory-mapped read-only at query time
+#   meta.json              — {"dim": 384, "vectors": "vectors-<version>.f32",
+#                             "ids": [...], "metadata": [...]}, row-aligned
+# Every write puts the matrix in a new file and then atomically replaces
+# meta.json, which names it, so a reader never pairs vectors and metadata
+# from different writes.
+#
+# Queries are exact cosine top-k via one matrix-vector product; with a
+# metadata filter only the matching partitions' rows are scored
+# (filters.py). Setting
+# LOCAL_INDEX_TYPE=hnsw builds an approximate hnswlib index on load instead
+# (optional dependency) for when the corpus outgrows brute force.
+# Files written by another process (e.g. an ingestion script) are picked up
+# within LOCAL_INDEX_RELOAD_SECONDS.
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+
+LOCAL_INDEX_DIR = os.getenv(
+    "LOCAL_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "local_index")
+)
+LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "exact")
+LOCAL_INDEX_RELOAD_SECONDS = float(os.getenv("LOCAL_INDEX_RELOAD_SECONDS", "5"))
+
+VECTORS_FILE = "vectors.f32"  # before versioned files; still read
+META_FILE = "meta.json"
+READ_ATTEMPTS = 3
+
+
+class _Snapshot:
+    """Immutable view of the index; swapped atomically on every write."""
+
+    def __init__(self, ids, matrix, metadata, mtime=None):
+        self.ids = ids
+        self.matrix = matrix
+        self.metadata = metadata
+        self.mtime = mtime
+        self.rows = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self.partitions = MetadataPartitions(metadata)
+        self.ann = None
+
+
+_snapshot = None
+_checked_at = 0.0
+_write_lock = threading.Lock()
+
+
+def _meta_path():
+    return os.path.join(LOCAL_INDEX_DIR, META_FILE)
+
+
+def _meta_mtime():
+    try:
+        return os.stat(_meta_path()).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _load_meta():
+    """(meta, matrix, mtime) of the current files, or None if there is no index."""
+    for _ in range(READ_ATTEMPTS):
+        mtime = _meta_mtime()
+        if mtime is None:
+            return None
+        try:
+            with open(_meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            ids = meta["ids"]
+            if not ids:
+                return meta, np.zeros((0, DIMENSION), dtype=np.float32), mtime
+            vectors_path = os.path.join(LOCAL_INDEX_DIR, meta.get("vectors", VECTORS_FILE))
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode="r",
+                               shape=(len(ids), meta.get("dim", DIMENSION)))
+            return meta, matrix, mtime
+        except FileNotFoundError:
+            # Rewritten between reading meta.json and mapping its vectors
+            continue
+    raise RuntimeError(f"Local index in {LOCAL_INDEX_DIR} kept changing while loading")
+
+
+def _read_snapshot():
+    loaded = _load_meta()
+    if loaded is None:
+        return _Snapshot([], np.zeros((0, DIMENSION), dtype=np.float32), [])
+
+    meta, matrix, mtime = loaded
+    snapshot = _Snapshot(meta["ids"], matrix, meta["metadata"], mtime)
+    if LOCAL_INDEX_TYPE == "hnsw":
+        snapshot.ann = _build_hnsw(matrix)
+    return snapshot
+
+
+def _build_hnsw(matrix):
+    if len(matrix) == 0:
+        return None
+    try:
+        import hnswlib
+    except ImportError as e:
+        raise ImportError("LOCAL_INDEX_TYPE=hnsw needs `pip install hnswlib`") from e
+
+    ann = hnswlib.Index(space="ip", dim=matrix.shape[1])
+    ann.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+    ann.add_items(np.asarray(matrix), np.arange(len(matrix)))
+    ann.set_ef(64)
+    return ann
+
+
+def _get_snapshot():
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    if _snapshot is None or now - _checked_at >= LOCAL_INDEX_RELOAD_SECONDS:
+        _checked_at = now
+        if _snapshot is None:
+            _snapshot = _read_snapshot()
+        elif _meta_mtime() != _snapshot.mtime:
+            # Rebuilt by another process — drop cached retrieval results
+            _snapshot = _read_snapshot()
+            bump_generation(shared=False)
+    return _snapshot
+
+
+def _write_snapshot(ids, matrix, metadata):
+    """
+    Persist atomically (new vectors file, then rename meta.json over the
+    old one) and swap in memory.
+    """
+    global _snapshot, _checked_at
+    os.makedirs(LOCAL_INDEX_DIR, exist_ok=True)
+    meta_path = _meta_path()
+    vectors_file = f"vectors-{time.time_ns()}.f32"
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    with open(os.path.join(LOCAL_INDEX_DIR, vectors_file), "wb") as f:
+        f.write(matrix.tobytes())
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"dim": DIMENSION, "vectors": vectors_file, "ids": ids, "metadata": metadata},
+                  f, ensure_ascii=False)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Readers that already mapped an older file keep it until they reload
+    for name in os.listdir(LOCAL_INDEX_DIR):
+        if name.startswith("vectors") and name.endswith(".f32") and name != vectors_file:
+            try:
+                os.remove(os.path.join(LOCAL_INDEX_DIR, name))
+            except OSError:
+                # Gone already, or still mapped on a platform that forbids removal
+                pass
+
+    _snapshot = _read_snapshot()
+    _checked_at = time.monotonic()
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def _unpack(vector):
+    # Same shapes Pinecone's upsert accepts: (id, values[, metadata]) or dict
+    if isinstance(vector, dict):
+        return vector["id"], vector["values"], vector.get("metadata") or {}
+    chunk_id, values, *rest = vector
+    return chunk_id, values, (rest[0] if rest else {}) or {}
+
+
+# ---------------- Public surface (mirrors pinecone_client) ---------------- #
+
+def upsert_embeddings(vectors):
+    vectors = [_unpack(v) for v in vectors]
+    if not vectors:
+        return
+
+    with _write_lock:
+        current = _get_snapshot()
+        ids = list(current.ids)
+        metadata = list(current.metadata)
+        rows = dict(current.rows)
+
+        new_values = _normalize(np.asarray([v for _, v, _ in vectors], dtype=np.float32))
+        matrix = np.empty((len(ids) + len(vectors), DIMENSION), dtype=np.float32)
+        matrix[:len(ids)] = current.matrix
+
+        n = len(ids)
+        for (chunk_id, _, meta), values in zip(vectors, new_values):
+            row = rows.get(chunk_id)
+            if row is None:
+                row = rows[chunk_id] = n
+                ids.append(chunk_id)
+                metadata.append(meta)
+                n += 1
+            else:
+                metadata[row] = meta
+            matrix[row] = values
+
+        _write_snapshot(ids, matrix[:n], metadata)
+
+
+def delete_embeddings(chunk_ids):
+    drop = set(chunk_ids)
+    if not drop:
+        return
+
+    with _write_lock:
+        current = _get_snapshot()
+        keep = [i for i, chunk_id in enumerate(current.ids) if chunk_id not in drop]
+        if len(keep) == len(current.ids):
+            return
+        _write_snapshot(
+            [current.ids[i] for i in keep],
+            current.matrix[keep],
+            [current.metadata[i] for i in keep],
+        )
+
+
+def query_embedding(vector, top_k=5, include_values=False, filter=None):
+    snapshot = _get_snapshot()
+    n = len(snapshot.ids)
+    if n == 0:
+        return {"matches": []}
+
+    query = _normalize(np.asarray(vector, dtype=np.float32).reshape(-1))
+
+    if filter:
+        # Brute force over the matching partitions, also under hnsw:
+        # they are a fraction of the index
+        candidates = snapshot.partitions.rows(filter)
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return {"matches": []}
+        sub_scores = snapshot.matrix[candidates] @ query
+        best = np.argpartition(-sub_scores, k - 1)[:k] if k < len(candidates) else np.arange(k)
+        best = best[np.argsort(-sub_scores[best])]
+        top = candidates[best]
+        scores = sub_scores[best]
+    elif snapshot.ann is not None:
+        k = min(top_k, n)
+        labels, distances = snapshot.ann.knn_query(query, k=k)
+        top = labels[0]
+        scores = 1.0 - distances[0]
+    else:
+        k = min(top_k, n)
+        all_scores = snapshot.matrix @ query
+        top = np.argpartition(-all_scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-all_scores[top])]
+        scores = all_scores[top]
+
+    matches = []
+    for row, score in zip(top, scores):
+        match = {
+            "id": snapshot.ids[row],
+            "score": float(score),
+            "metadata": snapshot.metadata[row],
+        }
+        if include_values:
+            match["values"] = snapshot.matrix[row].tolist()
+        matches.append(match)
+    return {"matches": matches}
+
+
+def connect():
+    """Load the index files (the API does this at startup)."""
+    _get_snapshot()
+
+
+def fetch_embeddings(chunk_ids):
+    """Fetch stored vectors by ID -> {chunk_id: [floats]}"""
+    snapshot = _get_snapshot()
+    return {
+        chunk_id: snapshot.matrix[snapshot.rows[chunk_id]].tolist()
+        for chunk_id in chunk_ids
+        if chunk_id in snapshot.rows
+    }
+
+
+def check_existing_ids(chunk_ids):
+    snapshot = _get_snapshot()
+    return {chunk_id for chunk_id in chunk_ids if chunk_id in snapshot.rows}
@@ -1,5 +1,7 @@
 
 import os
+import asyncio
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,37 +10,91 @@ load_dotenv()
 # (fixes Render port binding failure)
 _pc = None
 _index = None
+_index_lock = threading.Lock()
 
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "i95dev-chatbot")
+# With the index host known, the client talks to the data plane directly:
+# no list_indexes() / describe_index() round trips on a cold start
+INDEX_HOST = os.getenv("PINECONE_HOST", "")
 
 
 def _get_index():
     global _pc, _index
-    if _index is None:
-        from pinecone import Pinecone, ServerlessSpec
-        _pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-        existing = [idx.name for idx in _pc.list_indexes()]
-        if INDEX_NAME not in existing:
-            print(f"Creating Pinecone index: {INDEX_NAME}")
-            _pc.create_index(
-                name=INDEX_NAME,
-                dimension=384,  # all-MiniLM-L6-v2
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
-            )
-            print(f"✅ Index '{INDEX_NAME}' created successfully")
-
-        _index = _pc.Index(INDEX_NAME)
+    if _index is not None:
+        return _index
+    # Queries now run on worker threads — make sure only one of them
+    # creates the client / index on a cold start.
+    with _index_lock:
+        if _index is None:
+            from pinecone import Pinecone, ServerlessSpec
+            _pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+            if INDEX_HOST:
+                _index = _pc.Index(host=INDEX_HOST)
+                return _index
+
+            existing = [idx.name for idx in _pc.list_indexes()]
+            if INDEX_NAME not in existing:
+                print(f"Creating Pinecone index: {INDEX_NAME}")
+                _pc.create_index(
+                    name=INDEX_NAME,
+                    dimension=384,  # all-MiniLM-L6-v2
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                )
+                print(f"✅ Index '{INDEX_NAME}' created successfully")
+
+            _index = _pc.Index(INDEX_NAME)
     return _index
 
 
+def connect():
+    """Create the client and resolve the index — the API does this at startup."""
+    _get_index()
+
+
 def upsert_embeddings(vectors):
     _get_index().upsert(vectors=vectors)
 
 
-def query_embedding(vector, top_k=5):
-    return _get_index().query(vector=vector, top_k=top_k, include_metadata=True)
+def delete_embeddings(chunk_ids):
+    BATCH_SIZE = 1000
+    for i in range(0, len(chunk_ids), BATCH_SIZE):
+        _get_index().delete(ids=chunk_ids[i:i + BATCH_SIZE])
+
+
+def query_embedding(vector, top_k=5, include_values=False, filter=None):
+    # Embeddings come back as float32 numpy rows; the SDK wants plain floats
+    if hasattr(vector, "tolist"):
+        vector = vector.tolist()
+    kwargs = {"filter": filter} if filter else {}
+    return _get_index().query(
+        vector=vector,
+        top_k=top_k,
+        include_metadata=True,
+        include_values=include_values,
+        **kwargs
+    )
+
+
+async def aquery_embedding(vector, top_k=5, **kwargs):
+    # The Pinecone SDK is synchronous; run the query on the default thread
+    # pool so it does not block the event loop.
+    return await asyncio.to_thread(query_embedding, vector, top_k, **kwargs)
+
+
+def fetch_embeddings(chunk_ids):
+    """Fetch stored vectors by ID -> {chunk_id: [floats]}"""
+    index = _get_index()
+    vectors = {}
+    BATCH_SIZE = 1000
+
+    for i in range(0, len(chunk_ids), BATCH_SIZE):
+        result = index.fetch(ids=chunk_ids[i:i + BATCH_SIZE])
+        for chunk_id, vec in result.get('vectors', {}).items():
+            vectors[chunk_id] = vec["values"] if isinstance(vec, dict) else vec.values
+
+    return vectors
 
 
 def check_existing_ids(chunk_ids):
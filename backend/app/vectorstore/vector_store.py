@@ -0,0 +1,74 @@
+
+import os
+import importlib
+
+from dotenv import load_dotenv
+
+from ..utils.cache import bump_generation
+
+load_dotenv()
+
+# Vector store backend, selected by VECTOR_STORE:
+#   pinecone  Pinecone serverless (default)
+#   local     memory-mapped matrix on disk (local_store.py), no network
+# Both expose upsert_embeddings / delete_embeddings / query_embedding /
+# fetch_embeddings / check_existing_ids with Pinecone-shaped results;
+# query_embedding takes an optional Pinecone-syntax metadata `filter`.
+BACKENDS = {
+    "pinecone": "app.vectorstore.pinecone_client",
+    "local": "app.vectorstore.local_store",
+}
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = importlib.import_module(BACKENDS.get(VECTOR_STORE, VECTOR_STORE))
+    return _backend
+
+
+# Writes bump the cache generation so cached embeddings / retrieval
+# results from the previous index are never served.
+
+def upsert_embeddings(vectors):
+    get_backend().upsert_embeddings(vectors)
+    bump_generation()
+
+
+def delete_embeddings(chunk_ids):
+    get_backend().delete_embeddings(chunk_ids)
+    bump_generation()
+
+
+def connect():
+    """
+    Set up the backend's client / index up front so the first query does
+    not pay for it. Backends without a connect() have nothing to set up.
+    """
+    backend = get_backend()
+    if hasattr(backend, "connect"):
+        backend.connect()
+
+
+def query_embedding(vector, top_k=5, **kwargs):
+    return get_backend().query_embedding(vector, top_k, **kwargs)
+
+
+async def aquery_embedding(vector, top_k=5, **kwargs):
+    backend = get_backend()
+    if hasattr(backend, "aquery_embedding"):
+        return await backend.aquery_embedding(vector, top_k, **kwargs)
+    # Local queries are sub-millisecond — cheaper inline than a thread hop
+    return backend.query_embedding(vector, top_k, **kwargs)
+
+
+def fetch_embeddings(chunk_ids):
+    return get_backend().fetch_embeddings(chunk_ids)
+
+
+def check_existing_ids(chunk_ids):
+    return get_backend().check_existing_ids(chunk_ids)
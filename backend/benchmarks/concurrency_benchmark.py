@@ -0,0 +1,185 @@
+"""
+Concurrency benchmark for the chat pipeline against local stubs.
+
+Replaces the HuggingFace, Pinecone and Groq calls with stubs that sleep for
+a fixed latency, then fires N concurrent chats through:
+
+  - the async pipeline (achat_stream)  — what the API uses now
+  - the sync pipeline (chat_stream)    — what the API used to call inline
+
+on a single event loop, i.e. one uvicorn worker. With the async pipeline the
+wall time stays ~flat as concurrency grows; the sync one grows linearly.
+
+Usage:
+    python benchmarks/concurrency_benchmark.py [--levels 1,10,100,500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Groq clients are created at import time and need a key, never used here
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+# Every request asks the same question — keep the caches out of the way
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+
+from app import chatbot  # noqa: E402
+from app.llm import groq_client  # noqa: E402
+from app.retrieval import retriever  # noqa: E402
+
+EMBED_LATENCY = 0.05
+QUERY_LATENCY = 0.08
+TTFT = 0.30
+TOKEN_INTERVAL = 0.01
+TOKENS = 40
+
+STUB_RESULTS = {
+    "matches": [
+        {"id": "stub", "score": 0.8, "metadata": {"text": "i95Dev stub chunk", "source": "stub"}}
+    ]
+}
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+# ---------------- Sync stubs (blocking) ---------------- #
+
+def _embed_sync(texts):
+    time.sleep(EMBED_LATENCY)
+    return [[0.0] * 384 for _ in texts]
+
+
+def _query_sync(vector, top_k=5):
+    time.sleep(QUERY_LATENCY)
+    return STUB_RESULTS
+
+
+class _SyncCompletions:
+    def create(self, **kwargs):
+        def gen():
+            time.sleep(TTFT)
+            for i in range(TOKENS):
+                if i:
+                    time.sleep(TOKEN_INTERVAL)
+                yield _chunk("tok ")
+        return gen()
+
+
+# ---------------- Async stubs ---------------- #
+
+async def _embed_async(texts):
+    await asyncio.sleep(EMBED_LATENCY)
+    return [[0.0] * 384 for _ in texts]
+
+
+async def _query_async(vector, top_k=5):
+    await asyncio.sleep(QUERY_LATENCY)
+    return STUB_RESULTS
+
+
+class _AsyncStream:
+    def __init__(self):
+        self._gen = self._tokens()
+
+    async def _tokens(self):
+        await asyncio.sleep(TTFT)
+        for i in range(TOKENS):
+            if i:
+                await asyncio.sleep(TOKEN_INTERVAL)
+            yield _chunk("tok ")
+
+    def __aiter__(self):
+        return self._gen
+
+    async def close(self):
+        await self._gen.aclose()
+
+
+class _AsyncCompletions:
+    async def create(self, stream=False, **kwargs):
+        if stream:
+            return _AsyncStream()
+        await asyncio.sleep(TTFT + TOKEN_INTERVAL * (TOKENS - 1))
+        message = SimpleNamespace(content="tok " * TOKENS)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def install_stubs():
+    retriever.embed_texts = _embed_sync
+    retriever.query_embedding = _query_sync
+    retriever.aembed_texts = _embed_async
+    retriever.aquery_embedding = _query_async
+    groq_client.client = SimpleNamespace(chat=SimpleNamespace(completions=_SyncCompletions()))
+    groq_client.async_client = SimpleNamespace(chat=SimpleNamespace(completions=_AsyncCompletions()))
+
+
+# ---------------- Runners ---------------- #
+
+# Latency is measured from the moment the whole batch arrives, so requests
+# stuck behind a blocked event loop are counted as waiting.
+
+async def _one_async(start):
+    async for _ in chatbot.achat_stream("What is BC integration?", []):
+        pass
+    return time.perf_counter() - start
+
+
+async def _one_sync(start):
+    # Mirrors the old endpoint: sync generator consumed on the event loop
+    for _ in chatbot.chat_stream("What is BC integration?", []):
+        pass
+    return time.perf_counter() - start
+
+
+async def run_level(runner, concurrency):
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(runner(start) for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "rps": concurrency / wall,
+        "p50_s": latencies[len(latencies) // 2],
+        "max_s": latencies[-1],
+    }
+
+
+def _print_row(name, r):
+    print(
+        f"  {name:<6} c={r['concurrency']:<5} wall={r['wall_s']:7.2f}s  "
+        f"rps={r['rps']:8.1f}  p50={r['p50_s']:6.2f}s  max={r['max_s']:6.2f}s"
+    )
+
+
+async def main(levels, sync_limit):
+    install_stubs()
+    single = EMBED_LATENCY + QUERY_LATENCY + TTFT + TOKEN_INTERVAL * (TOKENS - 1)
+    print(f"⏱  Stubbed single-chat latency ≈ {single:.2f}s\n")
+
+    for level in levels:
+        print(f"📊 Concurrency {level}")
+        _print_row("async", await run_level(_one_async, level))
+        if level <= sync_limit:
+            _print_row("sync", await run_level(_one_sync, level))
+        else:
+            print(f"  sync   skipped (would take ~{single * level:.0f}s)")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", default="1,10,100,500")
+    parser.add_argument("--sync-limit", type=int, default=10,
+                        help="highest concurrency to run the sync baseline at")
+    args = parser.parse_args()
+
+    asyncio.run(main([int(x) for x in args.levels.split(",")], args.sync_limit))
@@ -0,0 +1,259 @@
+"""
+Offline evaluation of follow-up query condensation (app/retrieval/condense.py).
+
+Replays short conversations whose last message only makes sense with the
+earlier turns ("how long does that take?", "the second one") and checks
+whether the page that answers it is retrieved, once on the raw message and
+once on the condensed query:
+
+  hit@k      share of follow-ups with an expected page in the top-k chunks
+  MRR        mean reciprocal rank of the first expected page
+
+Uses the configured vector store / embeddings / BM25 index, so run it
+against the index you serve from. --mode llm also evaluates the small-model
+rewrite (needs GROQ_API_KEY). --dataset takes JSONL with the same fields
+as CONVERSATIONS.
+
+Usage:
+    python benchmarks/condense_eval.py [--top-k 4] [--mode rules|llm] [--verbose]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.retrieval import condense as condense_module  # noqa: E402
+from app.retrieval.condense import condense  # noqa: E402
+from app.retrieval.retriever import retrieve, results_cache  # noqa: E402
+
+
+def _turns(*pairs):
+    messages = []
+    for question, answer in pairs:
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    return messages
+
+
+CONVERSATIONS = [
+    {
+        "history": _turns(("Do you have a Shopify SAP Business One connector?",
+                           "Yes, i95Dev offers Shopify SAP Business One Connect.")),
+        "query": "How does it keep inventory in sync?",
+        "expected": ["shopify-sap-business-one-connect"],
+    },
+    {
+        "history": _turns(("Which SAP Business One connectors does i95Dev offer?",
+                           "i95Dev offers:\n1. **Magento SAP Business One Connect**: for Adobe Commerce stores\n"
+                           "2. **Shopify SAP Business One Connect**: for Shopify stores\n"
+                           "3. **BigCommerce SAP Business One Connect**: for BigCommerce stores")),
+        "query": "Tell me about the second one",
+        "expected": ["shopify-sap-business-one-connect"],
+    },
+    {
+        "history": _turns(("Which SAP Business One connectors does i95Dev offer?",
+                           "1. Magento SAP Business One Connect\n2. Shopify SAP Business One Connect\n"
+                           "3. BigCommerce SAP Business One Connect")),
+        "query": "What does the last one sync?",
+        "expected": ["bigcommerce-sap-business-one-connect"],
+    },
+    {
+        "history": _turns(("Tell me about the BigCommerce SAP Business One connector",
+                           "BigCommerce SAP Business One Connect syncs orders, customers and inventory.")),
+        "query": "What about Shopify?",
+        "expected": ["shopify-sap-business-one-connect"],
+    },
+    {
+        "history": _turns(("What are the challenges of Magento and Dynamics GP integration?",
+                           "Common challenges include data mapping and real-time sync.")),
+        "query": "Is there a whitepaper on that?",
+        "expected": ["complete-guide-magento-microsoft-dynamics-gp-integration"],
+    },
+    {
+        "history": _turns(("What is the Salesforce Business Central connector?",
+                           "It connects Salesforce with Dynamics 365 Business Central.")),
+        "query": "What data does it sync?",
+        "expected": ["salesforce-dynamics-365-business-central-connect"],
+    },
+    {
+        "history": _turns(("What is the SessionReaper vulnerability?",
+                           "SessionReaper (CVE-2025-54236) is a critical Adobe Commerce vulnerability.")),
+        "query": "How do I protect my store from it?",
+        "expected": ["sessionreaper"],
+    },
+    {
+        "history": _turns(("What's new in Magento 2.4.8?",
+                           "Magento 2.4.8 brings security fixes and platform upgrades.")),
+        "query": "Why should I upgrade to it?",
+        "expected": ["why-upgrade-to-magento-2-4-8"],
+    },
+    {
+        "history": _turns(("Tell me about buy online pickup in store",
+                           "Buy online, pick up in store lets customers order online and collect in person.")),
+        "query": "What are the benefits?",
+        "expected": ["buy-online-pickup-in-store"],
+    },
+    {
+        "history": _turns(("Do you have an ERP integration ROI calculator?",
+                           "Yes, i95Dev has an ERP integration ROI calculator.")),
+        "query": "How does it work?",
+        "expected": ["erp-integration-roi-calculator"],
+    },
+    {
+        "history": _turns(("What is the agentic commerce protocol?",
+                           "It is a protocol for AI agents to transact with online stores.")),
+        "query": "How will that change ecommerce?",
+        "expected": ["agentic-commerce", "shopify-agentic-commerce"],
+    },
+    {
+        "history": _turns(("How do I migrate from Magento 1 to Magento 2?",
+                           "i95Dev helps merchants migrate from Magento 1 to Magento 2.")),
+        "query": "Is there a webinar about that?",
+        "expected": ["magento-1-to-magento-2-migration"],
+    },
+    {
+        "history": _turns(("What is Adobe Commerce Optimizer?",
+                           "Adobe Commerce Optimizer is an AI-powered storefront upgrade.")),
+        "query": "What does it add to the storefront?",
+        "expected": ["adobe-commerce-optimizer"],
+    },
+    {
+        "history": _turns(("What does the holiday ecommerce readiness checklist cover?",
+                           "It covers site performance, inventory and promotions before the holidays.")),
+        "query": "Where can I get it?",
+        "expected": ["holiday-ecommerce-readiness-checklist"],
+    },
+    {
+        "history": _turns(("How does Adobe Analytics compare with Google Analytics?",
+                           "Both track site behaviour; they differ in depth and pricing.")),
+        "query": "Which one is better for ecommerce?",
+        "expected": ["adobe-analytics-vs-google-analytics"],
+    },
+    {
+        "history": _turns(("What is extended pricing in B2B ecommerce?",
+                           "Extended pricing covers customer-specific prices, tiers and discounts.")),
+        "query": "How do they work with the ERP?",
+        "expected": ["extended-pricing-in-b2b-ecommerce"],
+    },
+    {
+        "history": _turns(("Do you have a guide on ecommerce ADA compliance?",
+                           "Yes, i95Dev has a comprehensive guide on ecommerce and ADA compliance.")),
+        "query": "Why does it matter?",
+        "expected": ["ada-compliance"],
+    },
+    {
+        "history": _turns(("How long does it take to implement your ecommerce platform?",
+                           "Timelines depend on scope and integrations.")),
+        "query": "And how much can I customize it?",
+        "expected": ["customize-my-online-store"],
+    },
+    {
+        "history": _turns(("Does i95Dev integrate Adobe Commerce with NetSuite?",
+                           "Yes, i95Dev integrates Adobe Commerce with NetSuite.")),
+        "query": "What are the benefits?",
+        "expected": ["adobe-commerce-netsuite-integration"],
+    },
+    {
+        "history": _turns(("Tell me about the Magento SAP Business One connector",
+                           "Magento SAP Business One Connect syncs orders, customers and inventory.")),
+        "query": "Do you have an ebook on it?",
+        "expected": ["magento-sap-business-one-integration"],
+    },
+    {
+        "history": _turns(("Tell me about the Magento Microsoft Dynamics GP connector",
+                           "Magento Microsoft Dynamics GP Connect syncs orders, customers and inventory.")),
+        "query": "Can it sync customer groups and tier prices?",
+        "expected": ["magento-microsoft-dynamics-gp-connect"],
+    },
+    {
+        "history": _turns(("Do you have a Shopify Dynamics NAV connector?",
+                           "Yes, i95Dev offers Shopify Microsoft Dynamics NAV Connect.")),
+        "query": "and for BC?",
+        "expected": ["shopify-microsoft-dynamics-365-business-central-connect"],
+    },
+    # Standalone questions after a topic change must be left alone
+    {
+        "history": _turns(("What does the Magento SAP Business One connector do?",
+                           "It syncs orders, customers and inventory.")),
+        "query": "How do I become an i95Dev partner?",
+        "expected": ["become-a"],
+    },
+    {
+        "history": _turns(("What does the Magento SAP Business One connector do?",
+                           "It syncs orders, customers and inventory.")),
+        "query": "What is SessionReaper?",
+        "expected": ["sessionreaper"],
+    },
+]
+
+
+def _rank(matches, expected):
+    for rank, match in enumerate(matches, 1):
+        source = match["metadata"].get("source", "")
+        if any(fragment in source for fragment in expected):
+            return rank
+    return None
+
+
+def _evaluate(queries, cases, top_k):
+    ranks = []
+    for query, case in zip(queries, cases):
+        results_cache.clear()
+        ranks.append(_rank(retrieve(query, top_k)["matches"], case["expected"]))
+    hits = sum(r is not None for r in ranks)
+    mrr = sum(1 / r for r in ranks if r is not None) / len(ranks)
+    return ranks, hits / len(ranks), mrr
+
+
+async def _llm_queries(cases):
+    rewrites = []
+    for case in cases:
+        rewritten = await condense_module._allm_condense(case["query"], case["history"])
+        rewrites.append(rewritten or condense(case["query"], case["history"]))
+    return rewrites
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--mode", choices=["rules", "llm"], default="rules")
+    parser.add_argument("--dataset", help="JSONL of {history, query, expected}")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = CONVERSATIONS
+    if args.dataset:
+        with open(args.dataset, encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+
+    start = time.perf_counter()
+    condensed = [condense(case["query"], case["history"]) for case in cases]
+    condense_ms = (time.perf_counter() - start) * 1000 / len(cases)
+
+    runs = [("raw", [case["query"] for case in cases]), ("rules", condensed)]
+    if args.mode == "llm":
+        condense_module.CONDENSE_TIMEOUT = 10.0
+        runs.append(("llm", asyncio.run(_llm_queries(cases))))
+
+    print(f"🔍 {len(cases)} follow-ups, top_k={args.top_k}, "
+          f"rule condensation {condense_ms:.3f}ms/query\n")
+    results = {}
+    for name, queries in runs:
+        ranks, hit_rate, mrr = _evaluate(queries, cases, args.top_k)
+        results[name] = (queries, ranks)
+        print(f"📊 {name:<6} hit@{args.top_k}={hit_rate:.2f}  MRR={mrr:.3f}")
+
+    if args.verbose:
+        for i, case in enumerate(cases):
+            print(f"\n• {case['query']}")
+            for name, (queries, ranks) in results.items():
+                print(f"   {name:<6} rank={ranks[i] or '-':<2} {queries[i]}")
+
+
+if __name__ == "__main__":
+    main()
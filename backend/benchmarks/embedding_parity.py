@@ -0,0 +1,104 @@
+"""
+Parity check for the local ONNX embedding backend.
+
+Embeds a sample of the chunk store with EMBEDDING_BACKEND=local and compares
+each vector (cosine similarity) against a reference:
+
+  --reference pinecone   vectors already stored in the index (default; honours VECTOR_STORE)
+  --reference hf         fresh vectors from the HuggingFace Inference API
+
+Exits non-zero if any pair falls below --threshold, so it can gate a switch
+of the serving backend. Also reports local single-query latency.
+
+Usage:
+    python benchmarks/embedding_parity.py [--reference hf] [--sample 100] [--threshold 0.98]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embeddings import local_embedder  # noqa: E402
+from app.ingestion.chunk_store import open_store  # noqa: E402
+
+QUERIES = [
+    "What is BC integration?",
+    "pricing",
+    "Does i95Dev offer a NetSuite connector?",
+    "Magento 2 B2B eCommerce",
+]
+
+
+def _reference_vectors(reference, chunks):
+    if reference == "hf":
+        from app.embeddings import hf_embedder
+        matrix = hf_embedder.embed_texts([c["content"] for c in chunks])
+        return {c["chunk_id"]: row for c, row in zip(chunks, matrix)}
+
+    from app.vectorstore.vector_store import fetch_embeddings
+    return fetch_embeddings([c["chunk_id"] for c in chunks])
+
+
+def _normalize(m):
+    m = np.asarray(m, dtype=np.float32)
+    return m / np.clip(np.linalg.norm(m, axis=1, keepdims=True), 1e-12, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reference", choices=["pinecone", "hf"], default="pinecone")
+    parser.add_argument("--sample", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=95)
+    args = parser.parse_args()
+
+    chunks = list(open_store().iter_chunks())
+    random.Random(args.seed).shuffle(chunks)
+    chunks = chunks[:args.sample]
+
+    print(f"🔍 Loading {args.reference} reference vectors for {len(chunks)} chunks...")
+    reference = _reference_vectors(args.reference, chunks)
+    chunks = [c for c in chunks if c["chunk_id"] in reference]
+    if not chunks:
+        print("❌ None of the sampled chunk IDs have reference vectors")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    local = local_embedder.embed_texts([c["content"] for c in chunks])
+    elapsed = time.perf_counter() - start
+
+    ref = _normalize([reference[c["chunk_id"]] for c in chunks])
+    cosines = np.sum(_normalize(local) * ref, axis=1)
+
+    print(f"✅ Embedded {len(chunks)} chunks locally in {elapsed:.2f}s "
+          f"({len(chunks) / elapsed:.1f} texts/sec)")
+    print(f"📊 Cosine vs {args.reference}: min={cosines.min():.4f} "
+          f"mean={cosines.mean():.4f} p5={np.percentile(cosines, 5):.4f}")
+
+    latencies = []
+    for _ in range(20):
+        for q in QUERIES:
+            t = time.perf_counter()
+            local_embedder.embed_texts([q])
+            latencies.append((time.perf_counter() - t) * 1000)
+    print(f"⏱  Query embedding: p50={np.percentile(latencies, 50):.2f}ms "
+          f"p95={np.percentile(latencies, 95):.2f}ms")
+
+    worst = np.argsort(cosines)[:3]
+    if cosines.min() < args.threshold:
+        print(f"\n❌ Parity below threshold {args.threshold}:")
+        for i in worst:
+            print(f"   {cosines[i]:.4f}  {chunks[i]['url']}")
+        sys.exit(1)
+
+    print(f"\n✅ All pairs above threshold {args.threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Embedding throughput over the full chunk store corpus (HF backend).
+
+Runs embed_texts with several (batch size, concurrency) settings and
+reports texts/sec. By default it calls the real HuggingFace Inference API
+(needs HF_TOKEN); pass --stub-latency to replace it with a local stub that
+sleeps per request, which isolates the effect of round trips.
+
+Usage:
+    python benchmarks/embedding_throughput.py [--stub-latency 0.15] [--limit 632]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embeddings import hf_embedder as embedder  # noqa: E402
+from app.ingestion.chunk_store import open_store  # noqa: E402
+
+# (batch size, concurrent batches); (1, 1) is the old one-text-per-request loop
+CONFIGS = [(1, 1), (16, 1), (32, 1), (32, 4), (64, 4)]
+
+
+class _StubClient:
+    def __init__(self, latency, per_text):
+        self.latency = latency
+        self.per_text = per_text
+
+    def feature_extraction(self, text, model=None):
+        batch = [text] if isinstance(text, str) else text
+        time.sleep(self.latency + self.per_text * len(batch))
+        return np.random.rand(len(batch), embedder.EMBEDDING_DIM).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stub-latency", type=float, default=None,
+                        help="seconds per request for the local stub")
+    parser.add_argument("--stub-per-text", type=float, default=0.002,
+                        help="extra stub seconds per text in a request")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    texts = [c["content"] for c in open_store().iter_chunks()]
+    if args.limit:
+        texts = texts[:args.limit]
+
+    if args.stub_latency is not None:
+        stub = _StubClient(args.stub_latency, args.stub_per_text)
+        embedder._get_client = lambda: stub
+        print(f"🧪 Stub Inference API: {args.stub_latency * 1000:.0f}ms/request "
+              f"+ {args.stub_per_text * 1000:.1f}ms/text")
+
+    print(f"📂 {len(texts)} chunks\n")
+    for batch_size, concurrency in CONFIGS:
+        start = time.perf_counter()
+        matrix = embedder.embed_texts(texts, batch_size=batch_size, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        requests_made = -(-len(texts) // batch_size)
+        print(
+            f"  batch={batch_size:<3} concurrency={concurrency}  "
+            f"requests={requests_made:<4} {elapsed:7.2f}s  "
+            f"{len(texts) / elapsed:8.1f} texts/sec  shape={matrix.shape} {matrix.dtype}"
+        )
+
+
+if __name__ == "__main__":
+    main()
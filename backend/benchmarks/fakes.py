@@ -0,0 +1,298 @@
+"""
+Local stand-ins for the HuggingFace Inference API, Pinecone and Groq.
+
+Three small HTTP servers that speak just enough of each API for the real
+SDK clients, so benchmarks exercise the whole client stack (connection
+pools, JSON, SSE parsing) without network access or API keys:
+
+  HF        POST /embed                    feature extraction ({"inputs": [...]})
+  Pinecone  POST /query, GET /vectors/fetch, POST /vectors/upsert
+  Groq      GET /openai/v1/models, POST /openai/v1/chat/completions (incl. stream)
+
+Embeddings are hashed bag-of-words vectors, and the Pinecone stand-in
+serves the chunk store embedded the same way (with service tags), so
+retrieval returns real, query-dependent chunks. Latencies are drawn per
+request from a distribution:
+
+  0.05                  fixed
+  uniform:0.02,0.08     uniform between two bounds
+  lognormal:0.05,0.15   log-normal with the given median and p95
+
+Groq answers after a time-to-first-token sample (--ttft, or --fast-ttft for
+the small "-instant" models), then streams --tokens tokens at --token-rate
+tokens/sec.
+
+Point the app at them with:
+    HF_EMBEDDING_URL=http://127.0.0.1:<hf port>/embed
+    PINECONE_HOST=http://127.0.0.1:<pinecone port>  VECTOR_STORE=pinecone
+    GROQ_BASE_URL=http://127.0.0.1:<groq port>
+
+Usage:
+    python benchmarks/fakes.py [--port 8701] [--embed-latency lognormal:0.04,0.12] ...
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingestion.chunk_store import open_store  # noqa: E402
+from app.ingestion.taxonomy import tag_page  # noqa: E402
+from app.vectorstore.filters import MetadataPartitions  # noqa: E402
+
+EMBEDDING_DIM = 384
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class Latency:
+    """A latency distribution parsed from "0.05", "uniform:a,b" or "lognormal:median,p95"."""
+
+    def __init__(self, spec):
+        self.spec = str(spec)
+        kind, _, args = self.spec.partition(":")
+        if not args:
+            self._sample = lambda value=float(kind): value
+            return
+        values = [float(v) for v in args.split(",")]
+        if kind == "uniform":
+            self._sample = lambda: random.uniform(*values)
+        elif kind == "lognormal":
+            median, p95 = values
+            sigma = math.log(p95 / median) / 1.645
+            self._sample = lambda: random.lognormvariate(math.log(median), sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.spec}")
+
+    def sample(self):
+        return max(0.0, self._sample())
+
+    async def wait(self):
+        await asyncio.sleep(self.sample())
+
+
+def embed(text):
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for word in _WORD_RE.findall(text.lower()):
+        vector[zlib.crc32(word.encode()) % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# ---------------- HuggingFace ---------------- #
+
+def hf_app(latency):
+    app = FastAPI()
+
+    @app.post("/embed")
+    async def feature_extraction(request: Request):
+        body = await request.json()
+        inputs = body.get("inputs")
+        await latency.wait()
+        if isinstance(inputs, str):
+            return embed(inputs).tolist()
+        return [embed(text).tolist() for text in inputs]
+
+    return app
+
+
+# ---------------- Pinecone ---------------- #
+
+class FakeIndex:
+    def __init__(self, store):
+        self.ids, self.metadata, rows = [], [], []
+        for chunk in store.iter_chunks():
+            tags = tag_page(chunk["url"], chunk["title"], chunk["headings"], chunk["content"])
+            self.ids.append(chunk["chunk_id"])
+            self.metadata.append({
+                "text": chunk["content"],
+                "source": chunk["url"],
+                "title": chunk["title"],
+                "chunk_index": chunk["chunk_index"],
+                **tags,
+            })
+            rows.append(embed(chunk["content"]))
+        self.matrix = np.vstack(rows) if rows else np.zeros((0, EMBEDDING_DIM), np.float32)
+        self.rows = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.partitions = MetadataPartitions(self.metadata)
+
+    def query(self, vector, top_k, include_values, metadata_filter):
+        rows = self.partitions.rows(metadata_filter) if metadata_filter else np.arange(len(self.ids))
+        scores = self.matrix[rows] @ np.asarray(vector, dtype=np.float32)
+        order = np.argsort(-scores)[:top_k]
+        return [
+            {
+                "id": self.ids[rows[i]],
+                "score": float(scores[i]),
+                "metadata": self.metadata[rows[i]],
+                **({"values": self.matrix[rows[i]].tolist()} if include_values else {}),
+            }
+            for i in order
+        ]
+
+
+def pinecone_app(latency, index):
+    app = FastAPI()
+
+    @app.post("/query")
+    async def query(request: Request):
+        body = await request.json()
+        await latency.wait()
+        matches = index.query(
+            body["vector"], body.get("topK", 10), body.get("includeValues", False), body.get("filter")
+        )
+        if not body.get("includeMetadata", False):
+            for match in matches:
+                match.pop("metadata")
+        return {"matches": matches, "namespace": body.get("namespace", "")}
+
+    @app.get("/vectors/fetch")
+    async def fetch(request: Request):
+        await latency.wait()
+        vectors = {}
+        for chunk_id in request.query_params.getlist("ids"):
+            row = index.rows.get(chunk_id)
+            if row is not None:
+                vectors[chunk_id] = {"id": chunk_id, "values": index.matrix[row].tolist()}
+        return {"vectors": vectors, "namespace": ""}
+
+    @app.post("/vectors/upsert")
+    async def upsert(request: Request):
+        body = await request.json()
+        await latency.wait()
+        return {"upsertedCount": len(body.get("vectors", []))}
+
+    return app
+
+
+# ---------------- Groq ---------------- #
+
+def groq_app(ttft, token_rate, tokens, fast_ttft=None):
+    app = FastAPI()
+
+    def _usage(messages, completion_tokens):
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _answer_tokens():
+        return [f"tok{i} " for i in range(tokens)]
+
+    @app.get("/openai/v1/models")
+    async def models():
+        return {"object": "list", "data": [
+            {"id": "llama-3.3-70b-versatile", "object": "model"},
+            {"id": "llama-3.1-8b-instant", "object": "model"},
+        ]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        n_tokens = min(tokens, body.get("max_tokens") or tokens)
+        latency = fast_ttft if fast_ttft is not None and "instant" in model else ttft
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency.sample() + n_tokens / token_rate)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(_answer_tokens()[:n_tokens])},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(messages, n_tokens),
+            })
+
+        def _chunk(delta, finish_reason=None, **extra):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }) + "\n\n"
+
+        async def stream():
+            await asyncio.sleep(latency.sample())
+            yield _chunk({"role": "assistant", "content": ""})
+            for token in _answer_tokens()[:n_tokens]:
+                yield _chunk({"content": token})
+                await asyncio.sleep(1 / token_rate)
+            yield _chunk({}, "stop", x_groq={"usage": _usage(messages, n_tokens)})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+# ---------------- Runner ---------------- #
+
+def add_arguments(parser):
+    parser.add_argument("--port", type=int, default=8701,
+                        help="HF on this port, Pinecone on +1, Groq on +2")
+    parser.add_argument("--embed-latency", default="lognormal:0.04,0.12")
+    parser.add_argument("--query-latency", default="lognormal:0.03,0.09")
+    parser.add_argument("--ttft", default="lognormal:0.25,0.6")
+    parser.add_argument("--fast-ttft", default="lognormal:0.12,0.3", help="TTFT of the small model")
+    parser.add_argument("--token-rate", type=float, default=250.0, help="tokens/sec after the first")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per answer")
+
+
+def env_for(port):
+    """Environment pointing the app's clients at fakes started on `port`."""
+    return {
+        "EMBEDDING_BACKEND": "hf",
+        "HF_EMBEDDING_URL": f"http://127.0.0.1:{port}/embed",
+        "VECTOR_STORE": "pinecone",
+        "PINECONE_API_KEY": "fake",
+        "PINECONE_HOST": f"http://127.0.0.1:{port + 1}",
+        "GROQ_API_KEY": "fake",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{port + 2}",
+    }
+
+
+async def serve(args):
+    index = FakeIndex(open_store())
+    apps = [
+        hf_app(Latency(args.embed_latency)),
+        pinecone_app(Latency(args.query_latency), index),
+        groq_app(Latency(args.ttft), args.token_rate, args.tokens, Latency(args.fast_ttft)),
+    ]
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port + i,
+                                      log_level="warning", access_log=False))
+        for i, app in enumerate(apps)
+    ]
+    print(f"🧪 Fakes on ports {args.port}-{args.port + 2} ({len(index.ids)} chunks indexed)", flush=True)
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    asyncio.run(serve(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""
+Sequential vs pipelined ingestion with simulated stage latencies.
+
+Each stage sleeps for a fixed time per page (defaults roughly match what
+run_ingestion.py sees: Chromium render >> embed > upsert > chunking), so
+the comparison isolates the scheduling: the old loop pays the sum of the
+stages per page, the pipeline approaches the slowest stage divided by its
+worker count.
+
+Usage:
+    python benchmarks/ingestion_pipeline_benchmark.py [--pages 40] [--scrape 0.8] [--embed 0.3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingestion.pipeline import Pipeline, Stage  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--scrape", type=float, default=0.8)
+    parser.add_argument("--chunk", type=float, default=0.02)
+    parser.add_argument("--embed", type=float, default=0.3)
+    parser.add_argument("--index", type=float, default=0.15)
+    parser.add_argument("--scrape-workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=8)
+    args = parser.parse_args()
+
+    async def scrape(url):
+        await asyncio.sleep(args.scrape)
+        return url
+
+    def sleeper(seconds):
+        def stage(item):
+            time.sleep(seconds)
+            return item
+        return stage
+
+    urls = [f"https://example.com/page-{n}" for n in range(args.pages)]
+
+    per_page = args.scrape + args.chunk + args.embed + args.index
+    sequential = per_page * args.pages
+    print(f"{args.pages} pages; per-page stage sum {per_page:.2f}s\n")
+    print(f"sequential loop (computed): {sequential:.2f}s")
+
+    pipeline = Pipeline([
+        Stage("scrape", scrape, workers=args.scrape_workers, queue_size=args.queue_size),
+        Stage("chunk", sleeper(args.chunk), workers=2, queue_size=args.queue_size),
+        Stage("embed", sleeper(args.embed), workers=2, queue_size=args.queue_size),
+        Stage("index", sleeper(args.index), workers=2, queue_size=args.queue_size),
+    ])
+    asyncio.run(pipeline.run(urls))
+
+    print(f"pipelined:                  {pipeline.wall_seconds:.2f}s "
+          f"({sequential / pipeline.wall_seconds:.1f}x)\n")
+    print(pipeline.format_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Scraper throughput: sequential scrape_url() vs the async ScraperPool.
+
+Serves generated WordPress-like pages from a local HTTP server (with an
+artificial per-request delay standing in for a slow origin) so the numbers
+are reproducible and no real site is hit. Needs Playwright's Chromium
+(`playwright install chromium`).
+
+Usage:
+    python benchmarks/scraper_benchmark.py [--pages 20] [--delay 0.3] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingestion.async_scraper import ScraperPool  # noqa: E402
+from app.ingestion.scraper import scrape_url  # noqa: E402
+
+PAGE_TEMPLATE = """<!doctype html>
+<html><head><title>Service page {n}</title></head>
+<body>
+<header><nav>Home | Services | Contact</nav></header>
+<h1>Service page {n}</h1>
+<div class="entry-content">{body}</div>
+<div class="wp-block-group">{block}</div>
+<footer>Footer</footer>
+</body></html>
+"""
+
+
+def _write_site(root, pages):
+    sentence = "We build reliable software for growing businesses. "
+    for n in range(pages):
+        html = PAGE_TEMPLATE.format(
+            n=n,
+            body=sentence * 40,
+            block=f"Block {n}: " + sentence * 5,
+        )
+        with open(os.path.join(root, f"page-{n}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+class _SlowHandler(SimpleHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(root, delay):
+    handler = functools.partial(
+        type("Handler", (_SlowHandler,), {"delay": delay}), directory=root
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_sequential(urls):
+    started = time.perf_counter()
+    for url in urls:
+        scrape_url(url)
+    return time.perf_counter() - started
+
+
+async def run_pool(urls, concurrency):
+    started = time.perf_counter()
+    # Every page is on one host; disable the politeness interval so the
+    # comparison measures browser reuse + concurrency only.
+    async with ScraperPool(concurrency=concurrency, host_interval=0) as pool:
+        failures = 0
+        async for _, _, error in pool.scrape_many(urls):
+            failures += error is not None
+    if failures:
+        print(f"  ⚠️ {failures} page(s) failed")
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.3,
+                        help="artificial server latency per request (seconds)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        _write_site(root, args.pages)
+        server = _serve(root, args.delay)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/page-{n}.html" for n in range(args.pages)]
+
+        print(f"{args.pages} pages, {args.delay:.2f}s server delay\n")
+        print(f"{'mode':<28}{'seconds':>10}{'pages/s':>10}")
+
+        if not args.skip_sequential:
+            elapsed = run_sequential(urls)
+            print(f"{'sequential scrape_url':<28}{elapsed:>10.2f}{args.pages / elapsed:>10.2f}")
+
+        elapsed = asyncio.run(run_pool(urls, args.concurrency))
+        label = f"ScraperPool (c={args.concurrency})"
+        print(f"{label:<28}{elapsed:>10.2f}{args.pages / elapsed:>10.2f}")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
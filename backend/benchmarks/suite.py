@@ -0,0 +1,344 @@
+"""
+Offline benchmark suite, comparable across commits.
+
+  text  clean_text / chunk_text over every page of the chunk store:
+        per-page p50/p95 and throughput
+  api   starts the stand-ins from fakes.py and the API (uvicorn, one
+        worker) as subprocesses, then drives /chat and /chat/stream at each
+        --concurrency level: p50/p95/p99 latency, time to first token
+        (stream) and requests/sec
+
+No network or API keys needed. Caches are off unless --cache, so every
+request runs the whole pipeline. Each run is saved to
+benchmarks/results/<time>-<commit>.json; compare two runs with `compare`
+(lower is better except requests/sec and MB/s).
+
+Usage:
+    python benchmarks/suite.py run [--only text,api] [--requests 200] [--concurrency 1,8,32]
+    python benchmarks/suite.py compare results/<before>.json results/<after>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+API_LOG = os.path.join(tempfile.gettempdir(), "benchmark-api.log")
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, BACKEND_DIR)
+
+import fakes  # noqa: E402
+from app.ingestion.chunk_store import open_store  # noqa: E402
+from app.ingestion.cleaner import clean_text  # noqa: E402
+from app.ingestion.chunker import chunk_text  # noqa: E402
+
+QUESTIONS = [
+    "What services does i95Dev offer?",
+    "Does the Magento Dynamics GP connector sync inventory?",
+    "Tell me about Shopify SAP Business One Connect",
+    "What is BC integration?",
+    "How long does it take to implement your ecommerce platform?",
+    "Do you have success stories for BigCommerce?",
+    "What is the SessionReaper vulnerability?",
+    "How do I become an i95Dev partner?",
+    "What are the benefits of buy online pickup in store?",
+    "Does i95Dev integrate Adobe Commerce with NetSuite?",
+    "What is extended pricing in B2B ecommerce?",
+    "Is there an ERP integration ROI calculator?",
+]
+
+# Metrics where a higher value is an improvement
+HIGHER_IS_BETTER = ("rps", "mb_per_s")
+
+
+def _percentiles(values, scale=1000.0):
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * scale
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+
+
+# ---------------- Text processing ---------------- #
+
+def bench_text(rounds):
+    pages = ["\n".join(c["content"] for c in page["chunks"]) for page in open_store().iter_pages()]
+    total_bytes = sum(len(text.encode("utf-8")) for text in pages)
+    results = {"pages": len(pages), "bytes": total_bytes}
+
+    for name, fn in (("clean_text", clean_text), ("chunk_text", chunk_text)):
+        timings = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in pages:
+                t = time.perf_counter()
+                fn(text)
+                timings.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            **{f"{k}_us": v for k, v in _percentiles(timings, 1e6).items()},
+            "mb_per_s": round(total_bytes * rounds / elapsed / 1e6, 2),
+        }
+        print(f"  {name:<11} p50={results[name]['p50_us']:8.1f}µs  "
+              f"p95={results[name]['p95_us']:8.1f}µs  {results[name]['mb_per_s']:7.2f} MB/s")
+    return results
+
+
+# ---------------- API ---------------- #
+
+def _wait_for(url, timeout, expect=200):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code == expect:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def _start_services(args, bm25_dir):
+    fake_cmd = [
+        sys.executable, os.path.join(BENCH_DIR, "fakes.py"),
+        "--port", str(args.port),
+        "--embed-latency", args.embed_latency,
+        "--query-latency", args.query_latency,
+        "--ttft", args.ttft,
+        "--fast-ttft", args.fast_ttft,
+        "--token-rate", str(args.token_rate),
+        "--tokens", str(args.tokens),
+    ]
+    env = {
+        **os.environ,
+        **fakes.env_for(args.port),
+        "BM25_INDEX_DIR": bm25_dir,
+        "CONVERSATION_STORE": "memory",
+        "TRACE_RETRIEVAL": "0",
+        "WARMUP_RETRY_SECONDS": "1",
+    }
+    if not args.cache:
+        env.update({"QUERY_CACHE_SIZE": "0", "ANSWER_CACHE_SIZE": "0", "CACHE_REDIS_URL": ""})
+    if not args.admission:
+        # The fake Groq has no rate limits; the production TPM budget would
+        # turn high-concurrency runs into 429s
+        env["ADMISSION_ENABLED"] = "0"
+
+    procs = [subprocess.Popen(fake_cmd, cwd=BACKEND_DIR)]
+    try:
+        _wait_for(f"http://127.0.0.1:{args.port + 2}/openai/v1/models", 60)
+        # The app logs every request; keep it out of the report
+        with open(API_LOG, "w") as log:
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.api:app", "--host", "127.0.0.1",
+                 "--port", str(args.api_port), "--log-level", "warning", "--no-access-log"],
+                cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            ))
+        _wait_for(f"http://127.0.0.1:{args.api_port}/ready", 60)
+    except Exception:
+        _stop(procs)
+        raise
+    return procs
+
+
+def _stop(procs):
+    for proc in reversed(procs):
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def _request(client, endpoint, question):
+    """(latency, ttft or None) in seconds; raises on a failed request."""
+    payload = {"messages": [{"role": "user", "content": question}]}
+    start = time.perf_counter()
+    if endpoint == "/chat":
+        response = await client.post(endpoint, json=payload)
+        response.raise_for_status()
+        return time.perf_counter() - start, None
+
+    ttft = None
+    async with client.stream("POST", endpoint, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: delta") and ttft is None:
+                ttft = time.perf_counter() - start
+            elif line.startswith("event: error"):
+                raise RuntimeError("stream ended with an error event")
+    return time.perf_counter() - start, ttft
+
+
+async def _drive(base_url, endpoint, requests, concurrency, warmup):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for i in range(warmup):
+            await _request(client, endpoint, QUESTIONS[i % len(QUESTIONS)])
+
+        latencies, ttfts, errors = [], [], 0
+        pending = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for i in pending:
+                try:
+                    latency, ttft = await _request(client, endpoint, QUESTIONS[i % len(QUESTIONS)])
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    result = {
+        **{f"{k}_ms": v for k, v in _percentiles(latencies).items()},
+        "rps": round(len(latencies) / wall, 2),
+        "errors": errors,
+    }
+    if ttfts:
+        result.update({f"ttft_{k}_ms": v for k, v in _percentiles(ttfts).items()})
+    return result
+
+
+def bench_api(args):
+    from app.retrieval.bm25 import build_from_store
+
+    results = {}
+    with tempfile.TemporaryDirectory() as bm25_dir:
+        build_from_store(open_store(), bm25_dir)
+        procs = _start_services(args, bm25_dir)
+        try:
+            base_url = f"http://127.0.0.1:{args.api_port}"
+            for endpoint in ("/chat", "/chat/stream"):
+                results[endpoint] = {}
+                for level in args.concurrency:
+                    r = asyncio.run(_drive(base_url, endpoint, args.requests, level, args.warmup))
+                    results[endpoint][f"c{level}"] = r
+                    ttft = f"  ttft p50={r['ttft_p50_ms']:7.1f}ms" if "ttft_p50_ms" in r else ""
+                    print(f"  {endpoint:<13} c={level:<4} p50={r.get('p50_ms', 0):7.1f}ms  "
+                          f"p95={r.get('p95_ms', 0):7.1f}ms  p99={r.get('p99_ms', 0):7.1f}ms  "
+                          f"rps={r['rps']:7.1f}{ttft}  errors={r['errors']}")
+        finally:
+            _stop(procs)
+    return results
+
+
+# ---------------- Results ---------------- #
+
+def _git(*cmd):
+    try:
+        return subprocess.run(["git", *cmd], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=30).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"📊 {before['meta']['commit'] or '?'} → {after['meta']['commit'] or '?'}\n")
+
+    old, new = _flatten(before["results"]), _flatten(after["results"])
+    for key in sorted(old.keys() & new.keys()):
+        if old[key] == new[key] == 0:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100 if old[key] else float("inf")
+        better = change > 0 if key.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change < 0
+        marker = "✅" if better and abs(change) >= 5 else "❌" if abs(change) >= 5 else "  "
+        print(f"{marker} {key:<40} {old[key]:>12} → {new[key]:>12}  ({change:+.1f}%)")
+
+
+def run(args):
+    results = {}
+    if "text" in args.only:
+        print(f"📝 Text processing ({args.text_rounds} rounds)")
+        results["text"] = bench_text(args.text_rounds)
+    if "api" in args.only:
+        print(f"\n🚀 API ({args.requests} requests per level, caches {'on' if args.cache else 'off'}, "
+              f"server log: {API_LOG})")
+        results["api"] = bench_api(args)
+
+    commit = _git("rev-parse", "--short", "HEAD")
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": bool(_git("status", "--porcelain", "--", ".")),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "func"},
+        },
+        "results": results,
+    }
+    if args.no_save:
+        return
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved to: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("--only", default="text,api", type=lambda s: s.split(","))
+    run_parser.add_argument("--text-rounds", type=int, default=5)
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    run_parser.add_argument("--concurrency", default=[1, 8, 32],
+                            type=lambda s: [int(x) for x in s.split(",")])
+    run_parser.add_argument("--warmup", type=int, default=5)
+    run_parser.add_argument("--cache", action="store_true", help="leave the query / answer caches on")
+    run_parser.add_argument("--admission", action="store_true",
+                            help="keep admission control (Groq rate budgets) on")
+    run_parser.add_argument("--api-port", type=int, default=8710)
+    fakes.add_arguments(run_parser)
+    run_parser.add_argument("--output", help="results file (default: benchmarks/results/...)")
+    run_parser.add_argument("--no-save", action="store_true")
+
+    compare_parser = sub.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.before, args.after)
+        return
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to import from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.ingestion.chunk_store import open_store
+from app.retrieval.bm25 import build_from_store, BM25_INDEX_DIR
+
+# Rebuild the BM25 index from the chunk store without touching the vector
+# store (run_ingestion.py and upload_chunks_to_pinecone.py also do this).
+
+print("📂 Opening chunk store...")
+store = open_store()
+
+start = time.perf_counter()
+count = build_from_store(store)
+elapsed = time.perf_counter() - start
+
+print(f"✅ Indexed {count} chunks in {elapsed:.2f}s")
+print(f"💾 Saved to: {BM25_INDEX_DIR}")
@@ -1,15 +1,21 @@
-import uuid
+import argparse
+import asyncio
 import os
 import sys
-import json
-from datetime import datetime
 
 # Add the parent directory to sys.path to import from app/
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.ingestion.scraper import scrape_url
+from app.ingestion.async_scraper import ScraperPool
 from app.ingestion.cleaner import clean_text
 from app.ingestion.chunker import chunk_text
+from app.ingestion.manifest import chunk_ids_for
+from app.ingestion.chunk_store import open_store
+
+parser = argparse.ArgumentParser(description="Re-scrape urls.txt into the chunk store")
+parser.add_argument("--resume", action="store_true",
+                    help="continue an interrupted run, skipping pages it already wrote")
+args = parser.parse_args()
 
 # ---------------- Load URLs ---------------- #
 
@@ -37,63 +43,69 @@ print(f"✅ Found {len(URLS)} URL(s) to process\n")
 
 # ---------------- Regenerate Chunks ---------------- #
 
-all_chunks_data = []
+# Each page is appended to the chunk store as soon as it is chunked, so an
+# interrupted run can be continued with --resume
+store = open_store()
+run_id = store.start_run(resume=args.resume)
+done_urls = store.urls_done(run_id) if args.resume else set()
+if done_urls:
+    print(f"↩️ Resuming: {len(done_urls)} page(s) already done\n")
 
-for url in URLS:
-    print(f"🔗 Processing: {url}")
 
-    try:
-        scraped_data = scrape_url(url)
-        raw_text = scraped_data['text']
+def process_page(url, scraped_data):
+    raw_text = scraped_data['text']
 
-        if not raw_text or len(raw_text.strip()) < 500:
-            print("⚠️ Skipping page (not enough content)\n")
-            continue
+    if not raw_text or len(raw_text.strip()) < 500:
+        print(f"⚠️ Skipping {url} (not enough content)\n")
+        store.delete_page(url, run=run_id)
+        return
 
-        clean_text_data = clean_text(raw_text)
-        chunks = chunk_text(clean_text_data)
+    clean_text_data = clean_text(raw_text)
+    chunks = chunk_text(clean_text_data)
 
-        if not chunks:
-            print("⚠️ No chunks generated, skipping\n")
-            continue
+    if not chunks:
+        print(f"⚠️ No chunks generated for {url}, skipping\n")
+        store.delete_page(url, run=run_id)
+        return
 
-        for idx, text in enumerate(chunks):
-            chunk_id = str(uuid.uuid4())
-            
-            # Store chunk data for JSON export
-            all_chunks_data.append({
-                "chunk_id": chunk_id,
-                "url": url,
-                "title": scraped_data['title'],
-                "headings": [{"level": "h1", "text": scraped_data['title']}],  # Simplified headings
-                "content": text,
-                "tables": scraped_data['tables'],
-                "chunk_index": idx
-            })
+    # Deterministic IDs (URL + content hash): unchanged chunks keep their
+    # ID across rebuilds, so the upload script can skip them
+    chunk_ids = chunk_ids_for(url, chunks)
 
-        print(f"✅ Generated {len(chunks)} chunks\n")
+    store.write_page(
+        url,
+        scraped_data['title'],
+        [{"level": "h1", "text": scraped_data['title']}],  # Simplified headings
+        scraped_data['tables'],
+        list(zip(chunk_ids, chunks)),
+        run=run_id,
+        faqs=scraped_data.get("faqs"),
+    )
 
-    except Exception as e:
-        print(f"❌ Error processing {url}: {str(e)}\n")
+    print(f"✅ Generated {len(chunks)} chunks from {url}\n")
 
-# ---------------- Save to JSON ---------------- #
 
-output_file = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)),
-    "chunks_data.json"
-)
+async def regenerate(urls):
+    async with ScraperPool() as pool:
+        async for url, scraped_data, error in pool.scrape_many(urls):
+            print(f"🔗 Processing: {url}")
+            try:
+                if error is not None:
+                    raise error
+                process_page(url, scraped_data)
+            except Exception as e:
+                print(f"❌ Error processing {url}: {str(e)}\n")
+
+
+asyncio.run(regenerate([url for url in URLS if url not in done_urls]))
 
-output_data = {
-    "metadata": {
-        "total_chunks": len(all_chunks_data),
-        "total_urls": len(URLS),
-        "created_at": datetime.now().isoformat(),
-        "urls": URLS
-    },
-    "chunks": all_chunks_data
-}
+for url in store.urls():
+    if url not in URLS:
+        store.delete_page(url, run=run_id)
 
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
+store.finish_run(run_id)
+# Drop superseded records; keep urls.txt order for readable diffs
+store.compact(order=URLS)
 
-print(f"\n✅ Successfully saved {len(all_chunks_data)} chunks to chunks_data.json")
+total_chunks = sum(len(page["chunks"]) for page in store.iter_pages())
+print(f"\n✅ Successfully saved {total_chunks} chunks to {os.path.basename(store.path)}")
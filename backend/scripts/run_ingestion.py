@@ -1,8 +1,9 @@
-import uuid
+import argparse
+import asyncio
 import os
 import sys
-import json
-from datetime import datetime
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,18 +12,33 @@ load_dotenv()
 # Add the parent directory to sys.path to import from app/
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.ingestion.scraper import scrape_url
+from app.ingestion.async_scraper import ScraperPool
+from app.ingestion.ocr import get_ocr_service
 from app.ingestion.cleaner import clean_text
 from app.ingestion.chunker import chunk_text
+from app.ingestion.manifest import Manifest, chunk_ids_for, content_hash
+from app.ingestion.chunk_store import open_store
+from app.ingestion.taxonomy import tag_page
+from app.ingestion.pipeline import Pipeline, Stage
+from app.retrieval.bm25 import build_from_store
 from app.embeddings.embedder import embed_texts
-from app.vectorstore.pinecone_client import upsert_embeddings
+from app.vectorstore.vector_store import upsert_embeddings, delete_embeddings
+
+# Incremental by default: pages whose ETag/Last-Modified or extracted text
+# are unchanged since the last run are skipped, and only added chunks are
+# embedded/upserted while removed ones are deleted (see manifest.py).
+parser = argparse.ArgumentParser(description="Scrape, chunk, embed and index urls.txt")
+parser.add_argument("--full", action="store_true",
+                    help="ignore the manifest and re-embed/upsert every chunk")
+parser.add_argument("--resume", action="store_true",
+                    help="continue an interrupted run, skipping pages it already wrote")
+args = parser.parse_args()
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 # ---------------- Load URLs ---------------- #
 
-urls_file = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)),
-    "urls.txt"
-)
+urls_file = os.path.join(BASE_DIR, "urls.txt")
 
 if not os.path.exists(urls_file):
     print("❌ urls.txt not found")
@@ -41,88 +57,208 @@ if not URLS:
 
 print(f"✅ Found {len(URLS)} URL(s) to process\n")
 
+# Pages are appended to the chunk store as they finish (chunk_store.py),
+# so an interrupted run keeps its progress and --resume picks it up
+store = open_store()
+manifest = Manifest.load(store=store)
+run_id = store.start_run(resume=args.resume)
+done_urls = store.urls_done(run_id) if args.resume else set()
+if done_urls:
+    print(f"↩️ Resuming: {len(done_urls)} page(s) already done\n")
+
 # ---------------- Ingestion ---------------- #
 
-TOTAL_VECTORS = 0
-all_chunks_data = []
+# Staged pipeline (pipeline.py): scrape -> chunk -> embed -> index run
+# concurrently with bounded queues between them, so Chromium keeps
+# rendering while earlier pages are embedded and upserted.
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", "2"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INDEX_WORKERS = int(os.getenv("INGEST_INDEX_WORKERS", "2"))
+
+STATS = {"upserted": 0, "deleted": 0, "unchanged_pages": 0, "changed_pages": 0}
+BATCH_SIZE = 100
+# Guards STATS, the manifest and the chunk store across stage workers
+commit_lock = threading.Lock()
 
-for url in URLS:
-    print(f"🔗 Processing: {url}")
 
-    try:
-        scraped_data = scrape_url(url)
-        raw_text = scraped_data['text']
+def keep_previous(url):
+    """Page unchanged: its stored chunks stay as they are."""
+    with commit_lock:
+        STATS["unchanged_pages"] += 1
+    print(f"⏭️ Unchanged: {url}\n")
 
-        if not raw_text or len(raw_text.strip()) < 500:
-            print("⚠️ Skipping page (not enough content)\n")
-            continue
 
-        clean_text_data = clean_text(raw_text)
-        chunks = chunk_text(clean_text_data)
+def delete_chunks(chunk_ids):
+    for i in range(0, len(chunk_ids), BATCH_SIZE):
+        delete_embeddings(chunk_ids[i:i+BATCH_SIZE])
+    with commit_lock:
+        STATS["deleted"] += len(chunk_ids)
 
+
+def chunk_stage(item):
+    """Clean and chunk one page and diff it against the manifest."""
+    url, scraped_data = item
+    raw_text = scraped_data['text']
+    page_hash = content_hash(raw_text or "")
+
+    if not args.full and page_hash == manifest.get(url).get("page_hash"):
+        keep_previous(url)
+        return None
+
+    chunks = []
+    if not raw_text or len(raw_text.strip()) < 500:
+        print(f"⚠️ Skipping {url} (not enough content)\n")
+    else:
+        chunks = chunk_text(clean_text(raw_text))
         if not chunks:
-            print("⚠️ No chunks generated, skipping\n")
-            continue
+            print(f"⚠️ No chunks generated for {url}, skipping\n")
+
+    chunk_ids = chunk_ids_for(url, chunks)
+    added, removed = manifest.diff(url, chunk_ids)
+    if args.full:
+        added = chunk_ids
 
-        embeddings = embed_texts(chunks)
+    added_set = set(added)
+    return {
+        "url": url,
+        "scraped": scraped_data,
+        "page_hash": page_hash,
+        "chunk_ids": chunk_ids,
+        "chunks": chunks,
+        "new_chunks": [
+            (cid, idx, text) for idx, (cid, text) in enumerate(zip(chunk_ids, chunks))
+            if cid in added_set
+        ],
+        "tags": tag_page(url, scraped_data['title'], scraped_data['headings'], raw_text or ""),
+        "removed": removed,
+        "vectors": [],
+    }
 
-        vectors = []
-        for idx, (text, emb) in enumerate(zip(chunks, embeddings)):
-            chunk_id = str(uuid.uuid4())
-            vectors.append((
+
+def embed_stage(work):
+    """Embed only the chunks the index does not have yet."""
+    if work["new_chunks"]:
+        embeddings = embed_texts([text for _, _, text in work["new_chunks"]])
+        for (chunk_id, idx, text), emb in zip(work["new_chunks"], embeddings):
+            work["vectors"].append((
                 chunk_id,
-                emb,
+                emb.tolist(),
                 {
                     "text": text,
-                    "source": url
+                    "source": work["url"],
+                    "title": work["scraped"]['title'],
+                    "chunk_index": idx,
+                    **work["tags"]
                 }
             ))
-            
-            # Store chunk data for JSON export (without embeddings)
-            all_chunks_data.append({
-                "chunk_id": chunk_id,
-                "url": url,
-                "title": scraped_data['title'],
-                "headings": scraped_data['headings'],
-                "content": text,
-                "tables": scraped_data['tables'],
-                "chunk_index": idx
-            })
-
-        # Batch upsert (safe for Pinecone)
-        BATCH_SIZE = 100
-        for i in range(0, len(vectors), BATCH_SIZE):
-            batch = vectors[i:i+BATCH_SIZE]
-            upsert_embeddings(batch)
-        
-        TOTAL_VECTORS += len(vectors)
-        print(f"✅ Stored {len(vectors)} chunks\n")
-
-    except Exception as e:
-        print(f"❌ Failed for {url}")
-        print(f"   Error: {e}\n")
-        continue
-
-# ---------------- Save to JSON ---------------- #
-
-chunks_output_file = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)),
-    "chunks_data.json"
-)
-
-output_data = {
-    "metadata": {
-        "total_chunks": TOTAL_VECTORS,
-        "total_urls": len(URLS),
-        "created_at": datetime.now().isoformat(),
-        "urls": URLS
-    },
-    "chunks": all_chunks_data
-}
-
-with open(chunks_output_file, "w", encoding="utf-8") as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
+    return work
+
+
+def index_stage(work):
+    """Upsert/delete vectors, then record the page in the store and manifest."""
+    url, scraped_data, vectors = work["url"], work["scraped"], work["vectors"]
+
+    # Batch upsert (safe for Pinecone)
+    for i in range(0, len(vectors), BATCH_SIZE):
+        upsert_embeddings(vectors[i:i+BATCH_SIZE])
+
+    if work["removed"]:
+        delete_chunks(work["removed"])
+
+    with commit_lock:
+        # Store chunk data (without embeddings)
+        store.write_page(
+            url,
+            scraped_data['title'],
+            scraped_data['headings'],
+            scraped_data['tables'],
+            list(zip(work["chunk_ids"], work["chunks"])),
+            run=run_id,
+            faqs=scraped_data.get("faqs"),
+        )
+        manifest.update(
+            url,
+            work["chunk_ids"],
+            page_hash=work["page_hash"],
+            etag=scraped_data.get("etag"),
+            last_modified=scraped_data.get("last_modified"),
+        )
+        manifest.save()
+        STATS["upserted"] += len(vectors)
+        STATS["changed_pages"] += 1
+
+    print(f"✅ {url}: {len(vectors)} upserted, {len(work['removed'])} deleted, "
+          f"{len(work['chunks']) - len(vectors)} unchanged\n")
+    return None
+
+
+def report_failure(stage, item, error):
+    # Leave the page's manifest entry alone so it is retried next run
+    if isinstance(item, str):
+        url = item
+    elif isinstance(item, tuple):
+        url = item[0]
+    else:
+        url = item["url"]
+    print(f"❌ Failed for {url} ({stage.name})")
+    print(f"   Error: {error}\n")
+
+
+async def ingest(urls):
+    validators = {} if args.full else manifest.validators()
+
+    async with ScraperPool() as pool:
+        async def scrape_stage(url):
+            print(f"🔗 Processing: {url}")
+            scraped_data = await pool.scrape(url, validators.get(url))
+            if scraped_data.get("not_modified"):
+                keep_previous(url)
+                return None
+            return url, scraped_data
+
+        pipeline = Pipeline([
+            Stage("scrape", scrape_stage, workers=pool.concurrency, queue_size=QUEUE_SIZE),
+            Stage("chunk", chunk_stage, workers=CHUNK_WORKERS, queue_size=QUEUE_SIZE),
+            Stage("embed", embed_stage, workers=EMBED_WORKERS, queue_size=QUEUE_SIZE),
+            Stage("index", index_stage, workers=INDEX_WORKERS, queue_size=QUEUE_SIZE),
+        ], on_error=report_failure)
+        await pipeline.run(urls)
+
+    return pipeline
+
+
+started = time.perf_counter()
+pipeline = asyncio.run(ingest([url for url in URLS if url not in done_urls]))
+
+# URLs dropped from urls.txt: remove their vectors
+for url in [u for u in manifest.pages if u not in URLS]:
+    stale = manifest.remove(url)
+    delete_chunks(stale)
+    store.delete_page(url, run=run_id)
+    print(f"🗑️ Removed {len(stale)} chunks for dropped URL {url}")
+
+elapsed = time.perf_counter() - started
+manifest.save()
+
+# ---------------- Finish the chunk store ---------------- #
+
+store.finish_run(run_id)
+# Drop superseded records; keep urls.txt order for readable diffs
+store.compact(order=URLS)
+total_chunks = sum(len(page["chunks"]) for page in store.iter_pages())
+
+# Lexical index for hybrid retrieval, rebuilt from the live chunks
+build_from_store(store)
 
 print("🎉 Ingestion completed successfully")
-print(f"📦 Total vectors stored: {TOTAL_VECTORS}")
-print(f"💾 Chunks saved to: chunks_data.json")
+print(f"📦 Total chunks indexed: {total_chunks}")
+print(f"   Pages changed: {STATS['changed_pages']}, unchanged: {STATS['unchanged_pages']}")
+print(f"   Vectors upserted: {STATS['upserted']}, deleted: {STATS['deleted']}")
+print(f"💾 Chunks saved to: {os.path.basename(store.path)}")
+print(f"⏱️ {len(URLS)} URL(s) in {elapsed:.1f}s")
+
+print(f"\n{pipeline.format_stats()}\n")
+
+ocr_stats = get_ocr_service().stats
+print(f"🖼️ OCR: {ocr_stats['ocr']} run, {ocr_stats['cache_hits']} cached, {ocr_stats['skipped']} skipped")
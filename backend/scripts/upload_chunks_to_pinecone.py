@@ -1,80 +1,152 @@
-import json
+import argparse
 import os
 import sys
+import time
 
 # Add the parent directory to sys.path to import from app/
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.embeddings.embedder import embed_texts
-from app.vectorstore.pinecone_client import upsert_embeddings, check_existing_ids
-
-# Load chunks from JSON file
-chunks_file = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)),
-    "chunks_data.json"
+from app.embeddings.embedder import embed_texts, EMBEDDING_BACKEND
+from app.ingestion.chunk_store import open_store, page_chunks
+from app.ingestion.manifest import Manifest
+from app.ingestion.taxonomy import tag_page
+from app.retrieval.bm25 import build_from_store
+from app.vectorstore.vector_store import (
+    upsert_embeddings, delete_embeddings, check_existing_ids, fetch_embeddings, VECTOR_STORE
 )
 
-print("📂 Loading chunks from chunks_data.json...")
-with open(chunks_file, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-chunks_data = data["chunks"]
-print(f"✅ Loaded {len(chunks_data)} chunks\n")
-
-# Get existing IDs from Pinecone
-print("🔍 Checking for existing chunks in Pinecone...")
-all_chunk_ids = [chunk["chunk_id"] for chunk in chunks_data]
-existing_ids = check_existing_ids(all_chunk_ids)
-print(f"✅ Found {len(existing_ids)} existing chunks in Pinecone\n")
-
-# Filter out chunks that already exist
-chunks_to_upload = [
-    chunk for chunk in chunks_data 
-    if chunk["chunk_id"] not in existing_ids
-]
-
-if len(chunks_to_upload) == 0:
-    print("✨ All chunks are already uploaded to Pinecone!")
-    print(f"   Total chunks in database: {len(existing_ids)}")
-    sys.exit(0)
-
-print(f"📊 Upload Summary:")
-print(f"   Total chunks in file: {len(chunks_data)}")
-print(f"   Already in Pinecone: {len(existing_ids)}")
-print(f"   New chunks to upload: {len(chunks_to_upload)}\n")
-
-# Extract text content for embedding
-texts = [chunk["content"] for chunk in chunks_to_upload]
-
-print("🔄 Generating embeddings...")
-embeddings = embed_texts(texts)
-print(f"✅ Generated {len(embeddings)} embeddings\n")
-
-# Prepare vectors for Pinecone
-vectors = []
-for chunk, embedding in zip(chunks_to_upload, embeddings):
-    vectors.append((
-        chunk["chunk_id"],
-        embedding,
-        {
-            "text": chunk["content"],
-            "source": chunk["url"],
-            "title": chunk["title"],
-            "chunk_index": chunk["chunk_index"]
-        }
-    ))
-
-print(f"📤 Uploading {len(vectors)} vectors to Pinecone...")
-
-# Batch upsert (Pinecone recommends batches of 100)
+parser = argparse.ArgumentParser(description="Sync the chunk store to the vector store")
+parser.add_argument("--retag", action="store_true",
+                    help="rewrite the service/page-type metadata of already indexed chunks "
+                         "(stored vectors are reused, nothing is re-embedded)")
+args = parser.parse_args()
+
+STORE_NAME = "Pinecone" if VECTOR_STORE == "pinecone" else f"{VECTOR_STORE} vector store"
+
+# Pinecone recommends batches of 100
 BATCH_SIZE = 100
-for i in range(0, len(vectors), BATCH_SIZE):
-    batch = vectors[i:i+BATCH_SIZE]
-    upsert_embeddings(batch)
-    print(f"  ✓ Uploaded batch {i//BATCH_SIZE + 1} ({len(batch)} vectors)")
 
-print(f"\n✅ Successfully uploaded {len(vectors)} new chunks to Pinecone!")
+# Pages are read lazily from the chunk store (one at a time) and
+# embedded/upserted in batches, so memory stays flat however large the
+# corpus gets.
+print("📂 Opening chunk store...")
+store = open_store()
+print(f"✅ {len(store)} pages in {os.path.basename(store.path)}\n")
+
+manifest = Manifest.load()
+stats = {"total": 0, "existing": 0, "uploaded": 0, "retagged": 0, "stale": 0}
+embed_seconds = 0.0
+
+
+def delete_stale(chunk_ids):
+    for i in range(0, len(chunk_ids), BATCH_SIZE):
+        delete_embeddings(chunk_ids[i:i+BATCH_SIZE])
+    stats["stale"] += len(chunk_ids)
+
+
+def chunk_metadata(chunk):
+    return {
+        "text": chunk["content"],
+        "source": chunk["url"],
+        "title": chunk["title"],
+        "chunk_index": chunk["chunk_index"],
+        **chunk["tags"],
+    }
+
+
+def retag_existing(chunks):
+    """Re-upsert indexed chunks with current tags, reusing their stored vectors."""
+    stored = fetch_embeddings([chunk["chunk_id"] for chunk in chunks])
+    vectors = [
+        (chunk["chunk_id"], stored[chunk["chunk_id"]], chunk_metadata(chunk))
+        for chunk in chunks
+        if chunk["chunk_id"] in stored
+    ]
+    if vectors:
+        upsert_embeddings(vectors)
+        stats["retagged"] += len(vectors)
+
+
+def upload_batch(batch):
+    """Embed and upsert the chunks in `batch` that the store lacks."""
+    global embed_seconds
+
+    existing_ids = check_existing_ids([chunk["chunk_id"] for chunk in batch])
+    stats["existing"] += len(existing_ids)
+    if args.retag and existing_ids:
+        retag_existing([c for c in batch if c["chunk_id"] in existing_ids])
+    chunks_to_upload = [c for c in batch if c["chunk_id"] not in existing_ids]
+    if not chunks_to_upload:
+        return
+
+    start = time.perf_counter()
+    embeddings = embed_texts([chunk["content"] for chunk in chunks_to_upload])
+    embed_seconds += time.perf_counter() - start
+
+    vectors = []
+    for chunk, embedding in zip(chunks_to_upload, embeddings):
+        vectors.append((chunk["chunk_id"], embedding.tolist(), chunk_metadata(chunk)))
+
+    upsert_embeddings(vectors)
+    stats["uploaded"] += len(vectors)
+    print(f"  ✓ Uploaded {len(vectors)} vectors ({stats['uploaded']} so far)")
+
+
+print(f"🔄 Syncing chunks to {STORE_NAME} ({EMBEDDING_BACKEND} embeddings)...")
+seen_urls = set()
+batch = []
+for page in store.iter_pages():
+    url = page["url"]
+    seen_urls.add(url)
+
+    # Chunks indexed earlier for this page but no longer in the store
+    # (chunk IDs are content-derived, so edited chunks show up here)
+    page_ids = [c["chunk_id"] for c in page["chunks"]]
+    _, removed = manifest.diff(url, page_ids)
+    if removed:
+        delete_stale(removed)
+    entry = manifest.get(url)
+    if removed or set(page_ids) != set(entry.get("chunk_ids", [])):
+        # Keep the scraper's validators and page hash for conditional re-runs
+        manifest.update(
+            url,
+            page_ids,
+            page_hash=entry.get("page_hash"),
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified"),
+        )
+
+    # Service / page-type tags are per page (taxonomy.py)
+    tags = tag_page(url, page["title"], page["headings"],
+                    "\n".join(c["content"] for c in page["chunks"]))
+    for chunk in page_chunks(page):
+        chunk["tags"] = tags
+        stats["total"] += 1
+        batch.append(chunk)
+        if len(batch) == BATCH_SIZE:
+            upload_batch(batch)
+            batch = []
+
+if batch:
+    upload_batch(batch)
+
+# Pages that were dropped from the store entirely
+for url in [u for u in manifest.pages if u not in seen_urls]:
+    delete_stale(manifest.remove(url))
+
+manifest.save()
+
+# Lexical index for hybrid retrieval, kept in step with the vectors
+bm25_docs = build_from_store(store)
+
+print(f"\n✅ Synced {stats['total']} chunks with {STORE_NAME}!")
 print(f"   Index: {os.getenv('PINECONE_INDEX_NAME')}")
-print(f"   Total chunks in Pinecone: {len(existing_ids) + len(vectors)}")
-print(f"   Previously existing: {len(existing_ids)}")
-print(f"   Newly added: {len(vectors)}")
+print(f"   Already present: {stats['existing']}")
+print(f"   Newly added: {stats['uploaded']}")
+if args.retag:
+    print(f"   Retagged: {stats['retagged']}")
+print(f"   Stale chunks deleted: {stats['stale']}")
+print(f"   BM25 index: {bm25_docs} chunks")
+if stats["uploaded"]:
+    print(f"   Embedding: {embed_seconds:.1f}s "
+          f"({stats['uploaded'] / max(embed_seconds, 1e-9):.1f} texts/sec)")
@@ -2,11 +2,51 @@ import { NextRequest } from "next/server";
 
 const BACKEND_URL = process.env.BACKEND_URL;
 
+type BackendEvent = {
+  event: string;
+  data: { id?: string; delta?: string; message?: string };
+};
+
+// Parse the backend's SSE stream (`event:` + `data:` lines, blank-line
+// separated). Comment lines (`: ping` heartbeats) are skipped.
+async function* readBackendEvents(
+  body: ReadableStream<Uint8Array>,
+): AsyncGenerator<BackendEvent> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  try {
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+
+        let event = "message";
+        let data = "";
+        for (const line of raw.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        }
+        if (data) yield { event, data: JSON.parse(data) };
+      }
+    }
+  } finally {
+    reader.releaseLock();
+  }
+}
+
 export async function POST(req: NextRequest) {
   if (!BACKEND_URL) {
     throw new Error("BACKEND_URL environment variable is not set.");
   }
-  const { messages } = await req.json();
+  const { id, messages, trigger } = await req.json();
 
   const simpleMessages = messages.map((msg: any) => ({
     role: msg.role,
@@ -20,89 +60,135 @@ export async function POST(req: NextRequest) {
   const MAX_HISTORY = 12;
   const trimmedMessages = simpleMessages.slice(-MAX_HISTORY);
 
-  const backendResponse = await fetch(`${BACKEND_URL}/chat`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ messages: trimmedMessages }),
-  });
+  // The backend keeps the conversation per chat id, so normally only the
+  // new message is sent. A regenerated message rewrites history, and a 409
+  // means the backend's copy is out of sync (restart, other worker, edited
+  // message): both resend the trimmed history instead.
+  const historyLength = simpleMessages.length - 1;
+  const fullTurn = {
+    session_id: id,
+    messages: trimmedMessages,
+    history_length: historyLength,
+  };
+  const newTurn = {
+    session_id: id,
+    message: simpleMessages[historyLength]?.content ?? "",
+    history_length: historyLength,
+  };
+
+  // Aborting the browser request aborts this fetch, which the backend sees
+  // as a disconnect and cancels the upstream generation.
+  const postTurn = (payload: object) =>
+    fetch(`${BACKEND_URL}/chat/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify(payload),
+      signal: req.signal,
+    });
+
+  let backendResponse = await postTurn(
+    !id || trigger === "regenerate-message" ? fullTurn : newTurn,
+  );
+  if (backendResponse.status === 409) {
+    backendResponse = await postTurn(fullTurn);
+  }
 
-  const data = await backendResponse.json();
-  const assistantMessage =
-    data.content || data.message || "No response received.";
+  if (backendResponse.status === 429) {
+    // Backend admission control: pass the backoff hint through
+    const retryAfter = backendResponse.headers.get("Retry-After") ?? "5";
+    return new Response(
+      JSON.stringify({
+        error: "The assistant is busy right now. Please try again in a few seconds.",
+      }),
+      {
+        status: 429,
+        headers: { "Content-Type": "application/json", "Retry-After": retryAfter },
+      },
+    );
+  }
 
+  if (!backendResponse.ok || !backendResponse.body) {
+    return new Response(
+      JSON.stringify({ error: `Backend error: ${backendResponse.status}` }),
+      { status: 502, headers: { "Content-Type": "application/json" } },
+    );
+  }
+
+  const backendBody = backendResponse.body;
   const encoder = new TextEncoder();
-  const messageId = crypto.randomUUID();
+  let messageId: string = crypto.randomUUID();
 
   const stream = new ReadableStream({
     async start(controller) {
-      // Start
-      controller.enqueue(
-        encoder.encode(
-          `data: ${JSON.stringify({
-            type: "text-start",
-            id: messageId,
-          })}\n\n`
-        )
-      );
-
-      // Stream word by word
-      const words = assistantMessage.split(" ");
-      for (const word of words) {
+      const send = (payload: object) =>
         controller.enqueue(
-          encoder.encode(
-            `data: ${JSON.stringify({
-              type: "text-delta",
-              id: messageId,
-              delta: word + " ",
-            })}\n\n`
-          )
+          encoder.encode(`data: ${JSON.stringify(payload)}\n\n`),
         );
-        await new Promise((r) => setTimeout(r, 20));
-      }
 
-      // End
-      controller.enqueue(
-        encoder.encode(
-          `data: ${JSON.stringify({
-            type: "text-end",
-            id: messageId,
-          })}\n\n`
-        )
-      );
+      let assistantMessage = "";
+
+      try {
+        for await (const { event, data } of readBackendEvents(backendBody)) {
+          if (event === "start") {
+            messageId = data.id || messageId;
+            send({ type: "text-start", id: messageId });
+          } else if (event === "delta" && data.delta) {
+            assistantMessage += data.delta;
+            send({ type: "text-delta", id: messageId, delta: data.delta });
+          } else if (event === "error") {
+            send({ type: "text-end", id: messageId });
+            send({
+              type: "error",
+              errorText: data.message || "Something went wrong.",
+            });
+            send({ type: "finish" });
+            controller.close();
+            return;
+          } else if (event === "done") {
+            send({ type: "text-end", id: messageId });
+          }
+        }
+      } catch {
+        if (req.signal.aborted) {
+          controller.close();
+          return;
+        }
+        send({
+          type: "error",
+          errorText: "Connection to the assistant was lost.",
+        });
+        send({ type: "finish" });
+        controller.close();
+        return;
+      }
 
       // 🔥 SAFE CONTACT FORM DETECTION
       const lower = assistantMessage.toLowerCase();
 
       if (
         lower.includes("don't have that information") ||
+        lower.includes("don’t have that information") ||
         lower.includes("do not have that information") ||
         lower.includes("based on the available data")
       ) {
         const toolCallId = crypto.randomUUID();
 
-        controller.enqueue(
-          encoder.encode(
-            `data: ${JSON.stringify({
-              type: "tool-input-available",
-              toolCallId,
-              toolName: "contact_form",
-            })}\n\n`
-          )
-        );
+        send({
+          type: "tool-input-available",
+          toolCallId,
+          toolName: "contact_form",
+        });
 
-        controller.enqueue(
-          encoder.encode(
-            `data: ${JSON.stringify({
-              type: "tool-output-available",
-              toolCallId,
-            })}\n\n`
-          )
-        );
+        send({
+          type: "tool-output-available",
+          toolCallId,
+        });
       }
 
-      controller.enqueue(
-        encoder.encode(`data: ${JSON.stringify({ type: "finish" })}\n\n`)
-      );
+      send({ type: "finish" });
 
       controller.close();
     },